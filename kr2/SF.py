@@ -1,68 +1,13 @@
-class PolynomialZp:
-    def __init__(self, coeffs, p):
-        # Храним коэффициенты от старшей степени к младшей
-        self.coeffs = [c % p for c in coeffs]
-        self.p = p
-        # Удаляем ведущие нули
-        while len(self.coeffs) > 1 and self.coeffs[0] == 0:
-            self.coeffs.pop(0)
-
-    def __str__(self):
-        terms = []
-        degree = len(self.coeffs) - 1
-        for i, c in enumerate(self.coeffs):
-            if c == 0:
-                continue
-            power = degree - i
-            if power == 0:
-                terms.append(str(c))
-            elif power == 1:
-                terms.append(f"{'' if c == 1 else c}x")
-            else:
-                terms.append(f"{'' if c == 1 else c}x^{power}")
-        return " + ".join(terms) or "0"
-
-    def deg(self):
-        return len(self.coeffs) - 1
-
-    def derivative(self):
-        """Вычисление производной полинома."""
-        degree = len(self.coeffs) - 1
-        derived_coeffs = [((degree - i) * c) % self.p for i, c in enumerate(self.coeffs[:-1])]
-        return PolynomialZp(derived_coeffs, self.p)
-
-    def gcd(self, other):
-        """Вычисление НОД двух полиномов."""
-        a, b = self, other
-        while b.coeffs != [0]:
-            a, b = b, a % b
-        return a
-
-    def __mod__(self, other):
-        """Операция деления по модулю полинома."""
-        divisor_degree = len(other.coeffs) - 1
-        result = self.coeffs[:]
-        while len(result) >= len(other.coeffs) and result:
-            scale = result[0] * pow(other.coeffs[0], -1, self.p) % self.p
-            for i in range(len(other.coeffs)):
-                result[i] = (result[i] - scale * other.coeffs[i]) % self.p
-            result.pop(0)  # Удаляем старший коэффициент
-        return PolynomialZp(result, self.p) if result else PolynomialZp([0], self.p)
-
-    def __floordiv__(self, other):
-        """Целочисленное деление полиномов."""
-        quotient = []
-        remainder = self.coeffs[:]
-        while len(remainder) >= len(other.coeffs):
-            scale = remainder[0] * pow(other.coeffs[0], -1, self.p) % self.p
-            quotient.append(scale)
-            for i in range(len(other.coeffs)):
-                remainder[i] = (remainder[i] - scale * other.coeffs[i]) % self.p
-            remainder.pop(0)
-        return PolynomialZp(quotient, self.p)
+import polycache
+from polynomial import PolynomialZp
 
 
 def square_free_decomposition(f):
+    # Разложение и вывод для того же f — готовые из кэша многочленов
+    return polycache.square_free(f, lambda: _square_free_decomposition(f))
+
+
+def _square_free_decomposition(f):
     solve = f"\nСчитаем для f(x) = {f}\n"
     factors = []  # Список для хранения множителей
 
@@ -76,7 +21,7 @@ def square_free_decomposition(f):
     solve += f"deg f(x) = {f.deg()} ≥ 2\n"
 
     # 2) Вычислить g(x) = f'(x)
-    g = f.derivative()
+    g = polycache.derivative(f)
     solve += f"g(x) = f'(x) = {g}\n"
 
     # 3) Если g(x) = 0, то f(x) = (v(x))^p
@@ -96,7 +41,7 @@ def square_free_decomposition(f):
     solve += f"g(x) ≠ 0\n"
 
     # 4) Вычислить d(x) = НОД(g(x), f(x))
-    d = f.gcd(g)
+    d = polycache.gcd(f, g)
     solve += f"d(x) = НОД(f(x), g(x)) = {d}\n"
 
     # Если d(x) = 1 – добавить только f(x) как множитель
@@ -1,6 +1,9 @@
 from sympy import factorint
+from smooth import descent_candidates
+from budget import CHECK_EVERY, OutOfBudget
+import arith
 
-def adleman(g, a, n):
+def adleman(g, a, n, budget=None, checkpoint=None):
     """
     Function to calculate log(a) mod (n-1) using the given parameters.
 
@@ -9,6 +12,9 @@ def adleman(g, a, n):
         n (int): The modulo base.
         g (int): The generator.
         S (list): The set of allowed prime factors.
+        budget (Budget, optional): Checked every CHECK_EVERY values of k; when it
+            runs out, OutOfBudget is raised with a checkpoint.
+        checkpoint (dict, optional): Checkpoint from OutOfBudget to resume from.
 
     Returns:
         tuple: The value of log(a) mod (n-1) and the full log output.
@@ -21,12 +27,23 @@ def adleman(g, a, n):
         output.append(msg)
 
     single_factor_dict = {}
-
-    log(f"1)\nфакторная база: {S}\n\n2)")
-
-    for k in range(1, n):
+    stage = checkpoint["stage"] if checkpoint else "relations"
+    start_k = checkpoint["next_k"] if checkpoint else 1
+    if checkpoint:
+        output.extend(checkpoint["trace"])
+        single_factor_dict = {val: k for val, k in checkpoint["logs"]}
+    else:
+        log(f"1)\nфакторная база: {S}\n\n2)")
+
+    def suspend(stage, k, progress):
+        return OutOfBudget(dict(solver="adleman", stage=stage, next_k=k, progress=progress, trace=output,
+                                logs=[[val, j] for val, j in single_factor_dict.items()]))
+
+    for k in range(start_k if stage == "relations" else n, n):
+        if k % CHECK_EVERY == 0 and k != start_k and budget is not None and budget.spend(CHECK_EVERY):
+            raise suspend("relations", k, f"шаг 2: проверены k < {k}")
         if k == 1 or g**k > n:
-            val = pow(g, k, n)  # (g^k) mod n
+            val = arith.powmod(g, k, n)  # (g^k) mod n
             factors = factorint(val)
 
             all_in_S = all(prime in S for prime in factors.keys())
@@ -36,18 +53,21 @@ def adleman(g, a, n):
                     single_factor_dict[val] = k
                     log(f"возьмём случайное k = {k}: b = {g}^{k} = {val} mod {n} => log{val} = {k}")
 
-    log(f"\nполучили систему уравнений:")
-    for base, value in single_factor_dict.items():
-        log(f"log({base}) = {value}")
-    log(f"\nтак получилось, что случайно подобрали удачные k, что систему уравнений решать не надо")
-    log(f"пропускаем пункт 3\n\n4)")
-
-    for k in range(1, n):
-        product = (a * pow(g, k, n)) % n  # a * g^k 
-        factors = factorint(product)
-
-        all_in_S = all(prime in S for prime in factors.keys())
+    if stage == "relations":
+        log(f"\nполучили систему уравнений:")
+        for base, value in single_factor_dict.items():
+            log(f"log({base}) = {value}")
+        log(f"\nтак получилось, что случайно подобрали удачные k, что систему уравнений решать не надо")
+        log(f"пропускаем пункт 3\n\n4)")
+        start_k = 1
+
+    # Кандидаты идут блоками: a * g^k накопительным умножением, гладкость по S
+    # проверяется деревом остатков, factorint вызывается только для гладких
+    for k, product, all_in_S in descent_candidates(a, g, n, S, start_k, n):  # product = a * g^k
+        if k % CHECK_EVERY == 0 and k != start_k and budget is not None and budget.spend(CHECK_EVERY):
+            raise suspend("descent", k, f"шаг 4: проверены k < {k}")
         if all_in_S:
+            factors = factorint(product)
             log(f"k = {k}: {a} * {g}^{k} = {product} mod {n}, раскладывается в S")
         else:
             log(f"k = {k}: {a} * {g}^{k} = {product} mod {n}, не раскладывается в S")
@@ -1,8 +1,71 @@
-from sympy import factorint
+from sympy import factorint, primerange
 from sympy.core.numbers import igcd
 from copy import deepcopy
+from parallel import map_shards
+from smooth import descent_candidates
+from sparse_linalg import RankTracker, solve_sparse
+from budget import OutOfBudget
+from field import context
+import arith
+import instrument
+
+# Перебор k режем на отрезки; при больших n отрезки считаются в пуле процессов
+SHARD_SIZE = 4096
+PARALLEL_MIN_N = 200_000
+# Начиная с такой факторной базы ранг и систему считаем разреженным движком
+SPARSE_MIN_BASE = 40
+
+
+def _factor_over(val, S):
+    """Разложение val по факторной базе S или None, если val не S-гладкое."""
+    if val <= 0:
+        return None
+    factors = {}
+    for prime in S:
+        if val % prime == 0:
+            power = 0
+            while val % prime == 0:
+                val //= prime
+                power += 1
+            factors[prime] = power
+    return factors if val == 1 else None
+
+
+def _scan_relations(g, n, S, lo, hi):
+    """Все k из [lo, hi), для которых g^k mod n раскладывается по S: [(k, g^k, разложение)]."""
+    found = []
+    val, modulus = arith.mpz(arith.powmod(g, lo, n)), arith.mpz(n)
+    for k in range(lo, hi):
+        factors = _factor_over(val, S)
+        if factors:
+            found.append((k, int(val), factors))
+        val = val * g % modulus
+    return found
+
+
+def _scan_descent(a, g, n, S, lo, hi):
+    """
+    Перебор k из [lo, hi) для шага 4 до первого S-гладкого a * g^k mod n.
+
+    :return: Список (k, a*g^k mod n, разложение или None); последний элемент
+             гладкий, если такой k в отрезке нашёлся.
+    """
+    tried = []
+    # Гладкость проверяется блоками деревом остатков, раскладываются только выжившие
+    for k, product, smooth in descent_candidates(a, g, n, S, lo, hi):
+        factors = _factor_over(product, S) if smooth else None
+        tried.append((k, product, factors))
+        if factors is not None:
+            break
+    return tried
+
+
+def _pairs(factors):
+    """Разложение в JSON-совместимом виде для контрольной точки."""
+    return [[p, power] for p, power in factors.items()]
+
 
-def adleman2(g, a, n):
+def adleman2(g, a, n, base_bound=None, budget=None, checkpoint=None):
     """
     Function to calculate log(a) mod (n-1) using the Adleman algorithm.
 
@@ -10,11 +73,19 @@ def adleman2(g, a, n):
         a (int): The number for which to find the logarithm.
         n (int): The modulo base.
         g (int): The generator.
+        base_bound (int, optional): Use all primes up to this bound as the
+            factor base instead of the default [2, 3, 5].
+        budget (Budget, optional): Checked after every shard of k; when it runs
+            out, OutOfBudget is raised with a checkpoint.
+        checkpoint (dict, optional): Checkpoint from OutOfBudget to resume from.
 
     Returns:
         tuple: The value of log(a) mod (n-1) and the detailed log output.
     """
-    S = [2, 3, 5]  # Factor base
+    S = [2, 3, 5] if base_bound is None else list(primerange(2, base_bound + 1))  # Factor base
+    sparse = len(S) >= SPARSE_MIN_BASE
+    column = {p: i for i, p in enumerate(S)}
+    tracker = RankTracker(n - 1)
     output = []
 
     def log(msg):
@@ -24,24 +95,24 @@ def adleman2(g, a, n):
     exponent_matrix = []  # List of exponent vectors
     equations = []  # To store equations for solving
 
-    log(f"1)\nФакторная база: {S}\n\n2)")
+    stage = checkpoint["stage"] if checkpoint else "relations"
+    if checkpoint:
+        # Вывод до точки остановки восстанавливается как есть
+        output.extend(checkpoint["trace"])
+    else:
+        log(f"1)\nФакторная база: {S}\n\n2)")
+
+    def suspend(stage, next_k, progress, **state):
+        return OutOfBudget(dict(solver="adleman2", stage=stage, next_k=next_k, progress=progress,
+                                trace=output, **state))
 
-    # Helper function to compute modular inverse
+    # Обратные по модулю m — из общего контекста (запоминаются между вызовами)
     def mod_inverse(a, m):
         """Compute the modular inverse of a modulo m, if it exists."""
-        g_val, x, y = extended_gcd(a, m)
-        if g_val != 1:
+        try:
+            return context(m).inv(a)
+        except ValueError:
             return None
-        else:
-            return x % m
-
-    def extended_gcd(a, b):
-        """Extended Euclidean Algorithm that returns gcd, x, y such that ax + by = gcd(a, b)"""
-        if a == 0:
-            return (b, 0, 1)
-        else:
-            g_val, y, x = extended_gcd(b % a, a)
-            return (g_val, x - (b // a) * y, y)
 
     # Helper function to solve linear system modulo m using Gaussian Elimination
     def solve_modular_linear_system(A, b, m):
@@ -81,6 +152,7 @@ def adleman2(g, a, n):
                 if r != i and A[r][i] != 0:
                     factor = A[r][i]
                     A[r] = [(aij - factor * aik) % m for aij, aik in zip(A[r], A[i])]
+                    instrument.count("row_ops")
                     b[r] = (b[r] - factor * b[i]) % m
 
         # Check for consistency
@@ -139,140 +211,206 @@ def adleman2(g, a, n):
                 if r != rank and A[r][col] != 0:
                     factor = A[r][col]
                     A[r] = [(aij - factor * aik) % m for aij, aik in zip(A[r], A[rank])]
+                    instrument.count("row_ops")
             rank += 1
             if rank == n_vars:
                 break
         return rank
 
-    # Step 1: Form the initial system by finding k's that factor over S
-    max_k = n  # To prevent infinite loops
-    for k in range(1, max_k):
-        val = pow(g, k, n)
-        factors = factorint(val)
-
-        # Check if all factors are in the factor base and value is unique
-        if all(prime in S for prime in factors.keys()) and val not in [eq[0] for eq in system] and factors:
-            # Create the exponent vector
-            exponents = [factors.get(p, 0) for p in S]
-
-            # Tentatively add the new equation
-            temp_system = deepcopy(system) + [(val, k, factors)]
-            temp_A = [[eq[2].get(p, 0) for p in S] for eq in temp_system]
-            temp_b = [eq[1] for eq in temp_system]
-
-            # Check the rank before adding
-            current_rank = calculate_rank(temp_A, n-1)
-            previous_rank = calculate_rank(exponent_matrix, n-1)
-            if current_rank > previous_rank:
-                # Independent equation
+    if stage == "relations":
+        instrument.phase("relations")
+        # Step 1: Form the initial system by finding k's that factor over S
+        max_k = n  # To prevent infinite loops
+        full_rank = False
+        seen_values = set()
+        start_k = 1
+        if checkpoint:
+            # Уже найденные соотношения: система, ранг и набор значений строятся заново
+            start_k = checkpoint["next_k"]
+            for val, k, pairs in checkpoint["system"]:
+                factors = dict(pairs)
+                if sparse:
+                    exponents = {column[p]: power for p, power in factors.items()}
+                    tracker.add(exponents)
+                else:
+                    exponents = [factors.get(p, 0) for p in S]
                 system.append((val, k, factors))
+                seen_values.add(val)
                 exponent_matrix.append(exponents)
-                factor_terms = " + ".join([f"{power}*log{prime}" for prime, power in factors.items()])
-                log(f"Возьмём случайное k = {k}: b = {g}^{k} = {val} mod {n} => log{val} = {factor_terms} = {k}")
                 equations.append((exponents, k))
+        shards = map_shards(_scan_relations, (g, n, S), start_k, max_k, SHARD_SIZE, parallel=n >= PARALLEL_MIN_N)
+        for shard_no, relations in enumerate(shards):
+            # Проверки гладкости идут в отрезках (возможно, в других процессах)
+            instrument.count("smooth_tests", min(SHARD_SIZE, max_k - start_k - shard_no * SHARD_SIZE))
+            for k, val, factors in relations:
+                # Check the value is unique
+                if val in seen_values:
+                    continue
+
+                if sparse:
+                    # Create the sparse exponent vector and update the rank incrementally
+                    exponents = {column[p]: power for p, power in factors.items()}
+                    independent = tracker.add(exponents)
+                else:
+                    # Create the exponent vector
+                    exponents = [factors.get(p, 0) for p in S]
+
+                    # Tentatively add the new equation
+                    temp_system = deepcopy(system) + [(val, k, factors)]
+                    temp_A = [[eq[2].get(p, 0) for p in S] for eq in temp_system]
+                    temp_b = [eq[1] for eq in temp_system]
+
+                    # Check the rank before adding
+                    current_rank = calculate_rank(temp_A, n-1)
+                    previous_rank = calculate_rank(exponent_matrix, n-1)
+                    independent = current_rank > previous_rank
+                if independent:
+                    # Independent equation
+                    system.append((val, k, factors))
+                    seen_values.add(val)
+                    exponent_matrix.append(exponents)
+                    factor_terms = " + ".join([f"{power}*log{prime}" for prime, power in factors.items()])
+                    log(f"Возьмём случайное k = {k}: b = {g}^{k} = {val} mod {n} => log{val} = {factor_terms} = {k}")
+                    equations.append((exponents, k))
+
+                    log(f"Добавлено уравнение: log({val}) = {factor_terms} = {k}")
+
+                    # Check if the system has full rank
+                    rank = tracker.rank if sparse else calculate_rank(exponent_matrix, n-1)
+                    if rank == len(S):
+                        log(f"\nДостигнут полный ранг системы уравнений (ранг = {len(S)}).")
+                        full_rank = True
+                        break
+                else:
+                    log(f"Уравнение для k = {k} линейно зависимо и не добавлено.")
+            if full_rank:
+                # Остальные отрезки больше не нужны
+                shards.close()
+                break
+            hi = min(start_k + (shard_no + 1) * SHARD_SIZE, max_k)
+            if budget is not None and budget.spend(min(SHARD_SIZE, hi - start_k)) and hi < max_k:
+                shards.close()
+                raise suspend("relations", hi,
+                              f"найдено {len(system)} из {len(S)} соотношений, проверены k < {hi}",
+                              system=[[val, k, _pairs(factors)] for val, k, factors in system])
+
+        # Step 2: Log the formed system
+        log(f"\nПолучили систему уравнений:")
+        for val, k, factors in system:
+            factor_breakdown = " + ".join(
+                [f"{power}*log{prime}" for prime, power in factors.items()]
+            )
+            log(f"log({val}) = {k} ({factor_breakdown})")
+
+        # Step 3: Solve the system and log the process
+        instrument.phase("linear_algebra")
+        log(f"\n3)\nРешаем систему уравнений для нахождения логарифмов:")
+        A = []
+        b_vector = []
+        for exponents, k in equations:
+            A.append(exponents)
+            b_vector.append(k)
+
+        mat_A = A
+        vec_b = b_vector
+        m = n - 1
+
+        log("Составлена матрица коэффициентов (A) и вектор правых частей (b):")
+        log(f"A =")
+        for row in mat_A:
+            # Разреженные строки выводим как {простое: степень}
+            log(f"    {({S[c]: v for c, v in sorted(row.items())} if sparse else row)}")
+        log(f"b =")
+        for val in vec_b:
+            log(f"    {val}")
+
+        # Solve the system using the helper function
+        if sparse:
+            def dense_fallback(rows, rhs, ncols):
+                dense = [[row.get(c, 0) for c in range(ncols)] for row in rows]
+                return solve_modular_linear_system(dense, rhs, m)
+
+            solution, report = solve_sparse(mat_A, vec_b, len(S), m, dense_fallback)
+            for line in report:
+                log(line)
+        else:
+            solution = solve_modular_linear_system(mat_A, vec_b, m)
+
+        if solution is None:
+            log("Не удалось решить систему уравнений.")
+            return None, "\n".join(output)
+
+        # Assign log2, log3, log5 based on the factor base order
+        logs = {}
+        for i, prime in enumerate(S):
+            logs[prime] = solution[i]
+            log(f"log({prime}) = {solution[i]}")
+
+        # Compute log(g) using its factorization over S
+        factors_g = factorint(g)
+        if all(p in S for p in factors_g):
+            log_g = sum(logs[p] * power for p, power in factors_g.items()) % m
+            factor_terms_g = " + ".join([f"{power}*log{p}" for p, power in factors_g.items()])
+            # log(f"log({g}) = {factor_terms_g} = {log_g} mod {m}")
+        else:
+            log(f"Генератор g = {g} не раскладывается по факторной базе S = {S}.")
+            return None, "\n".join(output)
 
-                log(f"Добавлено уравнение: log({val}) = {factor_terms} = {k}")
-
-                # Check if the system has full rank
-                if calculate_rank(exponent_matrix, n-1) == len(S):
-                    log(f"\nДостигнут полный ранг системы уравнений (ранг = {len(S)}).")
-                    break
-            else:
-                log(f"Уравнение для k = {k} линейно зависимо и не добавлено.")
-
-    # Step 2: Log the formed system
-    log(f"\nПолучили систему уравнений:")
-    for val, k, factors in system:
-        factor_breakdown = " + ".join(
-            [f"{power}*log{prime}" for prime, power in factors.items()]
-        )
-        log(f"log({val}) = {k} ({factor_breakdown})")
-
-    # Step 3: Solve the system and log the process
-    log(f"\n3)\nРешаем систему уравнений для нахождения логарифмов:")
-    A = []
-    b_vector = []
-    for exponents, k in equations:
-        A.append(exponents)
-        b_vector.append(k)
-
-    mat_A = A
-    vec_b = b_vector
-    m = n - 1
-
-    log("Составлена матрица коэффициентов (A) и вектор правых частей (b):")
-    log(f"A =")
-    for row in mat_A:
-        log(f"    {row}")
-    log(f"b =")
-    for val in vec_b:
-        log(f"    {val}")
-
-    # Solve the system using the helper function
-    solution = solve_modular_linear_system(mat_A, vec_b, m)
-
-    if solution is None:
-        log("Не удалось решить систему уравнений.")
-        return None, "\n".join(output)
-
-    # Assign log2, log3, log5 based on the factor base order
-    logs = {}
-    for i, prime in enumerate(S):
-        logs[prime] = solution[i]
-        log(f"log({prime}) = {solution[i]}")
-
-    # Compute log(g) using its factorization over S
-    factors_g = factorint(g)
-    if all(p in S for p in factors_g):
-        log_g = sum(logs[p] * power for p, power in factors_g.items()) % m
-        factor_terms_g = " + ".join([f"{power}*log{p}" for p, power in factors_g.items()])
-        # log(f"log({g}) = {factor_terms_g} = {log_g} mod {m}")
+        # Step 4: Compute log(a)
+        log("\n4) Вычисляем log(a):")
     else:
-        log(f"Генератор g = {g} не раскладывается по факторной базе S = {S}.")
-        return None, "\n".join(output)
-
-    # Step 4: Compute log(a)
-    log("\n4) Вычисляем log(a):")
+        logs = {p: v for p, v in checkpoint["logs"]}
+        log_g = checkpoint["log_g"]
+        m = n - 1
 
     log_a = None
+    instrument.phase("descent")
 
     # Увеличим диапазон поиска k, чтобы найти раскладывающиеся значения
-    for k in range(1, n):
-        product = (a * pow(g, k, n)) % n  # a * g^k 
-        factors = factorint(product)
-
-        all_in_S = all(prime in S for prime in factors.keys())
-        if all_in_S:
-            log(f"k = {k}: {a} * {g}^{k} = {product} mod {n}, раскладывается в S")
-        else:
-            log(f"k = {k}: {a} * {g}^{k} = {product} mod {n}, не раскладывается в S")
-
-        if all_in_S:
-            # Выражаем log(a) через log(product) и log(g)
-            # log(a * g^k) = log(a) + k*log(g) = sum(power * log(prime)) 
-            # Отсюда log(a) = sum(power * log(prime)) - k*log(g) mod m
-
-            log_a_expr = 0
-            str1 = ""
-            str2 = ""
-
-            for prime, power in factors.items():
-                str1 += f"{power}*log{prime} + "
-                if prime in logs:
-                    log_a_expr += logs[prime] * power
-                    str2 += f"{power}*{logs[prime]} + "
-
-            log_a_expr -= k * log_g
-            log_a = log_a_expr % m
-
-            log(f"log({a}) + {k}*log({g}) = {str1[:-3]} mod {m}")
-            log(f"Переходим к значениям логарифмов:")
-            log(f"log({a}) + {k}*{log_g} = {str2[:-3]} mod {m}")
-            log(f"Сокращаем и переносим")
-            log(f"log({a}) = ({str2[:-3]}) - {k}*{log_g} mod {m} = {log_a} mod {m}")
-            log(f"Ответ: {log_a}")
-
-            return log_a, "\n".join(output)
+    start_k = checkpoint["next_k"] if stage == "descent" else 1
+    shards = map_shards(_scan_descent, (a, g, n, S), start_k, n, SHARD_SIZE, parallel=n >= PARALLEL_MIN_N)
+    for shard_no, tried in enumerate(shards):
+        instrument.count("smooth_tests", min(SHARD_SIZE, n - start_k - shard_no * SHARD_SIZE))
+        for k, product, factors in tried:  # product = a * g^k
+            all_in_S = factors is not None
+            if all_in_S:
+                log(f"k = {k}: {a} * {g}^{k} = {product} mod {n}, раскладывается в S")
+            else:
+                log(f"k = {k}: {a} * {g}^{k} = {product} mod {n}, не раскладывается в S")
+
+            if all_in_S:
+                # Выражаем log(a) через log(product) и log(g)
+                # log(a * g^k) = log(a) + k*log(g) = sum(power * log(prime)) 
+                # Отсюда log(a) = sum(power * log(prime)) - k*log(g) mod m
+
+                log_a_expr = 0
+                str1 = ""
+                str2 = ""
+
+                for prime, power in factors.items():
+                    str1 += f"{power}*log{prime} + "
+                    if prime in logs:
+                        log_a_expr += logs[prime] * power
+                        str2 += f"{power}*{logs[prime]} + "
+
+                log_a_expr -= k * log_g
+                log_a = log_a_expr % m
+
+                log(f"log({a}) + {k}*log({g}) = {str1[:-3]} mod {m}")
+                log(f"Переходим к значениям логарифмов:")
+                log(f"log({a}) + {k}*{log_g} = {str2[:-3]} mod {m}")
+                log(f"Сокращаем и переносим")
+                log(f"log({a}) = ({str2[:-3]}) - {k}*{log_g} mod {m} = {log_a} mod {m}")
+                log(f"Ответ: {log_a}")
+
+                shards.close()
+                return log_a, "\n".join(output)
+
+        hi = min(start_k + (shard_no + 1) * SHARD_SIZE, n)
+        if budget is not None and budget.spend(min(SHARD_SIZE, hi - start_k)) and hi < n:
+            shards.close()
+            raise suspend("descent", hi, f"логарифмы базы найдены, спуск: проверены k < {hi}",
+                          logs=[[p, v] for p, v in logs.items()], log_g=log_g)
 
     log("Не найдено подходящее значение k для вычисления log(a).")
     return None, "\n".join(output)
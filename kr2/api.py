@@ -0,0 +1,97 @@
+# api.py
+
+import argparse
+import asyncio
+import os
+
+import engine
+import batch
+from http_server import Request, Response, parse_address, start_server
+from metrics import METRICS
+
+# Локальный HTTP JSON API поверх тех же решателей, что и бот:
+#   POST /solve  {"problem": "hellman 6 14 109", "trace": false}
+#   POST /batch  {"problems": ["hellman 6 14 109", "gcd 1 0 1 | 1 1 0 1 2"], "trace": false}
+#   GET  /health, GET /metrics
+
+API_ADDR = os.getenv("API_ADDR", "127.0.0.1:8080")
+
+
+async def solve_endpoint(request: Request) -> Response:
+    data = request.json()
+    if not isinstance(data, dict) or not isinstance(data.get("problem"), str):
+        return Response.json({"error": "ожидается {\"problem\": \"команда аргументы\"}"}, 400)
+    line = batch.parse_line(1, data["problem"].strip() or "?")
+    if line.error is not None:
+        return Response.json(batch.line_to_dict(line), 400)
+    timeout = float(data["timeout"]) if "timeout" in data else None
+    try:
+        line.answer, line.trace = await engine.run(line.command, line.args, timeout=timeout)
+    except engine.Rejected as e:
+        line.error = str(e)
+        return Response.json(batch.line_to_dict(line), 422)
+    except engine.Suspended as e:
+        line.error = f"не успел ({e}); прогресс сохранён, повторите запрос"
+        return Response.json(batch.line_to_dict(line), 504)
+    except asyncio.TimeoutError:
+        line.error = "превышено время ожидания"
+        return Response.json(batch.line_to_dict(line), 504)
+    except Exception as e:
+        line.error = str(e)
+        return Response.json(batch.line_to_dict(line), 500)
+    return Response.json(batch.line_to_dict(line, bool(data.get("trace"))))
+
+
+async def batch_endpoint(request: Request) -> Response:
+    data = request.json()
+    problems = data.get("problems") if isinstance(data, dict) else None
+    if not isinstance(problems, list) or not all(isinstance(p, str) for p in problems):
+        return Response.json({"error": "ожидается {\"problems\": [\"...\", ...]}"}, 400)
+    try:
+        lines = batch.parse_batch("\n".join(problems))
+    except engine.InputError as e:
+        return Response.json({"error": str(e)}, 413)
+    timeout = float(data.get("timeout", batch.BATCH_TIMEOUT))
+    await batch.solve_batch(lines, timeout=timeout)
+    with_trace = bool(data.get("trace"))
+    return Response.json({"results": [batch.line_to_dict(line, with_trace) for line in lines]})
+
+
+async def handle(request: Request) -> Response:
+    try:
+        if request.path == "/health":
+            return Response.json({"status": "ok"})
+        if request.path == "/metrics" and request.method == "GET":
+            return Response(200, METRICS.render_prometheus().encode("utf-8"),
+                            "text/plain; version=0.0.4; charset=utf-8")
+        if request.path in ("/solve", "/batch"):
+            if request.method != "POST":
+                return Response.json({"error": "только POST"}, 405)
+            if request.path == "/solve":
+                return await solve_endpoint(request)
+            return await batch_endpoint(request)
+        return Response.json({"error": "not found"}, 404)
+    except ValueError as e:
+        return Response.json({"error": f"некорректный JSON: {e}"}, 400)
+
+
+async def serve(addr: str):
+    host, port = parse_address(addr)
+    server = await start_server(handle, host, port)
+    print(f"API слушает http://{host}:{server.sockets[0].getsockname()[1]}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP JSON API решателей NTMC.")
+    parser.add_argument("--listen", default=API_ADDR, help="адрес host:port")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.listen))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# arith.py
+
+import os
+from math import isqrt
+from typing import List, Tuple
+
+# Арифметика больших целых для горячих циклов решателей: powmod, invert,
+# mulmod, iroot и mpz — перевод числа в «родной» тип бэкенда.
+#   - python: встроенные int и pow, работает всегда;
+#   - gmpy2: GMP через gmpy2, выбирается сам, если пакет установлен.
+# ARITH_BACKEND=python|gmpy2 задаёт бэкенд явно (gmpy2 без пакета — ошибка).
+#
+# Вызывать через модуль (arith.powmod(...)), а не from arith import powmod:
+# use() подменяет функции модуля, и bench.py так сравнивает бэкенды.
+# powmod/invert/mulmod/iroot принимают и возвращают int. В длинных циклах
+# операнды переводятся в mpz один раз, дальше обычные * и % идут в GMP;
+# наружу (в контрольные точки, ответы, JSON) значения возвращаются через int().
+
+ARITH_BACKEND = os.getenv("ARITH_BACKEND", "auto")
+
+
+def _iroot(x: int, k: int) -> Tuple[int, bool]:
+    """Целая часть корня степени k из x ≥ 0 и признак точного корня (Ньютон)."""
+    if x < 0 or k < 1:
+        raise ValueError("iroot: нужны x ≥ 0 и k ≥ 1")
+    if x < 2 or k == 1:
+        return x, True
+    if k == 2:
+        r = isqrt(x)
+    else:
+        # Начальное приближение сверху, дальше итерации Ньютона убывают к корню
+        r = 1 << -(-x.bit_length() // k)
+        while True:
+            y = ((k - 1) * r + x // r ** (k - 1)) // k
+            if y >= r:
+                break
+            r = y
+    return r, r ** k == x
+
+
+class PythonBackend:
+    name = "python"
+
+    @staticmethod
+    def mpz(x):
+        return int(x)
+
+    # Встроенный pow без обёртки: в чистом Python лишний вызов заметен
+    powmod = staticmethod(pow)
+
+    @staticmethod
+    def invert(a: int, m: int) -> int:
+        return pow(a, -1, m)
+
+    @staticmethod
+    def mulmod(a: int, b: int, m: int) -> int:
+        return a * b % m
+
+    iroot = staticmethod(_iroot)
+
+
+class Gmpy2Backend:
+    name = "gmpy2"
+
+    def __init__(self):
+        import gmpy2
+        self._gmpy2 = gmpy2
+        self.mpz = gmpy2.mpz
+
+    def powmod(self, a: int, e: int, m: int) -> int:
+        return int(self._gmpy2.powmod(a, e, m))
+
+    def invert(self, a: int, m: int) -> int:
+        try:
+            return int(self._gmpy2.invert(a, m))
+        except ZeroDivisionError:
+            # Как у pow(a, -1, m)
+            raise ValueError("base is not invertible for the given modulus") from None
+
+    def mulmod(self, a: int, b: int, m: int) -> int:
+        mpz = self.mpz
+        return int(mpz(a) * b % m)
+
+    def iroot(self, x: int, k: int) -> Tuple[int, bool]:
+        if x < 0 or k < 1:
+            raise ValueError("iroot: нужны x ≥ 0 и k ≥ 1")
+        root, exact = self._gmpy2.iroot(x, k)
+        return int(root), bool(exact)
+
+
+def available() -> List[str]:
+    """Имена бэкендов, которые можно включить в этом окружении."""
+    names = ["python"]
+    try:
+        import gmpy2  # noqa: F401
+        names.append("gmpy2")
+    except ImportError:
+        pass
+    return names
+
+
+def use(name: str):
+    """Включает бэкенд name ("python", "gmpy2" или "auto" — gmpy2, если установлен)."""
+    global BACKEND, mpz, powmod, invert, mulmod, iroot
+    if name == "auto":
+        name = "gmpy2" if "gmpy2" in available() else "python"
+    if name == "python":
+        backend = PythonBackend()
+    elif name == "gmpy2":
+        backend = Gmpy2Backend()
+    else:
+        raise ValueError(f"ARITH_BACKEND: неизвестный бэкенд '{name}' (python, gmpy2, auto)")
+    BACKEND = backend
+    mpz, powmod, invert = backend.mpz, backend.powmod, backend.invert
+    mulmod, iroot = backend.mulmod, backend.iroot
+
+
+use(ARITH_BACKEND)
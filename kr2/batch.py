@@ -0,0 +1,166 @@
+# batch.py
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import engine
+from metrics import METRICS
+from budget import Budget, OutOfBudget
+from parallel import get_process_pool
+
+# Пакетный режим: файл с задачами, по одной на строку, например
+#   hellman 6 14 109
+#   gcd 1 0 1 | 1 1 0 1 2
+#   /factor 1 0 1 0 1 1 2
+# Строки CSV (hellman,6,14,109) тоже принимаются.
+
+BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", "60"))
+BATCH_MAX_LINES = int(os.getenv("BATCH_MAX_LINES", "1000"))
+
+
+class BatchLine:
+    def __init__(self, number: int, text: str):
+        self.number = number
+        self.text = text
+        self.command: Optional[str] = None
+        self.args: Optional[tuple] = None
+        self.error: Optional[str] = None
+        self.answer: Optional[str] = None
+        self.trace: Optional[str] = None
+
+    @property
+    def key(self) -> tuple:
+        return engine.cache_key(self.command, self.args)
+
+
+def parse_line(number: int, text: str) -> BatchLine:
+    line = BatchLine(number, text)
+    tokens = text.replace(",", " ").replace(";", " ").replace("|", " | ").split()
+    command = tokens[0].lstrip("/")
+    if command not in engine.COMMANDS:
+        line.error = f"неизвестная команда '{tokens[0]}'"
+        return line
+    try:
+        line.command = command
+        line.args = engine.parse_args(command, tokens[1:])
+    except engine.InputError as e:
+        line.error = str(e)
+    return line
+
+
+def parse_batch(text: str) -> List[BatchLine]:
+    """
+    Разбирает содержимое файла задач.
+
+    :param text: Текст файла.
+    :return: Список строк-задач (пустые строки и комментарии # пропускаются).
+    """
+    lines = []
+    for number, raw in enumerate(text.splitlines(), start=1):
+        raw = raw.strip()
+        if not raw or raw.startswith("#"):
+            continue
+        lines.append(parse_line(number, raw))
+        if len(lines) > BATCH_MAX_LINES:
+            raise engine.InputError(f"Слишком много задач в файле (больше {BATCH_MAX_LINES}).")
+    return lines
+
+
+async def solve_batch(lines: List[BatchLine], timeout: float = BATCH_TIMEOUT) -> List[BatchLine]:
+    """
+    Решает все задачи пакета параллельно в пуле процессов.
+
+    Одинаковые задачи считаются один раз, уже известные ответы берутся из
+    общего кэша результатов. Задачи, не успевшие за timeout, помечаются таймаутом.
+    """
+    start = time.perf_counter()
+    unique: Dict[tuple, List[BatchLine]] = {}
+    for line in lines:
+        if line.error is None:
+            unique.setdefault(line.key, []).append(line)
+
+    # Заведомо безнадёжные задачи не отправляем в пул (оценка — в пуле потоков)
+    loop = asyncio.get_running_loop()
+    for key, group in list(unique.items()):
+        if engine.RESULTS.get(key) is None:
+            try:
+                await loop.run_in_executor(None, engine.admit, group[0].command, group[0].args)
+            except Exception as e:
+                # Rejected или сбой оценки — ошибка только этой строки, не всего пакета
+                for line in group:
+                    line.error = str(e)
+                del unique[key]
+
+    results: Dict[tuple, Tuple[str, str]] = {}
+    pending = {}
+    budget = Budget(time.time() + max(timeout - engine.CHECKPOINT_MARGIN, 0.0))
+    pool = get_process_pool()
+    for key, group in unique.items():
+        cached = engine.RESULTS.get(key)
+        if cached is not None:
+            results[key] = cached
+        else:
+            # Решатель остановится чуть раньше таймаута пакета и вернёт прогресс
+            job = pool.submit(engine.solve, group[0].command, group[0].args, budget,
+                              engine.CHECKPOINTS.get(key))
+            pending[asyncio.wrap_future(job, loop=loop)] = (key, job)
+
+    if pending:
+        done, not_done = await asyncio.wait(pending, timeout=timeout)
+        for future in done:
+            key, _ = pending[future]
+            try:
+                results[key] = future.result()
+                engine.RESULTS.put(key, results[key])
+                engine.CHECKPOINTS.pop(key)
+            except OutOfBudget as e:
+                engine.CHECKPOINTS.put(key, e.checkpoint)
+                results[key] = (None, f"не успел ({e.progress}); прогресс сохранён, повторите задачу")
+            except Exception as e:
+                results[key] = (None, str(e))
+        for future in not_done:
+            # Ещё не начатые задачи снимаем, чтобы не занимать пул
+            pending[future][1].cancel()
+
+    for key, group in unique.items():
+        answer, trace = results.get(key, (None, None))
+        for line in group:
+            if answer is None and trace is None:
+                line.error = "превышено время ожидания"
+            elif answer is None:
+                line.error = trace
+            else:
+                line.answer, line.trace = answer, trace
+
+    METRICS.observe("batch", time.perf_counter() - start, len(lines), "ok")
+    return lines
+
+
+def line_to_dict(line: BatchLine, with_trace: bool = False) -> dict:
+    """Результат одной строки в виде JSON-совместимого словаря."""
+    data = {"line": line.number, "problem": line.text}
+    if line.error is not None:
+        data["error"] = line.error
+    else:
+        data["answer"] = line.answer
+        if with_trace:
+            data["trace"] = line.trace
+    return data
+
+
+def format_results(lines: List[BatchLine], with_traces: bool = False) -> str:
+    """Собирает итоговый файл с ответами (и решениями, если нужно)."""
+    out = []
+    for line in lines:
+        if line.error is not None:
+            out.append(f"{line.number}: {line.text}\n  ошибка: {line.error}")
+            continue
+        out.append(f"{line.number}: {line.text}\n  ответ: {line.answer}")
+        if with_traces:
+            out.append(line.trace)
+            out.append("-" * 40)
+    solved = sum(1 for line in lines if line.error is None)
+    out.append(f"\nрешено {solved} из {len(lines)}")
+    return "\n".join(out) + "\n"
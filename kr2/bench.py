@@ -0,0 +1,146 @@
+# bench.py
+
+import argparse
+import os
+import random
+import time
+from typing import Callable, Dict, List, Tuple
+
+import arith
+import engine
+from parallel import shutdown_process_pool
+
+# Замеры арифметических бэкендов (arith.py) на всех доступных:
+#   python bench.py                 # операции и решатели
+#   python bench.py --ops --bits 256 1024
+# Операции: powmod, invert, mulmod, iroot на случайных числах заданной длины.
+# Решатели: фиксированные задачи через engine (без кэша и оценки стоимости);
+# ответы разных бэкендов сравниваются — расхождение печатается как ошибка.
+
+DEFAULT_BITS = [64, 256, 1024, 2048]
+# Сколько операций на замер (powmod дороже остальных — для него меньше)
+OPS_PER_SAMPLE = {"powmod": 200, "invert": 2000, "mulmod": 20000, "iroot": 2000}
+
+SOLVER_CASES: List[Tuple[str, tuple]] = [
+    ("hellman", (7, 123456789, 12019206931)),
+    ("hellman", (2, 7, 1000003)),
+    ("adleman2", (2, 12345, 1000003)),
+    ("adleman2", (6, 12345, 10000019, 200)),
+    ("dlog", (2, 12345, 1000000007)),
+    ("gcdz", ([3 ** 40, 0, -1, 5 ** 30], [3 ** 40, 7 ** 25, -1])),
+    ("factorz", ([1, 0, -40, 0, 352, 0, -960, 0, 576],)),
+    ("factorz", ([1] + [0] * 15 + [-(1 << 64)],)),
+]
+
+
+def _timeit(fn: Callable[[], None], repeat: int) -> float:
+    """Лучшее время из repeat запусков, с."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_ops(bits: int, repeat: int) -> Dict[str, float]:
+    """Время одной операции каждого вида, мкс."""
+    rng = random.Random(bits)
+    m = rng.getrandbits(bits) | (1 << (bits - 1)) | 1
+    values = [rng.randrange(2, m) for _ in range(64)]
+    exponents = [rng.getrandbits(bits) for _ in range(64)]
+    squares = [v * v + rng.randrange(3) for v in values]
+    k = len(values)
+
+    def run_powmod():
+        for i in range(OPS_PER_SAMPLE["powmod"]):
+            arith.powmod(values[i % k], exponents[i % k], m)
+
+    def run_invert():
+        for i in range(OPS_PER_SAMPLE["invert"]):
+            try:
+                arith.invert(values[i % k], m)
+            except ValueError:
+                pass
+
+    def run_mulmod():
+        for i in range(OPS_PER_SAMPLE["mulmod"]):
+            arith.mulmod(values[i % k], values[(i + 1) % k], m)
+
+    def run_iroot():
+        for i in range(OPS_PER_SAMPLE["iroot"]):
+            arith.iroot(squares[i % k], 2 + i % 2)
+
+    runs = {"powmod": run_powmod, "invert": run_invert, "mulmod": run_mulmod, "iroot": run_iroot}
+    return {name: _timeit(fn, repeat) / OPS_PER_SAMPLE[name] * 1e6 for name, fn in runs.items()}
+
+
+def _label(command: str, args: tuple) -> str:
+    parts = [" ".join(map(str, a)) if isinstance(a, list) else str(a) for a in args]
+    label = f"{command} {' | '.join(parts)}"
+    return label if len(label) <= 60 else label[:57] + "..."
+
+
+def bench_solvers(repeat: int) -> Dict[str, Tuple[float, str]]:
+    """Время решателя на каждой задаче, с, и его вывод (для сравнения бэкендов)."""
+    results = {}
+    for command, args in SOLVER_CASES:
+        solver = engine.COMMANDS[command].solver
+        output = []
+        seconds = _timeit(lambda: output.append(solver(*args)), repeat)
+        results[_label(command, args)] = (seconds, repr(output[-1]))
+    return results
+
+
+def use_backend(name: str):
+    arith.use(name)
+    # Дочерние процессы пула должны получить тот же бэкенд
+    os.environ["ARITH_BACKEND"] = name
+    shutdown_process_pool()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение арифметических бэкендов (arith.py).")
+    parser.add_argument("--ops", action="store_true", help="только операции")
+    parser.add_argument("--solvers", action="store_true", help="только решатели")
+    parser.add_argument("--bits", type=int, nargs="+", default=DEFAULT_BITS, help="длины чисел для операций")
+    parser.add_argument("--repeat", type=int, default=3, help="повторов на замер (берётся лучший)")
+    args = parser.parse_args(argv)
+    with_ops = args.ops or not args.solvers
+    with_solvers = args.solvers or not args.ops
+
+    backends = arith.available()
+    print("Бэкенды: " + ", ".join(backends) + ("" if "gmpy2" in backends else " (gmpy2 не установлен)"))
+    ops: Dict[str, Dict[int, Dict[str, float]]] = {}
+    solvers: Dict[str, Dict[str, Tuple[float, str]]] = {}
+    original = arith.BACKEND.name
+    try:
+        for name in backends:
+            use_backend(name)
+            if with_ops:
+                ops[name] = {bits: bench_ops(bits, args.repeat) for bits in args.bits}
+            if with_solvers:
+                solvers[name] = bench_solvers(args.repeat)
+    finally:
+        use_backend(original)
+
+    if with_ops:
+        print("\nОперации, мкс на операцию:")
+        print("  " + "бит".rjust(6) + "".join(f"{op:>12}" for op in OPS_PER_SAMPLE) + "   бэкенд")
+        for bits in args.bits:
+            for name in backends:
+                row = ops[name][bits]
+                print("  " + str(bits).rjust(6) + "".join(f"{row[op]:>12.3f}" for op in OPS_PER_SAMPLE)
+                      + f"   {name}")
+    if with_solvers:
+        print("\nРешатели, с:")
+        for case in solvers[backends[0]]:
+            times = "  ".join(f"{name} {solvers[name][case][0]:.4f}" for name in backends)
+            print(f"  {case}: {times}")
+            outputs = {solvers[name][case][1] for name in backends}
+            if len(outputs) > 1:
+                print("    ОШИБКА: ответы бэкендов различаются")
+
+
+if __name__ == "__main__":
+    main()
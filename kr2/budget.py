@@ -0,0 +1,51 @@
+# budget.py
+
+import time
+from typing import Optional
+
+# Бюджет решателя: дедлайн и/или число итераций. Решатели проверяют его в
+# горячих циклах и, когда он исчерпан, бросают OutOfBudget с контрольной
+# точкой — JSON-совместимым словарём, из которого тот же решатель продолжит
+# работу (аргумент checkpoint).
+
+# Как часто проверять бюджет в поэлементных циклах
+CHECK_EVERY = 256
+
+
+class Budget:
+    def __init__(self, deadline: Optional[float] = None, iterations: Optional[int] = None):
+        """
+        :param deadline: Момент time.time(), после которого пора остановиться.
+                         Абсолютное время, чтобы бюджет можно было передать в пул процессов.
+        :param iterations: Лимит итераций (в единицах, которые считает решатель).
+        """
+        self.deadline = deadline
+        self.iterations = iterations
+        self.used = 0
+
+    @classmethod
+    def seconds(cls, seconds: float) -> "Budget":
+        return cls(deadline=time.time() + seconds)
+
+    def spend(self, n: int = 1) -> bool:
+        """Учитывает n итераций; True, если бюджет исчерпан."""
+        self.used += n
+        if self.iterations is not None and self.used >= self.iterations:
+            return True
+        return self.deadline is not None and time.time() >= self.deadline
+
+
+class OutOfBudget(Exception):
+    """Бюджет исчерпан; checkpoint — состояние для продолжения."""
+
+    def __init__(self, checkpoint: dict):
+        # checkpoint передаётся в args, чтобы исключение переживало pickle (пул процессов)
+        super().__init__(checkpoint)
+        self.checkpoint = checkpoint
+
+    @property
+    def progress(self) -> str:
+        return self.checkpoint.get("progress", "")
+
+    def __str__(self):
+        return f"бюджет исчерпан: {self.progress}"
@@ -0,0 +1,114 @@
+# cli.py
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+from typing import Iterable, Iterator, List, Optional
+
+import engine
+import instrument
+from batch import BatchLine, line_to_dict, parse_line
+from parallel import shutdown_process_pool
+
+# Консольный вход в решатели без Telegram:
+#   echo "hellman 6 14 109" | python cli.py
+#   python cli.py tasks.txt --trace
+#   python cli.py tasks.txt --profile   (фазы и счётчики операций в stderr)
+# Формат строк тот же, что и у пакетного режима бота.
+
+
+def read_problems(paths: List[str]) -> Iterator[BatchLine]:
+    """Строки задач из файлов (или stdin, если файлы не заданы / указан '-')."""
+    number = 0
+    for path in paths or ["-"]:
+        stream = sys.stdin if path == "-" else open(path, encoding="utf-8-sig")
+        try:
+            for raw in stream:
+                number += 1
+                raw = raw.strip()
+                if raw and not raw.startswith("#"):
+                    yield parse_line(number, raw)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+async def solve_line(line: BatchLine, timeout: Optional[float]) -> BatchLine:
+    if line.error is not None:
+        return line
+    try:
+        line.answer, line.trace = await engine.run(line.command, line.args, timeout=timeout)
+    except engine.Suspended as e:
+        line.error = f"не успел ({e}); прогресс сохранён, повторите задачу"
+    except asyncio.TimeoutError:
+        line.error = "превышено время ожидания"
+    except Exception as e:
+        line.error = str(e)
+    return line
+
+
+def format_line(line: BatchLine, as_json: bool, with_trace: bool) -> str:
+    if as_json:
+        return json.dumps(line_to_dict(line, with_trace), ensure_ascii=False)
+    if line.error is not None:
+        return f"{line.number}: {line.text}\n  ошибка: {line.error}"
+    text = f"{line.number}: {line.text}\n  ответ: {line.answer}"
+    return text + ("\n" + line.trace if with_trace else "")
+
+
+async def stream(lines: Iterable[BatchLine], jobs: int, timeout: Optional[float],
+                 as_json: bool, with_trace: bool):
+    """
+    Решает задачи с ограничением параллелизма и печатает ответы в порядке
+    входа, как только очередной готов.
+    """
+    window: "asyncio.Queue[asyncio.Task]" = asyncio.Queue(maxsize=jobs)
+
+    async def producer():
+        for line in lines:
+            await window.put(asyncio.create_task(solve_line(line, timeout)))
+        await window.put(None)
+
+    feeder = asyncio.create_task(producer())
+    while True:
+        task = await window.get()
+        if task is None:
+            break
+        print(format_line(await task, as_json, with_trace), flush=True)
+    await feeder
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Решатели NTMC из командной строки.")
+    parser.add_argument("files", nargs="*", help="файлы с задачами (по умолчанию stdin)")
+    parser.add_argument("-j", "--jobs", type=int, default=engine.SOLVER_WORKERS,
+                        help="сколько задач решать одновременно")
+    parser.add_argument("-t", "--timeout", type=float, default=None,
+                        help="таймаут на задачу, с (по умолчанию — по оценке стоимости, как в боте)")
+    parser.add_argument("--trace", action="store_true", help="печатать подробные решения")
+    parser.add_argument("--json", action="store_true", help="вывод в формате JSON lines")
+    parser.add_argument("--profile", action="store_true",
+                        help="печатать в stderr время по фазам и счётчики операций каждой задачи")
+    args = parser.parse_args(argv)
+    if args.profile:
+        instrument.INSTRUMENT = instrument.ECHO = True
+
+    asyncio.run(stream(read_problems(args.files), max(1, args.jobs), args.timeout,
+                       args.json, args.trace))
+    # shutdown снимает только ещё не начатые задачи: потоки, где решатель
+    # досчитывает после таймаута, интерпретатор ждал бы при выходе. Все ответы
+    # уже напечатаны — в этом случае выходим сразу
+    for executor in (engine.EXECUTOR, engine.SLOW_EXECUTOR):
+        executor.shutdown(wait=False, cancel_futures=True)
+    if any(t.is_alive() and not t.daemon for t in threading.enumerate() if t is not threading.main_thread()):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        shutdown_process_pool()
+        os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
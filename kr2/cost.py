@@ -0,0 +1,231 @@
+# cost.py
+
+import math
+import os
+from typing import List, Sequence, Tuple
+
+import dlogtable
+import roots
+from numtheory import largest_prime_factor_estimate
+
+# Оценка стоимости задачи по входу — до отправки в пул.
+# Модели грубые (порядок величины), коэффициенты подобраны по замерам
+# на одном ядре: секунд на «элементарную операцию» модели.
+
+# Лимит быстрой очереди считаем с запасом: оценки неточные
+FAST_BUDGET = float(os.getenv("FAST_BUDGET", "5"))
+SLOW_TIMEOUT = float(os.getenv("SLOW_TIMEOUT", "120"))
+
+SECONDS_PER_OP = {
+    "hellman": 2e-6,      # на элемент таблицы (расчёт + вывод)
+    "adleman": 1e-8,      # на бит в g**k при переборе шага 2
+    "descent": 5e-6,      # на одно k при поиске гладких значений (с выводом)
+    "trial": 1e-7,        # на одно пробное деление по факторной базе
+    "relations": 2.5e-7,  # ранг и решение системы: на |S|^2.5
+    "factor": 2.5e-7,     # на элемент произведения многочленов в x^(p*j) mod f
+    "SF": 3e-7,
+    "gcd": 1.5e-6,
+    "factorz": 1e-7,      # на элемент произведения при подъёме и разложении по модулю p
+    "gcdz": 1.5e-6,       # на элемент НОД по одному простому
+    "roots": 1e-6,        # на элемент произведения при возведении x^p mod f
+    "multipoint": 2e-8,   # на точку и коэффициент при переборе корней (numpy)
+    # /dlog: на одно умножение по модулю в соответствующем цикле
+    "brute": 3e-7,
+    "table": 7e-7,
+    "bsgs": 7e-7,
+    "rho": 3e-6,
+    "lookup": 2e-5,       # ответ из готовых таблиц индексов (dlogtable.py)
+}
+
+DEFAULT_BASE = [2, 3, 5]
+
+
+class Estimate:
+    FAST, SLOW, REJECT = "fast", "slow", "reject"
+
+    def __init__(self, seconds: float, reason: str):
+        self.seconds = seconds
+        self.reason = reason
+        if seconds <= FAST_BUDGET:
+            self.lane = Estimate.FAST
+        elif seconds <= SLOW_TIMEOUT:
+            self.lane = Estimate.SLOW
+        else:
+            self.lane = Estimate.REJECT
+
+    def __repr__(self):
+        return f"Estimate({self.lane}, {self.seconds:.3g} с, {self.reason})"
+
+
+def smooth_probability(x: int, base: Sequence[int]) -> float:
+    """
+    Доля чисел ≤ x, раскладывающихся по base.
+
+    Для маленькой базы — число точек решётки ∑ e_i ln p_i ≤ ln x,
+    т.е. (ln x)^k / (k! ∏ ln p); для большой — функция Дикмана ρ(u) ≈ u^-u.
+    """
+    if x <= max(base):
+        return 1.0
+    # В логарифмах: x может быть больше любого float
+    lx = math.log(x)
+    if len(base) <= 10:
+        log_count = len(base) * math.log(lx) - math.lgamma(len(base) + 1)
+        log_count -= sum(math.log(math.log(p)) for p in base)
+        return math.exp(min(0.0, log_count - lx))
+    u = lx / math.log(max(base))
+    if u <= 1:
+        return 1.0
+    if u <= 2:
+        return 1 - math.log(u)
+    return u ** -u
+
+
+def _float(n: int) -> float:
+    """n как float; больше предела float — бесконечность (такая задача всё равно отклоняется)."""
+    return float(n) if n.bit_length() <= 1023 else math.inf
+
+
+def primes_up_to(bound: int) -> List[int]:
+    sieve = bytearray([1]) * (bound + 1)
+    sieve[0:2] = b"\x00\x00"
+    for i in range(2, math.isqrt(bound) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytearray(len(sieve[i * i::i]))
+    return [i for i, v in enumerate(sieve) if v]
+
+
+def estimate_hellman(g: int, a: int, n: int) -> Estimate:
+    if n < 3:
+        return Estimate(0.0, "тривиальный модуль")
+    p = largest_prime_factor_estimate(n - 1)
+    # Таблицы строятся и выводятся для каждого простого делителя, главный вклад — наибольший
+    return Estimate(_float(p) * SECONDS_PER_OP["hellman"],
+                    f"наибольший простой делитель n-1 ≈ {p}: таблица из {p} элементов")
+
+
+def _descent_estimate(n: int, base: Sequence[int], relations: int) -> Tuple[float, str]:
+    rho = max(smooth_probability(n, base), 1e-300)
+    tries = (relations + 1) / rho
+    return tries, f"доля {max(base)}-гладких чисел < n ≈ {rho:.2g}, ожидается ~{tries:.3g} попыток"
+
+
+def estimate_adleman(g: int, a: int, n: int) -> Estimate:
+    # Шаг 2 перебирает все k < n и сравнивает g**k с n
+    bits = _float(n * n) * math.log2(max(g, 2)) / 2
+    tries, reason = _descent_estimate(n, DEFAULT_BASE, 0)
+    seconds = bits * SECONDS_PER_OP["adleman"] + min(tries, _float(n)) * SECONDS_PER_OP["descent"]
+    return Estimate(seconds, f"перебор k < n = {n} с g^k; {reason}")
+
+
+def estimate_adleman2(g: int, a: int, n: int, base_bound: int = None) -> Estimate:
+    base = DEFAULT_BASE if base_bound is None else primes_up_to(base_bound)
+    tries, reason = _descent_estimate(n, base, len(base))
+    # Больше n значений перебор всё равно не сделает; каждое значение делится
+    # на все простые базы, а система растёт с базой быстрее квадрата
+    tries = min(tries, 2 * _float(n))
+    seconds = (tries * (SECONDS_PER_OP["descent"] + len(base) * SECONDS_PER_OP["trial"])
+               + len(base) ** 2.5 * SECONDS_PER_OP["relations"])
+    return Estimate(seconds, f"база из {len(base)} простых; {reason}")
+
+
+def estimate_factor(coeffs: List[int], p: int) -> Estimate:
+    n = max(len(coeffs) - 1, 0)
+    # Тест Рабина и строки Q: по n возведений в степень ~p*n по модулю f, каждое — log(p*n) умножений
+    bits = max((p * n).bit_length(), 1)
+    ops = 2 * n ** 3 * bits
+    return Estimate(ops * SECONDS_PER_OP["factor"],
+                    f"deg f = {n}, p = {p}: тест Рабина и матрица Q — ~{ops} операций")
+
+
+def estimate_SF(coeffs: List[int], p: int) -> Estimate:
+    n = len(coeffs)
+    return Estimate(n * n * SECONDS_PER_OP["SF"], f"deg f = {n - 1}")
+
+
+def estimate_gcdz(coeffs1: List[int], coeffs2: List[int]) -> Estimate:
+    # Евклид по каждому простому < 2^31; простых — по границе Миньотта ~2^d ||f||,
+    # вдвое больше бит под рациональную реконструкцию
+    d = min(len(coeffs1), len(coeffs2))
+    bits = max((abs(c).bit_length() for c in list(coeffs1) + list(coeffs2)), default=0)
+    primes = 2 * (d + 2 * bits + d.bit_length()) // 30 + 1
+    ops = len(coeffs1) * len(coeffs2) * primes
+    return Estimate(ops * SECONDS_PER_OP["gcdz"],
+                    f"степени {len(coeffs1) - 1} и {len(coeffs2) - 1}, простых ~{primes}")
+
+
+def estimate_factorz(coeffs: List[int]) -> Estimate:
+    # Разложение по модулю p — n^3 log p на кандидата, подъём — n^2 на бит модуля p^k
+    # (граница Миньотта ~n + бит коэффициентов); перебор подмножеств обычно отсекается рано
+    n = max(len(coeffs) - 1, 1)
+    bits = max((abs(c).bit_length() for c in coeffs), default=0)
+    ops = n ** 3 * 20 + n * n * (n + bits) ** 2
+    return Estimate(ops * SECONDS_PER_OP["factorz"], f"deg f = {n}, коэффициенты до 2^{bits}")
+
+
+def estimate_roots(coeffs: List[int], p: int) -> Estimate:
+    n = max(len(coeffs) - 1, 1)
+    if p == 2 or p <= roots.MULTIPOINT_MAX_P and p * (n + 1) <= roots.MULTIPOINT_MAX_WORK:
+        # Как в roots.find_roots: f вычисляется сразу во всех точках (numpy, p * (n + 1) операций)
+        ops = p * (n + 1)
+        return Estimate(ops * SECONDS_PER_OP["multipoint"], f"deg f = {n}, p = {p}: перебор всех точек")
+    # x^p mod f: log p умножений по deg² плюс столько же на расщепление
+    ops = 2 * n * n * max(p.bit_length(), 1)
+    return Estimate(ops * SECONDS_PER_OP["roots"], f"deg f = {n}, log p = {p.bit_length()}")
+
+
+def estimate_gcd(coeffs1: List[int], coeffs2: List[int], p: int) -> Estimate:
+    ops = len(coeffs1) * len(coeffs2)
+    return Estimate(ops * SECONDS_PER_OP["gcd"], f"степени {len(coeffs1) - 1} и {len(coeffs2) - 1}")
+
+
+def estimate_dlog(g: int, a: int, n: int) -> Estimate:
+    if dlogtable.covers(n):
+        return Estimate(SECONDS_PER_OP["lookup"], "готовая таблица индексов")
+    # Полиг–Хеллман упирается в наибольший простой делитель n-1 (√q шагов BSGS),
+    # индексное исчисление — в гладкость; планировщик выберет дешёвое
+    q = largest_prime_factor_estimate(n - 1) if n > 2 else 1
+    seconds = 2 * _float(math.isqrt(q) + 1) * SECONDS_PER_OP["bsgs"]
+    reason = f"наибольший простой делитель n-1 ≈ {q}: BSGS ~{math.isqrt(q) + 1} шагов"
+    index = min((estimate_adleman2(g, a, n, bound) for bound in (None, 300, 3000)),
+                key=lambda e: e.seconds)
+    if index.seconds < seconds:
+        seconds, reason = index.seconds, f"индексное исчисление: {index.reason}"
+    return Estimate(seconds, reason)
+
+
+ESTIMATORS = {
+    "hellman": estimate_hellman,
+    "adleman": estimate_adleman,
+    "adleman2": estimate_adleman2,
+    "dlog": estimate_dlog,
+    "factor": estimate_factor,
+    "roots": estimate_roots,
+    "SF": estimate_SF,
+    "gcd": estimate_gcd,
+    "gcdz": estimate_gcdz,
+    "factorz": estimate_factorz,
+}
+
+
+def estimate(command: str, args: tuple) -> Estimate:
+    """Оценка времени задачи и выбранная очередь (fast / slow / reject)."""
+    estimator = ESTIMATORS.get(command)
+    if estimator is None:
+        return Estimate(0.0, "оценки нет")
+    return estimator(*args)
+
+
+
+# Проверка на огромных модулях: python cost.py
+# (оценка не должна падать на переполнении float; перебор Адлемана — отклоняется)
+if __name__ == "__main__":
+    for digits in (201, 401):
+        n = 10 ** digits + 1
+        for command, args in (("hellman", (5, 3, n)), ("adleman", (3, 5, n)),
+                              ("adleman2", (3, 5, n)), ("adleman2", (3, 5, n, 3000)),
+                              ("dlog", (3, 5, n))):
+            result = estimate(command, args)
+            if command in ("adleman", "adleman2"):
+                assert result.lane == Estimate.REJECT, (command, digits, result)
+            print(f"{command} ({digits} цифр): {result.lane}, ~{result.seconds:.3g} с")
+    assert smooth_probability(10 ** 400, DEFAULT_BASE) < 1e-300
@@ -0,0 +1,272 @@
+# dlog.py
+
+import random
+from math import isqrt
+from typing import Callable, Dict, List, Optional, Tuple
+
+import arith
+import cost
+import dlogtable
+import instrument
+from adleman2 import adleman2
+from numtheory import element_order, factor_group_order
+
+# Планировщик дискретного логарифма для /dlog g a n: n - 1 раскладывается
+# один раз, по разложению оцениваются стратегии, выбирается самая дешёвая,
+# ответ проверяется одним pow(g, x, n). Если стратегия не дала ответа или
+# ответ не прошёл проверку, пробуется следующая по стоимости.
+# Если n есть в готовых таблицах индексов (dlogtable.py), ответ берётся оттуда за O(1).
+
+# Полная таблица для подзадачи Полига–Хеллмана — до такого простого
+TABLE_MAX = 1000
+# Наибольшая таблица baby-step (элементов); дальше — ρ-метод Полларда без памяти
+BSGS_MAX_TABLE = 1 << 20
+# Перебор имеет смысл только для маленького порядка
+BRUTE_MAX = 10 ** 5
+# Границы факторной базы, из которых выбирается индексное исчисление (None — {2, 3, 5})
+INDEX_BOUNDS = (None, 30, 100, 300, 1000, 3000, 10000, 20000)
+RHO_ATTEMPTS = 20
+
+
+# --- решатели в подгруппе порядка order, порождённой h: h^x = b ---
+
+def brute_force(h: int, b: int, n: int, order: int) -> Optional[int]:
+    value = 1
+    for x in range(order):
+        if value == b:
+            return x
+        value = value * h % n
+    return None
+
+
+def bsgs(h: int, b: int, n: int, order: int) -> Optional[int]:
+    """Шаг младенца — шаг великана: ~2√order умножений, √order памяти."""
+    m = isqrt(order - 1) + 1
+    baby = {}
+    value, h, n = arith.mpz(1), arith.mpz(h), arith.mpz(n)
+    for j in range(m):
+        baby.setdefault(value, j)
+        value = value * h % n
+    giant = arith.mpz(arith.powmod(h, -m, n))
+    y = arith.mpz(b)
+    for i in range(m):
+        j = baby.get(y)
+        if j is not None:
+            instrument.count("bsgs_steps", m + i + 1)
+            return i * m + j
+        y = y * giant % n
+    instrument.count("bsgs_steps", 2 * m)
+    return None
+
+
+def pollard_rho(h: int, b: int, n: int, q: int) -> Optional[int]:
+    """ρ-метод Полларда для простого порядка q: ~√q шагов, O(1) памяти."""
+    if b == 1:
+        return 0
+    # Детерминированный генератор: одинаковый вход — одинаковый вывод
+    rng = random.Random(b)
+    h, b, n = arith.mpz(h), arith.mpz(b), arith.mpz(n)
+
+    def step(x, u, v):
+        # x = h^u * b^v; разбиение на три класса по x mod 3
+        s = x % 3
+        if s == 0:
+            return x * x % n, 2 * u % q, 2 * v % q
+        if s == 1:
+            return x * h % n, (u + 1) % q, v
+        return x * b % n, u, (v + 1) % q
+
+    for _ in range(RHO_ATTEMPTS):
+        u = rng.randrange(1, q)
+        x, v = arith.powmod(h, u, n), 0
+        X, U, V = x, u, v
+        steps = 0
+        while True:
+            x, u, v = step(x, u, v)
+            X, U, V = step(*step(X, U, V))
+            steps += 1
+            if x == X:
+                break
+        instrument.count("rho_steps", steps)
+        # h^u b^v = h^U b^V  =>  b^(v - V) = h^(U - u)
+        r = (v - V) % q
+        if r:
+            return (U - u) * arith.invert(r, q) % q
+    return None
+
+
+def table_lookup(g: int, a: int, n: int, log: Callable[[str], None]) -> Optional[int]:
+    """Ответ из готовых таблиц индексов: L[a] и L[g] по первообразному корню r."""
+    tables = dlogtable.get_tables()
+    found = tables.table(n) if tables is not None else None
+    if found is None:
+        return None
+    root, logs = found
+    log(f"Таблица индексов по r = {root}: log_r({a}) = {logs[a % n]}, log_r({g}) = {logs[g % n]}; "
+        f"x * log_r(g) ≡ log_r(a) (mod {n - 1})")
+    result = tables.log(g, a, n)
+    return result[0] if result is not None else None
+
+
+def _table_solver(h: int, n: int, p: int) -> Callable[[int], Optional[int]]:
+    table = {}
+    value = 1
+    for i in range(p):
+        table.setdefault(value, i)
+        value = value * h % n
+    return table.get
+
+
+def _prime_subsolver(p: int) -> Tuple[str, float]:
+    """Подрешатель для подгруппы простого порядка p и его стоимость, с."""
+    if p <= TABLE_MAX:
+        return "таблица", p * cost.SECONDS_PER_OP["table"]
+    if isqrt(p) + 1 <= BSGS_MAX_TABLE:
+        return "BSGS", 2 * (isqrt(p) + 1) * cost.SECONDS_PER_OP["bsgs"]
+    return "ρ Полларда", 1.3 * isqrt(p) * cost.SECONDS_PER_OP["rho"]
+
+
+def pohlig_hellman(g: int, a: int, n: int, order: int, order_factors: Dict[int, int],
+                   log: Callable[[str], None]) -> Optional[int]:
+    residues, moduli = [], []
+    for p, e in order_factors.items():
+        method, _ = _prime_subsolver(p)
+        h = arith.powmod(g, order // p, n)  # порядок p
+        if method == "таблица":
+            lookup = _table_solver(h, n, p)
+        elif method == "BSGS":
+            lookup = lambda c, h=h, p=p: bsgs(h, c, n, p)
+        else:
+            lookup = lambda c, h=h, p=p: pollard_rho(h, c, n, p)
+        # Цифры x в системе по основанию p: x = d0 + d1 p + ...
+        x = 0
+        for k in range(e):
+            c = arith.powmod(a * arith.powmod(g, -x, n) % n, order // p ** (k + 1), n)
+            d = lookup(c)
+            if d is None:
+                return None
+            x += d * p ** k
+        log(f"  p = {p}^{e}: подрешатель — {method}, x ≡ {x} mod {p ** e}")
+        residues.append(x)
+        moduli.append(p ** e)
+    # КТО
+    x = 0
+    for r, m in zip(residues, moduli):
+        M = order // m
+        x += r * M * arith.invert(M, m)
+    return x % order
+
+
+class Strategy:
+    def __init__(self, name: str, seconds: float, reason: str, run: Callable):
+        self.name = name
+        self.seconds = seconds
+        self.reason = reason
+        self.run = run
+
+
+def plan(g: int, a: int, n: int, factors: Dict[int, int], order: int,
+         order_factors: Dict[int, int]) -> List[Strategy]:
+    """Применимые стратегии по возрастанию оценки времени."""
+    strategies = []
+    if dlogtable.covers(n):
+        strategies.append(Strategy(
+            "готовая таблица индексов", cost.SECONDS_PER_OP["lookup"],
+            f"n ≤ {dlogtable.get_tables().bound}: таблица из {dlogtable.DLOG_TABLE_FILE}",
+            lambda log: table_lookup(g, a, n, log)))
+    if order <= BRUTE_MAX:
+        strategies.append(Strategy(
+            "перебор", order * cost.SECONDS_PER_OP["brute"], f"порядок g всего {order}",
+            lambda log: brute_force(g, a, n, order)))
+    if isqrt(order) + 1 <= BSGS_MAX_TABLE:
+        strategies.append(Strategy(
+            "шаг младенца — шаг великана (BSGS)", 2 * (isqrt(order) + 1) * cost.SECONDS_PER_OP["bsgs"],
+            f"√ord(g) ≈ {isqrt(order)} элементов таблицы",
+            lambda log: bsgs(g, a, n, order)))
+    q = max(order_factors, default=1)
+    subsolvers = {p: _prime_subsolver(p) for p in order_factors}
+    ph_seconds = sum(e * subsolvers[p][1] for p, e in order_factors.items())
+    strategies.append(Strategy(
+        "Полиг–Хеллман", ph_seconds,
+        f"наибольший простой делитель ord(g) = {q}, для него — {subsolvers.get(q, ('-',))[0]}",
+        lambda log: pohlig_hellman(g, a, n, order, order_factors, log)))
+    # Индексное исчисление (adleman2) считает логарифм по порождающему всей группы;
+    # из границ факторной базы берём ту, что дешевле по оценке
+    if order == n - 1:
+        candidates = []
+        for bound in INDEX_BOUNDS:
+            base = cost.DEFAULT_BASE if bound is None else cost.primes_up_to(bound)
+            if _smooth_over(g, base):
+                candidates.append((cost.estimate_adleman2(g, a, n, bound), bound))
+        if candidates:
+            estimate, bound = min(candidates, key=lambda c: c[0].seconds)
+            label = "{2, 3, 5}" if bound is None else f"простые ≤ {bound}"
+            strategies.append(Strategy(
+                f"индексное исчисление (adleman2, база {label})", estimate.seconds, estimate.reason,
+                lambda log: adleman2(g, a, n, bound)[0]))
+    strategies.sort(key=lambda s: s.seconds)
+    return strategies
+
+
+def _smooth_over(value: int, base) -> bool:
+    for p in base:
+        while value % p == 0:
+            value //= p
+    return value == 1
+
+
+def dlog(g: int, a: int, n: int) -> Tuple[Optional[int], str]:
+    """
+    Дискретный логарифм x: g^x ≡ a (mod n), n — простое.
+
+    :return: Пара (x или None, отчёт: разложение, оценки стратегий, выбор и проверка).
+    """
+    output = []
+    log = output.append
+    g, a = g % n, a % n
+    if g == 0 or a == 0:
+        log("g и a должны быть взаимно просты с n.")
+        return None, "\n".join(output)
+
+    instrument.phase("factorint")
+    factors = factor_group_order(n)
+    log(f"n - 1 = {n - 1} = " + " * ".join(f"{p}^{e}" for p, e in factors.items()))
+    order, order_factors = element_order(g, n, factors)
+    if order == n - 1:
+        log(f"ord(g) = n - 1: g — порождающий")
+    else:
+        log(f"ord(g) = {order} = " + (" * ".join(f"{p}^{e}" for p, e in order_factors.items()) or "1")
+            + ": g не порождающий, ищем x по модулю ord(g)")
+    if pow(a, order, n) != 1:
+        log(f"a^ord(g) = {pow(a, order, n)} ≠ 1: a не лежит в подгруппе <g>, решения нет.")
+        return None, "\n".join(output)
+
+    instrument.phase("plan")
+    strategies = plan(g, a, n, factors, order, order_factors)
+    log("\nОценки стратегий:")
+    for s in strategies:
+        log(f"  {s.name}: ~{s.seconds:.3g} с ({s.reason})")
+
+    for i, s in enumerate(strategies):
+        if i == 0:
+            others = ", ".join(f"{t.name} ~{t.seconds:.3g} с" for t in strategies[1:])
+            log(f"\nВыбрано: {s.name} — самая дешёвая оценка"
+                + (f" (остальные: {others})" if others else ""))
+        else:
+            log(f"\nПробуем следующую: {s.name}")
+        instrument.phase(s.name)
+        x = s.run(log)
+        if x is None:
+            log("Стратегия не нашла ответ.")
+            continue
+        x %= order
+        # Единственная проверка ответа
+        if pow(g, x, n) != a:
+            log(f"Проверка не пройдена: {g}^{x} mod {n} = {pow(g, x, n)} ≠ {a}")
+            continue
+        log(f"Проверка: {g}^{x} mod {n} = {a} ✓")
+        log(f"Ответ: x = {x} (mod {order})")
+        return x, "\n".join(output)
+
+    log("Ни одна стратегия не дала ответа.")
+    return None, "\n".join(output)
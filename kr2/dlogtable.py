@@ -0,0 +1,183 @@
+# dlogtable.py
+
+import argparse
+import bisect
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from math import gcd
+from typing import Optional, Tuple
+
+from sympy import primerange
+
+import arith
+from numtheory import primitive_root
+
+# Готовые таблицы индексов для простых до DLOG_TABLE_BOUND в одном файле:
+#   python dlogtable.py --bound 20000 --out dlog_tables.bin
+# Для каждого простого p — массив uint32 L[0..p-1], L[a] = log_r a, где r —
+# наименьший первообразный корень p. Тогда для любого g: g^x = a ⇔
+# x * L[g] ≡ L[a] (mod p - 1) — два чтения и одно обращение, O(1).
+#
+# Файл открывается через mmap только на чтение: ничего не копируется,
+# страницы подгружаются по требованию и общие у всех процессов (пул решателей,
+# реплики на одной машине) через страничный кэш.
+#
+# Формат (порядок байт — как у машины, где собран; проверяется при открытии):
+#   заголовок: магия, версия, порядок байт, граница, число простых k;
+#   primes uint32[k], roots uint32[k], offsets uint64[k] (по возрастанию p);
+#   таблицы uint32[p] подряд, каждая с выравниванием на 8 байт.
+
+MAGIC = b"NTDL"
+VERSION = 1
+# магия, версия, порядок байт, граница, число простых; 24 байта — индекс выровнен
+HEADER = struct.Struct("=4sIIII4x")
+# L[0] не определён
+NO_LOG = 0xFFFFFFFF
+
+DLOG_TABLE_FILE = os.getenv("DLOG_TABLE_FILE", "dlog_tables.bin")
+DLOG_TABLE_BOUND = int(os.getenv("DLOG_TABLE_BOUND", "20000"))
+
+
+def _byteorder_tag() -> int:
+    return 1 if sys.byteorder == "little" else 2
+
+
+def _log_table(p: int, root: int) -> array:
+    table = array("I", [NO_LOG]) * p
+    value = 1
+    for i in range(p - 1):
+        table[value] = i
+        value = value * root % p
+    return table
+
+
+def build(path: str, bound: int, log=print):
+    """Собирает файл таблиц для всех простых p ≤ bound (пишет во временный файл и переименовывает)."""
+    started = time.perf_counter()
+    primes = list(primerange(3, bound + 1))
+    roots = [primitive_root(p) for p in primes]
+    k = len(primes)
+    offset = HEADER.size + 16 * k
+    offset += -offset % 8
+    offsets = []
+    for p in primes:
+        offsets.append(offset)
+        offset += 4 * p
+        offset += -offset % 8
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, _byteorder_tag(), bound, k))
+        array("I", primes).tofile(f)
+        array("I", roots).tofile(f)
+        array("Q", offsets).tofile(f)
+        for p, root, start in zip(primes, roots, offsets):
+            f.write(b"\0" * (start - f.tell()))
+            _log_table(p, root).tofile(f)
+    os.replace(tmp, path)
+    log(f"{path}: {k} простых до {bound}, {offset / 2 ** 20:.1f} МБ, "
+        f"{time.perf_counter() - started:.1f} с")
+
+
+class DlogTables:
+    """Открытый через mmap файл таблиц; поиск простого — бинарный по индексу."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mm)
+        magic, version, order, self.bound, k = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: не файл таблиц индексов версии {VERSION}")
+        if order != _byteorder_tag():
+            raise ValueError(f"{path}: собран на машине с другим порядком байт")
+        start = HEADER.size
+        self.primes = view[start:start + 4 * k].cast("I")
+        self.roots = view[start + 4 * k:start + 8 * k].cast("I")
+        self.offsets = view[start + 8 * k:start + 16 * k].cast("Q")
+        self._view = view
+
+    def __contains__(self, p: int) -> bool:
+        return self._find(p) is not None
+
+    def _find(self, p: int) -> Optional[int]:
+        if not 0 < p <= self.bound:
+            return None
+        i = bisect.bisect_left(self.primes, p)
+        return i if i < len(self.primes) and self.primes[i] == p else None
+
+    def table(self, p: int) -> Optional[Tuple[int, memoryview]]:
+        """(первообразный корень r, L) для простого p без копирования или None."""
+        i = self._find(p)
+        if i is None:
+            return None
+        start = self.offsets[i]
+        return self.roots[i], self._view[start:start + 4 * p].cast("I")
+
+    def log(self, g: int, a: int, p: int) -> Optional[Tuple[int, int]]:
+        """
+        x с g^x ≡ a (mod p) по таблице.
+
+        :return: (x, ord g) — x определён по модулю порядка g; None, если p нет
+                 в таблице или a не лежит в <g>.
+        """
+        found = self.table(p)
+        g, a = g % p, a % p
+        if found is None or g == 0 or a == 0:
+            return None
+        _, logs = found
+        la, lg = logs[a], logs[g]
+        # x * lg ≡ la (mod p - 1): решение есть, только если d | la
+        d = gcd(lg, p - 1)
+        if la % d:
+            return None
+        order = (p - 1) // d
+        x = (la // d) * arith.invert(lg // d, order) % order if order > 1 else 0
+        return x, order
+
+
+_tables: Optional[DlogTables] = None
+_tables_lock = threading.Lock()
+_tables_checked = False
+
+
+def get_tables() -> Optional[DlogTables]:
+    """Таблицы из DLOG_TABLE_FILE (открываются один раз на процесс) или None, если файла нет."""
+    global _tables, _tables_checked
+    if _tables_checked:
+        return _tables
+    with _tables_lock:
+        if not _tables_checked:
+            if os.path.exists(DLOG_TABLE_FILE):
+                _tables = DlogTables(DLOG_TABLE_FILE)
+            _tables_checked = True
+    return _tables
+
+
+def lookup(g: int, a: int, n: int) -> Optional[Tuple[int, int]]:
+    """DlogTables.log по общему файлу; None, если таблиц нет или n в них нет."""
+    tables = get_tables()
+    return tables.log(g, a, n) if tables is not None else None
+
+
+def covers(n: int) -> bool:
+    tables = get_tables()
+    return tables is not None and n in tables
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сборка таблиц индексов для простых до границы.")
+    parser.add_argument("--bound", type=int, default=DLOG_TABLE_BOUND, help="наибольшее простое")
+    parser.add_argument("--out", default=DLOG_TABLE_FILE, help="файл таблиц")
+    args = parser.parse_args(argv)
+    build(args.out, args.bound)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,586 @@
+# engine.py
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from hellman import hellman
+from adleman import adleman
+from adleman2 import adleman2
+from SF import solve_polynomial
+from factor import factor
+from gcd import gcd_polynomials
+from gcdz import gcdz
+from factorz import factorz
+from roots import roots
+from polynomial import SparsePolynomialZp, parse_terms
+from dlog import dlog
+from order import order, primroot
+from numtheory import element_order, primitive_root
+from sympy import isprime
+from metrics import METRICS, input_size
+from budget import Budget, OutOfBudget
+import cost
+import dlogtable
+import instrument
+
+# Общая часть бота: разбор аргументов, кэш результатов и пул исполнителей.
+# Всё, что не зависит от Telegram, живёт здесь.
+
+DEFAULT_TIMEOUT = 10.0
+
+# Пул потоков для решателей (по умолчанию как у asyncio)
+SOLVER_WORKERS = int(os.getenv("SOLVER_WORKERS", min(32, (os.cpu_count() or 1) + 4)))
+EXECUTOR = ThreadPoolExecutor(max_workers=SOLVER_WORKERS)
+METRICS.workers = SOLVER_WORKERS
+
+# Медленная очередь для тяжёлых, но посильных задач: свой пул и свой таймаут,
+# чтобы они не занимали воркеры быстрых команд
+SLOW_WORKERS = int(os.getenv("SLOW_WORKERS", "1"))
+SLOW_EXECUTOR = ThreadPoolExecutor(max_workers=SLOW_WORKERS)
+SLOW_TIMEOUT = cost.SLOW_TIMEOUT
+
+# Наибольшая граница факторной базы для /adleman2 g a n B
+MAX_BASE_BOUND = int(os.getenv("MAX_BASE_BOUND", "20000"))
+
+# Наибольшая степень многочлена в записи вида x^10000 + x + 1 mod 2
+MAX_POLY_DEGREE = int(os.getenv("MAX_POLY_DEGREE", "100000"))
+
+# Сколько готовых ответов держать в памяти
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+
+# Контрольные точки прерванных задач: сколько держать в памяти и (необязательно)
+# каталог, где они лежат в JSON — общий для реплик бота
+CHECKPOINT_CACHE_SIZE = int(os.getenv("CHECKPOINT_CACHE_SIZE", "256"))
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR")
+# За сколько секунд до таймаута решатель должен остановиться и отдать прогресс
+CHECKPOINT_MARGIN = float(os.getenv("CHECKPOINT_MARGIN", "0.5"))
+
+
+class InputError(ValueError):
+    """Некорректный ввод; сообщение показывается пользователю как есть."""
+
+
+class UsageError(InputError):
+    """Некорректный ввод, к сообщению добавляется формат команды."""
+
+
+class Rejected(InputError):
+    """Задача заведомо не уложится во время — отклонена до запуска."""
+
+
+class Suspended(asyncio.TimeoutError):
+    """Время вышло, но прогресс сохранён: тот же запрос продолжит с контрольной точки."""
+
+
+def is_prime(n: int) -> bool:
+    """
+    Проверяет, является ли число простым.
+
+    :param n: Число для проверки.
+    :return: True, если число простое, иначе False.
+    """
+    if n <= 1:
+        return False
+    if n <= 3:
+        return True
+    if n % 2 == 0 or n % 3 == 0:
+        return False
+    i = 5
+    while i * i <= n:
+        if n % i == 0 or n % (i + 2) == 0:
+            return False
+        i += 6
+    return True
+
+
+def _to_ints(tokens: Sequence[str]) -> List[int]:
+    try:
+        return [int(t) for t in tokens]
+    except ValueError:
+        raise UsageError("Все аргументы должны быть целыми числами.")
+
+
+def _check_prime(p: int):
+    if not is_prime(p):
+        raise InputError("Модуль p должен быть простым числом.")
+
+
+def parse_log_args(tokens: Sequence[str]) -> Tuple[int, int, int]:
+    """Аргументы g a n для задач дискретного логарифма."""
+    if len(tokens) != 3:
+        raise UsageError("Требуется три аргумента.")
+    g, a, n = _to_ints(tokens)
+    return g, a, n
+
+
+def _check_prime_modulus(n: int):
+    if n < 3 or not isprime(n):
+        raise InputError("Модуль n должен быть простым числом.")
+
+
+def parse_dlog_args(tokens: Sequence[str]) -> Tuple[int, int, int]:
+    """Аргументы g a n для /dlog; n — простое, g и a не делятся на n."""
+    g, a, n = parse_log_args(tokens)
+    _check_prime_modulus(n)
+    if g % n == 0 or a % n == 0:
+        raise InputError("g и a не должны делиться на n.")
+    return g, a, n
+
+
+def parse_order_args(tokens: Sequence[str]) -> Tuple[int, int]:
+    """Аргументы g n для /order."""
+    if len(tokens) != 2:
+        raise UsageError("Требуется два аргумента.")
+    g, n = _to_ints(tokens)
+    _check_prime_modulus(n)
+    if g % n == 0:
+        raise InputError("g не должно делиться на n.")
+    return g, n
+
+
+def parse_primroot_args(tokens: Sequence[str]) -> Tuple[int]:
+    """Аргумент n для /primroot."""
+    if len(tokens) != 1:
+        raise UsageError("Требуется один аргумент.")
+    (n,) = _to_ints(tokens)
+    _check_prime_modulus(n)
+    return (n,)
+
+
+def check_generator(g: int, a: int, n: int, *rest):
+    """
+    Проверка перед решателями, которые считают g порождающим (hellman,
+    adleman, adleman2). Выполняется в пуле: разложение n - 1 может быть
+    долгим, а решатель потом возьмёт его из того же кэша.
+    """
+    _check_prime_modulus(n)
+    if g % n == 0 or a % n == 0:
+        raise InputError("g и a не должны делиться на n.")
+    ord_g, _ = element_order(g % n, n)
+    if ord_g != n - 1:
+        raise InputError(
+            f"g = {g} не порождающий по модулю {n}: ord(g) = {ord_g}, а не {n - 1}. "
+            f"Наименьший порождающий — {primitive_root(n)} (/primroot {n}); "
+            f"для произвольного g есть /dlog."
+        )
+
+
+def parse_adleman2_args(tokens: Sequence[str]) -> tuple:
+    """Аргументы g a n [B]; B — граница факторной базы (по умолчанию S = {2, 3, 5})."""
+    if len(tokens) not in (3, 4):
+        raise UsageError("Требуется три или четыре аргумента.")
+    values = _to_ints(tokens)
+    if len(values) == 4 and not 5 <= values[3] <= MAX_BASE_BOUND:
+        raise InputError(f"Граница факторной базы B должна быть от 5 до {MAX_BASE_BOUND}.")
+    return tuple(values)
+
+
+def _is_term_syntax(text: str) -> bool:
+    return "x" in text.lower()
+
+
+def _split_modulus(text: str) -> Tuple[str, int]:
+    """Запись "... mod p": возвращает часть до mod и простое p."""
+    body, sep, modulus = text.rpartition("mod")
+    if not sep:
+        raise UsageError("В записи через x нужно указать модуль: ... mod p.")
+    try:
+        p = int(modulus)
+    except ValueError:
+        raise UsageError("После mod должно быть целое число p.")
+    _check_prime(p)
+    return body, p
+
+
+def _parse_terms(text: str, p: int) -> SparsePolynomialZp:
+    try:
+        f = SparsePolynomialZp.parse(text, p)
+    except ValueError as e:
+        raise UsageError(f"Многочлен: {e}.")
+    if f.deg() > MAX_POLY_DEGREE:
+        raise InputError(f"Степень многочлена должна быть не больше {MAX_POLY_DEGREE}.")
+    return f
+
+
+def parse_poly_args(tokens: Sequence[str]) -> Tuple[List[int], int]:
+    """Аргументы c0 c1 ... cN p или x^N + ... + c0 mod p для задач над Z_p[x]."""
+    text = " ".join(tokens)
+    if _is_term_syntax(text):
+        body, p = _split_modulus(text)
+        return _parse_terms(body, p), p
+    if len(tokens) < 2:
+        raise UsageError("Требуется как минимум два аргумента.")
+    # Последний аргумент — p, остальные — коэффициенты
+    *coeffs, p = _to_ints(tokens)
+    _check_prime(p)
+    return coeffs, p
+
+
+def parse_gcd_args(tokens: Sequence[str]) -> Tuple[List[int], List[int], int]:
+    """Аргументы c0 ... cN | d0 ... dM p или f | g mod p для НОД двух полиномов."""
+    input_str = " ".join(tokens)
+    if "|" not in input_str:
+        raise UsageError("Требуется разделитель '|'.")
+    if _is_term_syntax(input_str):
+        body, p = _split_modulus(input_str)
+        poly1_str, poly2_str = body.split("|", 1)
+        return _parse_terms(poly1_str, p), _parse_terms(poly2_str, p), p
+    poly1_str, rest = input_str.split("|", 1)
+    rest_parts = rest.split()
+    if len(rest_parts) < 2:
+        raise UsageError("Требуется как минимум два аргумента после '|'.")
+    try:
+        poly1 = list(map(int, poly1_str.split()))
+        *poly2, p = map(int, rest_parts)
+    except ValueError:
+        raise UsageError("Все коэффициенты и p должны быть целыми числами.")
+    _check_prime(p)
+    return poly1, poly2, p
+
+
+def _parse_zx(text: str) -> List[int]:
+    """Многочлен над Z: целые коэффициенты через пробел или запись членами."""
+    if not _is_term_syntax(text):
+        coeffs = _to_ints(text.split())
+        if not coeffs:
+            raise UsageError("Нужны коэффициенты многочлена.")
+        return coeffs
+    try:
+        terms = parse_terms(text)
+    except ValueError as e:
+        raise UsageError(f"Многочлен: {e}.")
+    degree = max(terms, default=0)
+    if degree > MAX_POLY_DEGREE:
+        raise InputError(f"Степень многочлена должна быть не больше {MAX_POLY_DEGREE}.")
+    coeffs = [0] * (degree + 1)
+    for e, c in terms.items():
+        coeffs[degree - e] = c
+    return coeffs
+
+
+def parse_zpoly_args(tokens: Sequence[str]) -> Tuple[List[int]]:
+    """Аргументы c0 c1 ... cN или f(x) для задач над Z[x]."""
+    return (_parse_zx(" ".join(tokens)),)
+
+
+def parse_gcdz_args(tokens: Sequence[str]) -> Tuple[List[int], List[int]]:
+    """Аргументы c0 ... cN | d0 ... dM или f(x) | g(x) для НОД над Z[x]."""
+    input_str = " ".join(tokens)
+    if "|" not in input_str:
+        raise UsageError("Требуется разделитель '|'.")
+    poly1_str, poly2_str = input_str.split("|", 1)
+    return _parse_zx(poly1_str), _parse_zx(poly2_str)
+
+
+class Command:
+    def __init__(self, solver: Callable, parse: Callable, usage: str, example: str,
+                 resumable: bool = False, validate: Optional[Callable] = None):
+        self.solver = solver
+        self.parse = parse
+        self.usage = usage
+        self.example = example
+        # Решатель принимает budget и checkpoint (см. budget.py)
+        self.resumable = resumable
+        # Проверка входа, слишком дорогая для разбора: выполняется в пуле перед решателем
+        self.validate = validate
+
+
+COMMANDS: Dict[str, Command] = {
+    "hellman": Command(hellman, parse_log_args, "/hellman g a n", "/hellman 6 14 109", resumable=True,
+                       validate=check_generator),
+    "adleman": Command(adleman, parse_log_args, "/adleman g a n", "/adleman 6 14 109", resumable=True,
+                       validate=check_generator),
+    "adleman2": Command(adleman2, parse_adleman2_args, "/adleman2 g a n [B]", "/adleman2 6 14 109",
+                        resumable=True, validate=check_generator),
+    "dlog": Command(dlog, parse_dlog_args, "/dlog g a n", "/dlog 6 14 109"),
+    "order": Command(order, parse_order_args, "/order g n", "/order 2 23"),
+    "primroot": Command(primroot, parse_primroot_args, "/primroot n", "/primroot 23"),
+    "factor": Command(factor, parse_poly_args, "/factor c0 c1 c2 ... cN p или /factor x^N + ... + c0 mod p",
+                      "/factor 1 0 1 0 1 1 2", resumable=True),
+    "roots": Command(roots, parse_poly_args, "/roots c0 c1 c2 ... cN p или /roots x^N + ... + c0 mod p",
+                     "/roots 1 0 0 0 4 5"),
+    "SF": Command(solve_polynomial, parse_poly_args, "/SF c0 c1 c2 ... cN p или /SF x^N + ... + c0 mod p",
+                  "/SF 1 0 2 0 1 1 3"),
+    "gcd": Command(gcd_polynomials, parse_gcd_args,
+                   "/gcd c0 c1 c2 ... cN | d0 d1 ... dM p или /gcd f(x) | g(x) mod p", "/gcd 1 0 1 | 1 1 0 1 2"),
+    "factorz": Command(factorz, parse_zpoly_args, "/factorz c0 c1 c2 ... cN или /factorz f(x)",
+                       "/factorz 1 0 0 0 0 -1"),
+    "gcdz": Command(gcdz, parse_gcdz_args,
+                    "/gcdz c0 c1 c2 ... cN | d0 d1 ... dM или /gcdz f(x) | g(x)", "/gcdz 1 0 -1 | 1 -2 1"),
+}
+
+
+def usage_text(command: str) -> str:
+    spec = COMMANDS[command]
+    return f"Формат: {spec.usage}\nПример: {spec.example}"
+
+
+def parse_args(command: str, tokens: Sequence[str]) -> tuple:
+    """Разбирает аргументы команды; бросает InputError/UsageError."""
+    return COMMANDS[command].parse(tokens)
+
+
+def cache_key(command: str, args: tuple) -> tuple:
+    """Нормализованный ключ задачи (списки превращаются в кортежи)."""
+    return (command,) + tuple(tuple(a) if isinstance(a, list) else a for a in args)
+
+
+# Решатели, чей ответ сверяется с готовыми таблицами индексов (dlogtable.py)
+TABLE_CHECKED = ("hellman", "adleman", "adleman2")
+
+
+def _check_with_tables(args: tuple, answer, trace: str):
+    """
+    Если решатель не нашёл x или x не проходит проверку g^x = a, а n есть
+    в таблицах индексов, — ответ из таблицы с пометкой в конце решения.
+    """
+    g, a, n = args[:3]
+    if answer is not None and pow(g, answer, n) == a % n:
+        return answer, trace
+    found = dlogtable.lookup(g, a, n)
+    if found is None:
+        return answer, trace
+    x = found[0]
+    reason = "алгоритм не нашёл ответ" if answer is None else f"x = {answer} не проходит проверку"
+    return x, trace + f"\n\nПо таблице индексов ({reason}): {g}^{x} ≡ {a} (mod {n})\nОтвет: {x}"
+
+
+def solve(command: str, args: tuple, budget: Optional[Budget] = None,
+          checkpoint: Optional[dict] = None) -> Tuple[str, str]:
+    """
+    Синхронно решает задачу.
+
+    :param budget: Бюджет для решателей с контрольными точками (остальные его не видят).
+    :param checkpoint: Контрольная точка, с которой продолжить.
+    :return: Пара (краткий ответ, подробное решение).
+    :raises OutOfBudget: бюджет исчерпан, в исключении — контрольная точка.
+    """
+    spec = COMMANDS[command]
+    if spec.validate is not None and checkpoint is None:
+        spec.validate(*args)
+    kwargs = {"budget": budget, "checkpoint": checkpoint} if spec.resumable else {}
+    session = instrument.session(command)
+    if session is None:
+        result = spec.solver(*args, **kwargs)
+    else:
+        result = None
+        try:
+            with session:
+                result = spec.solver(*args, **kwargs)
+        finally:
+            trace = result[1] if isinstance(result, tuple) else result
+            if trace is not None:
+                session.count("trace_lines", trace.count("\n") + 1)
+            METRICS.observe_solver(session)
+            instrument.finish(session)
+    # Решатели логарифмов возвращают (ответ, решение), полиномиальные — только текст
+    if isinstance(result, tuple):
+        answer, trace = result
+        if command in TABLE_CHECKED:
+            answer, trace = _check_with_tables(args, answer, trace)
+        return str(answer), trace
+    lines = [line for line in result.splitlines() if line.strip()]
+    return (lines[-1].strip() if lines else ""), result
+
+
+class ResultCache:
+    """LRU кэш готовых ответов, общий для обработчиков и пакетного режима."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[tuple, Tuple[str, str]]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[Tuple[str, str]]:
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key: tuple, value: Tuple[str, str]):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+RESULTS = ResultCache(RESULT_CACHE_SIZE)
+
+
+class CheckpointStore:
+    """
+    Контрольные точки прерванных задач по ключу задачи: LRU в памяти и,
+    если задан каталог, JSON файлы в нём. Пишется из рабочих потоков,
+    поэтому под блокировкой.
+    """
+
+    def __init__(self, maxsize: int, directory: Optional[str] = None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self._data: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: tuple) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, key: tuple) -> Optional[dict]:
+        with self._lock:
+            checkpoint = self._data.get(key)
+        if checkpoint is None and self.directory:
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    checkpoint = json.load(f)
+            except (OSError, ValueError):
+                return None
+        return checkpoint
+
+    def put(self, key: tuple, checkpoint: dict):
+        with self._lock:
+            self._data[key] = checkpoint
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        if self.directory:
+            tmp = self._path(key) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(checkpoint, f, ensure_ascii=False)
+            os.replace(tmp, self._path(key))
+
+    def pop(self, key: tuple):
+        with self._lock:
+            self._data.pop(key, None)
+        if self.directory:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+
+CHECKPOINTS = CheckpointStore(CHECKPOINT_CACHE_SIZE, CHECKPOINT_DIR)
+
+
+def solve_resumable(command: str, args: tuple, deadline: Optional[float] = None) -> Tuple[str, str]:
+    """
+    solve с дедлайном: продолжает с сохранённой контрольной точки, а если
+    не успевает, сохраняет новую и бросает Suspended.
+    """
+    key = cache_key(command, args)
+    checkpoint = CHECKPOINTS.get(key) if COMMANDS[command].resumable else None
+    try:
+        result = solve(command, args, Budget(deadline), checkpoint)
+    except OutOfBudget as e:
+        CHECKPOINTS.put(key, e.checkpoint)
+        raise Suspended(e.progress)
+    if checkpoint is not None:
+        CHECKPOINTS.pop(key)
+    return result
+
+
+# Вспомогательная функция для выполнения команд с таймаутом
+async def execute_with_timeout(func, *args, timeout=DEFAULT_TIMEOUT, command=None, executor=None):
+    # Задача считается занятой в пуле до фактического завершения,
+    # даже если ожидание уже прервано таймаутом
+    job = (executor or EXECUTOR).submit(func, *args)
+    METRICS.job_submitted()
+    job.add_done_callback(METRICS.job_finished)
+
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        result = await asyncio.wait_for(asyncio.wrap_future(job), timeout=timeout)
+        outcome = "ok"
+        return result
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        raise
+    finally:
+        METRICS.observe(command or func.__name__, time.perf_counter() - start, input_size(args), outcome)
+
+
+def admit(command: str, args: tuple) -> cost.Estimate:
+    """
+    Контроль допуска: оценивает стоимость задачи до запуска.
+
+    :return: Оценка с выбранной очередью (fast / slow).
+    :raises Rejected: если задача не уложится даже в медленную очередь.
+    """
+    estimate = cost.estimate(command, args)
+    if estimate.lane == cost.Estimate.REJECT:
+        METRICS.rejected[command] = METRICS.rejected.get(command, 0) + 1
+        raise Rejected(
+            f"Задача слишком тяжёлая: {estimate.reason}. "
+            f"Оценка времени ~{estimate.seconds:.3g} с, предел {SLOW_TIMEOUT:g} с."
+        )
+    return estimate
+
+
+# Задачи, которые уже считаются: ключ -> общая asyncio задача
+IN_FLIGHT: Dict[tuple, "asyncio.Task"] = {}
+# Их оценки: одинаковый запрос во время счёта не оценивается заново
+FLIGHT_ESTIMATES: Dict[tuple, cost.Estimate] = {}
+
+
+def known_estimate(command: str, args: tuple) -> Optional[cost.Estimate]:
+    """Оценка такой же задачи, которая уже считается, или None."""
+    return FLIGHT_ESTIMATES.get(cache_key(command, args))
+
+
+def is_cached(command: str, args: tuple) -> bool:
+    return RESULTS.get(cache_key(command, args)) is not None
+
+
+async def _flight(key: tuple, command: str, args: tuple, timeout: Optional[float],
+                  estimate: Optional[cost.Estimate]) -> Tuple[str, str]:
+    try:
+        if estimate is None:
+            # factorint/isprime в оценке — в пуле потоков, не в цикле событий
+            estimate = await asyncio.get_running_loop().run_in_executor(None, admit, command, args)
+        FLIGHT_ESTIMATES[key] = estimate
+        slow = estimate.lane == cost.Estimate.SLOW
+        if timeout is None:
+            timeout = SLOW_TIMEOUT if slow else DEFAULT_TIMEOUT
+        executor = SLOW_EXECUTOR if slow else EXECUTOR
+        # Решатель останавливается чуть раньше таймаута, чтобы успеть сохранить прогресс
+        deadline = time.time() + max(timeout - CHECKPOINT_MARGIN, 0.0)
+        result = await execute_with_timeout(solve_resumable, command, args, deadline, timeout=timeout,
+                                            command=command, executor=executor)
+        RESULTS.put(key, result)
+        return result
+    finally:
+        IN_FLIGHT.pop(key, None)
+        FLIGHT_ESTIMATES.pop(key, None)
+
+
+async def run(command: str, args: tuple, timeout: Optional[float] = None,
+              estimate: Optional[cost.Estimate] = None) -> Tuple[str, str]:
+    """
+    Решает задачу в пуле с учётом кэша результатов.
+
+    Одинаковые задачи, пришедшие пока первая ещё считается, не запускают
+    новую работу, а ждут ту же задачу и получают тот же ответ или тот же таймаут.
+    Без явного timeout очередь и таймаут выбираются по оценке стоимости
+    (admit); заведомо безнадёжные задачи отклоняются исключением Rejected.
+    Решатель с контрольными точками, не успевший к таймауту, сохраняет прогресс
+    и бросает Suspended; повтор той же задачи продолжит с этого места.
+    """
+    key = cache_key(command, args)
+    cached = RESULTS.get(key)
+    if cached is not None:
+        return cached
+    task = IN_FLIGHT.get(key)
+    if task is None:
+        # Оценка — уже внутри общей задачи: одинаковые запросы во время оценки тоже ждут её
+        task = IN_FLIGHT[key] = asyncio.ensure_future(_flight(key, command, args, timeout, estimate))
+    else:
+        METRICS.coalesced[command] = METRICS.coalesced.get(command, 0) + 1
+    # shield: отмена одного ожидающего не должна отменять общую задачу
+    return await asyncio.shield(task)
@@ -1,91 +1,109 @@
 # factor.py
 
 import numpy as np
-from typing import List
-
-class PolynomialZp:
-    def __init__(self, coeffs: List[int], p: int):
-        # Храним коэффициенты от старшей степени к младшей
-        self.coeffs = [c % p for c in coeffs]
-        self.p = p
-        # Удаляем ведущие нули
-        while len(self.coeffs) > 1 and self.coeffs[0] == 0:
-            self.coeffs.pop(0)
-
-    def __str__(self):
-        terms = []
-        degree = len(self.coeffs) - 1
-        for i, c in enumerate(self.coeffs):
-            if c == 0:
-                continue
-            power = degree - i
-            if power == 0:
-                terms.append(str(c))
-            elif power == 1:
-                terms.append(f"{'' if c == 1 else c}x")
-            else:
-                terms.append(f"{'' if c == 1 else c}x^{power}")
-        return " + ".join(terms) or "0"
-
-    def deg(self):
-        return len(self.coeffs) - 1
-
-    def derivative(self):
-        """Вычисление производной полинома."""
-        degree = len(self.coeffs) - 1
-        derived_coeffs = [((degree - i) * c) % self.p for i, c in enumerate(self.coeffs[:-1])]
-        return PolynomialZp(derived_coeffs, self.p)
-
-    def gcd(self, other):
-        """Вычисление НОД двух полиномов."""
-        a, b = self, other
-        while b.coeffs != [0]:
-            a, b = b, a % b
-        return a
-
-    def __mod__(self, other):
-        """Операция деления по модулю полинома."""
-        result = self.coeffs[:]
-        while len(result) >= len(other.coeffs) and result:
-            scale = result[0] * pow(other.coeffs[0], -1, self.p) % self.p
-            for i in range(len(other.coeffs)):
-                result[i] = (result[i] - scale * other.coeffs[i]) % self.p
-            result.pop(0)  # Удаляем старший коэффициент
-        return PolynomialZp(result, self.p) if result else PolynomialZp([0], self.p)
-
-    def __floordiv__(self, other):
-        """Целочисленное деление полиномов."""
-        quotient = []
-        remainder = self.coeffs[:]
-        while len(remainder) >= len(other.coeffs):
-            scale = remainder[0] * pow(other.coeffs[0], -1, self.p) % self.p
-            quotient.append(scale)
-            for i in range(len(other.coeffs)):
-                remainder[i] = (remainder[i] - scale * other.coeffs[i]) % self.p
-            remainder.pop(0)
-        return PolynomialZp(quotient, self.p)
-
-def factor(coeffs: List[int], p: int) -> str:
+from typing import List, Optional
+from sympy import primefactors
+from budget import OutOfBudget
+import instrument
+import polycache
+from polynomial import PolynomialZp, SparsePolynomialZp
+from roots import multiplicity, split_linear
+
+
+def precheck(f: PolynomialZp) -> (str, Optional[str]):
+    """
+    Проверка до построения Q: линейные множители через НОД(f, x^p - x) и тест
+    Рабина — f степени n неприводим, если x^(p^n) ≡ x mod f и
+    НОД(f, x^(p^(n/q)) - x) = 1 для каждого простого q | n.
+    Степени Фробениуса x^(p^k) mod f считаются одна из другой.
+
+    :return: Пара (вывод проверки, ответ или None, если без Q не обойтись).
+    """
+    p, n = f.p, f.deg()
+    # Разложение ищется для нормированного f; старший коэффициент — отдельным множителем
+    lead = f.coeffs[0]
+    f = f.monic()
+    x = PolynomialZp.x(p)
+    solve = "Предварительная проверка (тест Рабина):\n"
+    if n == 1:
+        solve += "deg f = 1: многочлен неприводим.\n"
+        return solve, "Ответ: f неприводим"
+
+    checkpoints = {n // q: q for q in primefactors(n)}
+    for k in range(1, n + 1):
+        # Степени Фробениуса и НОД общие с /roots и повторными запросами (кэш многочленов)
+        frobenius = polycache.frobenius(f, k)
+        if k == 1:
+            solve += f"x^{p} mod f(x) = {frobenius}\n"
+            g = polycache.frobenius_gcd(f, 1)
+            if g.deg() > 0:
+                solve += f"НОД(f, x^{p} - x) = {g} ≠ 1: у f есть корни в Z_{p}\n"
+                h = f
+                factors = [str(lead)] if lead != 1 else []
+                for r in split_linear(g):
+                    linear = PolynomialZp([1, -r], p)
+                    e = multiplicity(h, r)
+                    for _ in range(e):
+                        h = h // linear
+                    factors.append((f"({linear})" if r else "x") + (f"^{e}" if e > 1 else ""))
+                if h.deg() > 0:
+                    factors.append(f"({h})")
+                solve += f"f = {' * '.join(factors)}\n"
+                solve += "Многочлен приводим — матрица Q не строится.\n"
+                return solve, "Ответ: f приводим, f = " + " * ".join(factors)
+            solve += f"НОД(f, x^{p} - x) = 1: корней в Z_{p} нет\n"
+        if k in checkpoints:
+            g = polycache.frobenius_gcd(f, k)
+            solve += f"q = {checkpoints[k]}: НОД(f, x^({p}^{k}) - x) = {g}\n"
+            if g.deg() > 0:
+                solve += f"f имеет неприводимый множитель степени, делящей {k}: f приводим, нужна матрица Q.\n\n"
+                return solve, None
+    if frobenius != x:
+        solve += f"x^({p}^{n}) mod f(x) = {frobenius} ≠ x: f приводим, нужна матрица Q.\n\n"
+        return solve, None
+    solve += f"x^({p}^{n}) mod f(x) = x\n"
+    solve += "Многочлен неприводим — матрица Q не строится.\n"
+    return solve, "Ответ: f неприводим"
+
+
+def factor(coeffs: List[int], p: int, budget=None, checkpoint=None) -> str:
     """
     Факторизует полином над полем Z_p и возвращает подробный вывод.
 
     :param coeffs: Список коэффициентов полинома от старшей к младшей степени.
     :param p: Модуль p для поля Z_p.
+    :param budget: Бюджет (Budget), проверяется после каждой строки Q;
+                   когда исчерпан, бросается OutOfBudget с контрольной точкой.
+    :param checkpoint: Контрольная точка из OutOfBudget для продолжения.
     :return: Строка с подробным описанием шагов факторизации.
     """
     f = PolynomialZp(coeffs, p)
-    solve = f"Факторизовать многочлен:\n{f} c Z_{p}[x]\n\n"
-
     n = f.deg()
-    solve += f"n = deg(f)\n"
-    solve += f"n = {f.deg()}\n\n"
-    
+    if checkpoint:
+        # Уже построенные строки Q и вывод до них
+        solve = checkpoint["trace"]
+        Q = checkpoint["rows"]
+    else:
+        solve = f"Факторизовать многочлен:\n{f} c Z_{p}[x]\n\n"
+
+        solve += f"n = deg(f)\n"
+        solve += f"n = {f.deg()}\n\n"
+        Q = []
+
+        if n >= 1:
+            instrument.phase("rabin")
+            text, answer = precheck(f)
+            solve += text
+            if answer is not None:
+                return solve + answer
+
     # 1) Построить матрицу Q
-    Q = []
-    for j in range(n):  # Для каждого j от 0 до n-1
-        power_coeffs = [1] + [0] * (p * j)
-        x_pj = PolynomialZp(power_coeffs, p)
-        tmp = x_pj % f
+    instrument.phase("q_matrix")
+    for j in range(len(Q), n):  # Для каждого j от 0 до n-1
+        # x^(p*j) mod f — из предыдущей строки умножением на x^p mod f;
+        # готовые строки того же f берутся из кэша многочленов
+        x_pj = SparsePolynomialZp({p * j: 1}, p)
+        tmp = polycache.q_rows(f, j + 1)[j]
         solve += f"{j}: {x_pj} mod f(x) = {tmp} -> "
 
         row = [0] * n
@@ -93,6 +111,10 @@ def factor(coeffs: List[int], p: int) -> str:
             row[n - len(tmp.coeffs) + i] = c
         solve += f'{row[::-1]}\n'
         Q.append(row[::-1])
+        # Стоимость строки — возведение в степень p*j по модулю f
+        if budget is not None and budget.spend(n * n * (p * j).bit_length() + 1) and j + 1 < n:
+            raise OutOfBudget(dict(solver="factor", rows=Q, trace=solve,
+                                   progress=f"построено {j + 1} из {n} строк матрицы Q"))
 
     # Итоговая матрица Q
     Q = np.array(Q, dtype=int)
@@ -0,0 +1,297 @@
+# factorz.py
+
+from itertools import combinations
+from typing import Dict, List, Tuple
+
+from sympy import nextprime
+
+import arith
+import instrument
+from gcdz import content, exact_quotient, format_zx, primitive_gcd, primitive_part
+from modfactor import count_factors, factor_squarefree
+from polynomial import PolynomialZp
+
+# Разложение над Z[x] через разложение по модулю p (схема Цассенхауса):
+#   1) f -> примитивная свободная от квадратов часть s = f / НОД(f, f');
+#   2) простое p, по которому s остаётся свободным от квадратов, из нескольких
+#      кандидатов — с наименьшим числом множителей (считаются по степеням);
+#   3) s mod p раскладывается Кантором–Цассенхаусом (modfactor);
+#   4) множители поднимаются квадратичным многомножительным подъёмом Гензеля
+#      (дерево произведений) до p^(2^j) > 2 |lc| B, B — граница Миньотта;
+#   5) подмножества поднятых множителей перебираются по возрастанию размера;
+#      кандидат отсекается по свободному члену и по границе коэффициентов
+#      до того, как строится целиком и проверяется делением.
+
+# Сколько подходящих простых сравнивать по числу множителей
+PRIME_CANDIDATES = 5
+# Простые перебираются начиная с этого
+FIRST_PRIME = 3
+# Дальше этого простого подходящее для s искать бессмысленно (s вырожден по всем)
+PRIME_LIMIT = 10 ** 5
+
+
+# --- арифметика в (Z / mZ)[x], коэффициенты от старшей степени к младшей ---
+
+def _trim(a: List[int]) -> List[int]:
+    i = 0
+    while i < len(a) - 1 and a[i] == 0:
+        i += 1
+    return a[i:] or [0]
+
+
+def _add(a: List[int], b: List[int], m: int) -> List[int]:
+    n = max(len(a), len(b))
+    a = [0] * (n - len(a)) + a
+    b = [0] * (n - len(b)) + b
+    return _trim([(x + y) % m for x, y in zip(a, b)])
+
+
+def _sub(a: List[int], b: List[int], m: int) -> List[int]:
+    return _add(a, [-c for c in b], m)
+
+
+def _mul(a: List[int], b: List[int], m: int) -> List[int]:
+    result = [0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                result[i + j] += x * y
+    return _trim([c % m for c in result])
+
+
+def _divmod_monic(a: List[int], b: List[int], m: int) -> Tuple[List[int], List[int]]:
+    """Деление на нормированный b по модулю m."""
+    remainder = [c % m for c in a]
+    n = len(b)
+    if len(remainder) < n:
+        return [0], _trim(remainder)
+    quotient = []
+    for i in range(len(remainder) - n + 1):
+        q = remainder[i]
+        quotient.append(q)
+        if q:
+            for j in range(1, n):
+                remainder[i + j] = (remainder[i + j] - q * b[j]) % m
+    return _trim(quotient), _trim(remainder[len(remainder) - n + 1:])
+
+
+def _hensel_step(f, g, h, s, t, m):
+    """
+    f ≡ g h, s g + t h ≡ 1 (mod m), h нормирован -> то же по модулю m²
+    (фон цур Гатен — Герхард, алгоритм 15.10).
+    """
+    m2 = m * m
+    e = _sub(f, _mul(g, h, m2), m2)
+    q, r = _divmod_monic(_mul(s, e, m2), h, m2)
+    g = _add(g, _add(_mul(t, e, m2), _mul(q, g, m2), m2), m2)
+    h = _add(h, r, m2)
+    b = _sub(_add(_mul(s, g, m2), _mul(t, h, m2), m2), [1], m2)
+    c, d = _divmod_monic(_mul(s, b, m2), h, m2)
+    s = _sub(s, d, m2)
+    t = _sub(_sub(t, _mul(t, b, m2), m2), _mul(c, g, m2), m2)
+    return g, h, s, t
+
+
+def hensel_lift(f: List[int], factors: List[PolynomialZp], p: int, steps: int) -> List[List[int]]:
+    """
+    Поднимает f ≡ lc(f) * prod(factors) (mod p) до модуля p^(2^steps).
+    Дерево: f делится на левую половину (со старшим коэффициентом f) и правую
+    (нормированную), пара поднимается, затем каждая половина — рекурсивно.
+
+    :return: Нормированные поднятые множители в том же порядке.
+    """
+    modulus = p ** (1 << steps)
+    if len(factors) == 1:
+        inv = arith.invert(f[0], modulus)
+        return [[int(c * inv % modulus) for c in f]]
+    half = len(factors) // 2
+    F = factors[0].F
+    g0 = PolynomialZp([f[0]], F)
+    for u in factors[:half]:
+        g0 = g0 * u
+    h0 = PolynomialZp([1], F)
+    for u in factors[half:]:
+        h0 = h0 * u
+    _, s0, t0 = g0.xgcd(h0)
+    g, h, s, t = g0.coeffs, h0.coeffs, s0.coeffs, t0.coeffs
+    # Модули p^(2^i) длинные: с gmpy2 коэффициенты шагов считаются в mpz
+    m = arith.mpz(p)
+    for _ in range(steps):
+        g, h, s, t = _hensel_step([c % (m * m) for c in f], g, h, s, t, m)
+        m *= m
+    return hensel_lift(g, factors[:half], p, steps) + hensel_lift(h, factors[half:], p, steps)
+
+
+def mignotte_bound(f: List[int]) -> int:
+    """Граница коэффициентов любого делителя f над Z: 2^deg f * ||f||_2."""
+    return (1 << (len(f) - 1)) * (arith.iroot(sum(c * c for c in f), 2)[0] + 1)
+
+
+def _symmetric(c: int, m: int) -> int:
+    c %= m
+    return c - m if c > m // 2 else c
+
+
+def _squarefree_prime(s: List[int]) -> Tuple[int, List[str]]:
+    """Подходящее простое для s с наименьшим числом множителей и отчёт о выборе."""
+    report = []
+    best = None
+    p = FIRST_PRIME
+    found = 0
+    while found < PRIME_CANDIDATES and p < PRIME_LIMIT:
+        if s[0] % p:
+            image = PolynomialZp(s, p)
+            if image.gcd(image.derivative()).deg() == 0:
+                found += 1
+                count = count_factors(image)
+                report.append(f"  p = {p}: {count} множ. по модулю p")
+                if best is None or count < best[1]:
+                    best = (p, count)
+                if count == 1:
+                    break
+        p = nextprime(p)
+    if best is None:
+        raise ArithmeticError("не нашлось простого, по которому многочлен свободен от квадратов")
+    return best[0], report
+
+
+def recombine(f: List[int], lifted: List[List[int]], modulus: int, bound: int,
+              stats: Dict[str, int]) -> List[List[int]]:
+    """
+    Подмножества поднятых множителей по возрастанию размера (Цассенхаус).
+    До построения произведения кандидат проверяется по свободному члену,
+    после — по границе коэффициентов, и только потом делением.
+    """
+    factors = []
+    remaining = list(range(len(lifted)))
+    d = 1
+    while 2 * d <= len(remaining):
+        found = False
+        lc = f[0]
+        for subset in combinations(remaining, d):
+            stats["subsets"] += 1
+            # Свободный член lc * prod u_i(0) должен делить lc * f(0)
+            if f[-1]:
+                constant = lc
+                for i in subset:
+                    constant = constant * lifted[i][-1] % modulus
+                constant = _symmetric(constant, modulus)
+                if constant == 0 or (lc * f[-1]) % constant:
+                    stats["constant"] += 1
+                    continue
+            candidate = [lc % modulus]
+            for i in subset:
+                candidate = _mul(candidate, lifted[i], modulus)
+            candidate = [_symmetric(c, modulus) for c in candidate]
+            if any(abs(c) > abs(lc) * bound for c in candidate):
+                stats["bound"] += 1
+                continue
+            candidate = primitive_part(candidate)
+            stats["divisions"] += 1
+            quotient = exact_quotient(f, candidate)
+            if quotient is None:
+                continue
+            factors.append(candidate)
+            f = quotient
+            remaining = [i for i in remaining if i not in subset]
+            found = True
+            break
+        if not found:
+            d += 1
+    factors.append(primitive_part(f))
+    return factors
+
+
+def factor_squarefree_zx(s: List[int], log) -> List[List[int]]:
+    """Неприводимые множители примитивного свободного от квадратов s степени ≥ 1."""
+    if len(s) == 2:
+        return [s]
+    instrument.phase("prime_choice")
+    p, report = _squarefree_prime(s)
+    log("Выбор простого (s mod p свободен от квадратов, p ∤ lc):")
+    for line in report:
+        log(line)
+    image = PolynomialZp(s, p)
+    instrument.phase("modular")
+    modular = factor_squarefree(image)
+    log(f"Выбрано p = {p}: s mod p = " + " * ".join(f"({u})" for u in modular))
+    if len(modular) == 1:
+        log("По модулю p многочлен неприводим — значит, неприводим и над Z.")
+        return [s]
+
+    bound = mignotte_bound(s)
+    target = 2 * abs(s[0]) * bound
+    steps = 0
+    while p ** (1 << steps) <= target:
+        steps += 1
+    modulus = p ** (1 << steps)
+    log(f"Граница Миньотта B = 2^{len(s) - 1} * ||s|| ≈ 2^{bound.bit_length()}; "
+        f"поднимаем до p^{1 << steps} > 2 |lc| B ({steps} квадратичных шагов Гензеля)")
+    instrument.phase("hensel")
+    lifted = hensel_lift(s, modular, p, steps)
+
+    stats = {"subsets": 0, "constant": 0, "bound": 0, "divisions": 0}
+    instrument.phase("recombination")
+    factors = recombine(s, lifted, modulus, bound, stats)
+    instrument.count("subsets", stats["subsets"])
+    instrument.count("trial_divisions", stats["divisions"])
+    log(f"Перебор подмножеств из {len(lifted)} поднятых множителей: {stats['subsets']} проверено, "
+        f"{stats['constant']} отсечено по свободному члену, {stats['bound']} — по границе коэффициентов, "
+        f"{stats['divisions']} делений")
+    return factors
+
+
+def factorz(coeffs: List[int]) -> str:
+    """
+    Раскладывает многочлен с целыми коэффициентами на неприводимые над Z[x].
+
+    :param coeffs: Коэффициенты от старшей к младшей степени.
+    :return: Строка с подробным решением; последняя строка — ответ.
+    """
+    f = list(coeffs)
+    while len(f) > 1 and f[0] == 0:
+        f.pop(0)
+    output = ["Разложение над Z[x]:", f"f(x) = {format_zx(f)}", ""]
+    log = output.append
+    if len(f) <= 1:
+        log("f — константа.")
+        log(f"Ответ: f = {f[0] if f else 0}")
+        return "\n".join(output)
+
+    c = content(f)
+    if f[0] < 0:
+        c = -c
+    f = [a // c for a in f]
+    log(f"Содержание: {c}; примитивная часть f(x) = {format_zx(f)}")
+
+    instrument.phase("squarefree")
+    derivative = [a * (len(f) - 1 - i) for i, a in enumerate(f[:-1])]
+    g = primitive_gcd(f, primitive_part(derivative)) if len(f) > 2 else [1]
+    s = primitive_part(exact_quotient(f, g)) if len(g) > 1 else f
+    if len(g) > 1:
+        log(f"НОД(f, f') = {format_zx(g)}: свободная от квадратов часть s(x) = {format_zx(s)}")
+    else:
+        log("НОД(f, f') = 1: f свободен от квадратов, s = f")
+
+    factors = factor_squarefree_zx(s, log)
+
+    # Кратности: сколько раз каждый множитель делит f
+    instrument.phase("multiplicities")
+    result: List[Tuple[List[int], int]] = []
+    rest = f
+    for u in sorted(factors, key=lambda u: (len(u), [abs(a) for a in u])):
+        e = 0
+        while True:
+            quotient = exact_quotient(rest, u)
+            if quotient is None:
+                break
+            rest, e = quotient, e + 1
+        result.append((u, e))
+
+    parts = [f"({format_zx(u)})" + (f"^{e}" if e > 1 else "") for u, e in result]
+    if c != 1:
+        parts.insert(0, str(c))
+    log("")
+    log(f"Неприводимых множителей: {len(result)}")
+    log(f"Ответ: f = {' * '.join(parts)}")
+    return "\n".join(output)
@@ -0,0 +1,155 @@
+# fake_telegram.py
+
+import asyncio
+import email.parser
+import email.policy
+import itertools
+import json
+import time
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+from http_server import Request, Response
+
+# Локальная замена Bot API для нагрузочных прогонов (loadtest.py) без Telegram.
+# Бот запускается с TG_BASE_URL=http://127.0.0.1:PORT/bot и ходит сюда:
+#   - getUpdates отдаёт обновления, которые генератор кладёт через push(),
+#     с long polling как у настоящего API;
+#   - sendMessage/sendDocument только записываются (время, чат, текст);
+#   - getMe, deleteWebhook, setWebhook и прочие служебные методы отвечают
+#     правдоподобными заглушками.
+# Поддерживается ровно то, что вызывает main.py через PTB: параметры приходят
+# формой (x-www-form-urlencoded) или multipart, сложные значения — JSON строкой.
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "ntmc", "username": "ntmc_bot"}
+
+
+class Sent:
+    """Сообщение, которое бот отправил в чат."""
+
+    def __init__(self, chat_id: int, method: str, text: str):
+        self.chat_id = chat_id
+        self.method = method
+        self.text = text
+        self.at = time.monotonic()
+
+
+def _parse_params(request: Request) -> Dict[str, str]:
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/"):
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + request.body)
+        params = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name is None:
+                continue
+            # Файл не нужен — достаточно его имени
+            filename = part.get_filename()
+            params[name] = filename if filename is not None else \
+                part.get_payload(decode=True).decode("utf-8")
+        return params
+    if request.body:
+        return dict(parse_qsl(request.body.decode("utf-8"), keep_blank_values=True))
+    return dict(parse_qsl(request.query, keep_blank_values=True))
+
+
+class FakeBotAPI:
+    """
+    HTTP обработчик для http_server.start_server.
+
+    :param token: Токен, который должен быть в пути (/bot<token>/<метод>).
+    :param on_sent: Вызывается на каждое отправленное ботом сообщение.
+    """
+
+    def __init__(self, token: str, on_sent: Optional[Callable[[Sent], None]] = None):
+        self.prefix = f"/bot{token}/"
+        self.on_sent = on_sent
+        self.sent: List[Sent] = []
+        self.calls: Dict[str, int] = {}
+        self._updates: List[dict] = []
+        self._next_update = itertools.count(1)
+        self._next_message = itertools.count(1)
+        self._arrived = asyncio.Event()
+
+    def push(self, chat_id: int, text: str) -> int:
+        """Кладёт сообщение пользователя в очередь getUpdates; возвращает update_id."""
+        update_id = next(self._next_update)
+        message = {
+            "message_id": next(self._next_message),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "load"},
+            "text": text,
+        }
+        if text.startswith("/"):
+            # CommandHandler узнаёт команду только по сущности bot_command
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        self._updates.append({"update_id": update_id, "message": message})
+        self._arrived.set()
+        return update_id
+
+    async def _get_updates(self, params: Dict[str, str]):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        # offset подтверждает всё, что раньше него
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout > 0:
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    def _send(self, method: str, params: Dict[str, str]):
+        chat_id = int(params["chat_id"])
+        text = params.get("text") or params.get("caption") or ""
+        sent = Sent(chat_id, method, text)
+        self.sent.append(sent)
+        if self.on_sent is not None:
+            self.on_sent(sent)
+        message = {
+            "message_id": next(self._next_message),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+        }
+        if method == "sendDocument":
+            message["document"] = {"file_id": f"doc{message['message_id']}",
+                                   "file_unique_id": f"doc{message['message_id']}",
+                                   "file_name": params.get("document", "")}
+            if text:
+                message["caption"] = text
+        else:
+            message["text"] = text
+        return message
+
+    async def __call__(self, request: Request) -> Response:
+        if not request.path.startswith(self.prefix):
+            return Response.json({"ok": False, "error_code": 401, "description": "Unauthorized"}, 401)
+        method = request.path[len(self.prefix):]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = _parse_params(request)
+        name = method.lower()
+        if name == "getupdates":
+            result = await self._get_updates(params)
+        elif name in ("sendmessage", "senddocument"):
+            result = self._send("sendDocument" if name == "senddocument" else "sendMessage", params)
+        elif name == "getme":
+            result = BOT_USER
+        elif name in ("deletewebhook", "setwebhook", "setmycommands", "close", "logout"):
+            result = True
+        else:
+            return Response.json({"ok": False, "error_code": 404, "description": "Not Found: method"}, 404)
+        return Response.json({"ok": True, "result": result})
+
+
+def dump_sent(sent: List[Sent], path: str):
+    """Все отправленные ботом сообщения в JSON lines (для разбора прогона)."""
+    with open(path, "w", encoding="utf-8") as f:
+        for s in sent:
+            f.write(json.dumps({"chat_id": s.chat_id, "method": s.method, "at": s.at, "text": s.text},
+                               ensure_ascii=False) + "\n")
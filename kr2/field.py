@@ -0,0 +1,78 @@
+# field.py
+
+from functools import lru_cache
+from typing import Dict, List, Sequence
+
+from sympy import isprime
+
+import arith
+
+# Контекст арифметики по модулю m: создаётся один раз на модуль (context(m))
+# и передаётся в код многочленов и матриц вместо голого числа.
+#   - для простых p ≤ INVERSE_TABLE_MAX — полная таблица обратных;
+#   - для остальных модулей (в т.ч. составного n - 1 в индексном исчислении)
+#     найденные обратные запоминаются, не больше INVERSE_MEMO_SIZE;
+#   - batch_inverse — обратные пачкой приёмом Монтгомери (одно обращение).
+
+INVERSE_TABLE_MAX = 1 << 16
+# Сколько запомненных обратных держать на контекст (контексты живут долго)
+INVERSE_MEMO_SIZE = 1 << 16
+# Сколько контекстов держать (таблица для p ~ 2^16 — около 2 МБ)
+CONTEXT_CACHE_SIZE = 32
+
+
+class Zmod:
+    def __init__(self, m: int):
+        self.m = m
+        self.is_field = isprime(m)
+        self.inverses = None
+        self._memo: Dict[int, int] = {}
+        if self.is_field and m <= INVERSE_TABLE_MAX:
+            # inv(i) = -(p // i) * inv(p mod i): вся таблица за O(p)
+            inverses = [0, 1] + [0] * (m - 2)
+            for i in range(2, m):
+                inverses[i] = -(m // i) * inverses[m % i] % m
+            self.inverses = inverses
+
+    def inv(self, a: int) -> int:
+        """Обратный к a; ValueError, если a необратим (как у pow(a, -1, m))."""
+        a %= self.m
+        if self.inverses is not None:
+            result = self.inverses[a]
+            if not result:
+                raise ValueError("base is not invertible for the given modulus")
+            return result
+        result = self._memo.get(a)
+        if result is None:
+            if len(self._memo) >= INVERSE_MEMO_SIZE:
+                # Проще и безопаснее для потоков, чем LRU: начать заново
+                self._memo.clear()
+            result = self._memo[a] = arith.invert(a, self.m)
+        return result
+
+    def batch_inverse(self, values: Sequence[int]) -> List[int]:
+        """
+        Обратные ко всем values приёмом Монтгомери: префиксные произведения,
+        одно обращение, обратный проход — 3(k - 1) умножений вместо k обращений.
+        """
+        m = self.m
+        prefix = []
+        acc = 1
+        for v in values:
+            acc = acc * v % m
+            prefix.append(acc)
+        if not prefix:
+            return []
+        acc = self.inv(acc)
+        result = [0] * len(prefix)
+        for i in range(len(prefix) - 1, 0, -1):
+            result[i] = acc * prefix[i - 1] % m
+            acc = acc * values[i] % m
+        result[0] = acc
+        return result
+
+
+@lru_cache(maxsize=CONTEXT_CACHE_SIZE)
+def context(m: int) -> Zmod:
+    """Общий контекст для модуля m."""
+    return Zmod(m)
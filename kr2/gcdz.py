@@ -0,0 +1,265 @@
+# gcdz.py
+
+from math import gcd
+from functools import reduce
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from sympy import prevprime
+
+import arith
+import instrument
+from parallel import map_shards
+from polynomial import PolynomialZp
+
+# НОД многочленов над Z[x] модульным методом: вместо вычислений над Q, где
+# коэффициенты промежуточных остатков разрастаются, считаются образы
+# НОД(f mod p, g mod p) по нескольким простым p < 2^31 (в пуле процессов),
+# склеиваются по КТО и восстанавливаются рациональной реконструкцией.
+#   - простое, у которого степень образа больше наименьшей, неудачное;
+#     если степень упала — неудачными были все предыдущие;
+#   - кандидат проверяется делением f и g на него над Z.
+# Время ограничено размером коэффициентов ответа, а не промежуточных выражений.
+
+# Простые берутся подряд вниз от 2^31
+PRIME_START = 1 << 31
+# Образы считаются в пуле процессов, начиная с такого deg f * deg g * число простых
+PARALLEL_MIN_WORK = 200_000
+# Сколько простых добавлять за раз, если кандидат не прошёл проверку
+EXTRA_PRIMES = 2
+
+
+def _primes(start: int) -> Iterator[int]:
+    p = start
+    while p > 2:
+        p = prevprime(p)
+        yield p
+
+
+def content(coeffs: List[int]) -> int:
+    return reduce(gcd, coeffs, 0)
+
+
+def primitive_part(coeffs: List[int]) -> List[int]:
+    """Делит на содержание; старший коэффициент делается положительным."""
+    c = content(coeffs)
+    if c == 0:
+        return [0]
+    if coeffs[0] < 0:
+        c = -c
+    return [a // c for a in coeffs]
+
+
+def format_zx(coeffs: List[int]) -> str:
+    """Многочлен с целыми коэффициентами (со знаками)."""
+    terms = []
+    degree = len(coeffs) - 1
+    for i, c in enumerate(coeffs):
+        if c == 0:
+            continue
+        power = degree - i
+        sign = "-" if c < 0 else "+"
+        a = abs(c)
+        if power == 0:
+            body = str(a)
+        else:
+            body = ("" if a == 1 else str(a)) + ("x" if power == 1 else f"x^{power}")
+        terms.append((sign, body))
+    if not terms:
+        return "0"
+    first_sign, first = terms[0]
+    text = ("-" if first_sign == "-" else "") + first
+    return text + "".join(f" {sign} {body}" for sign, body in terms[1:])
+
+
+def _strip(coeffs: List[int]) -> List[int]:
+    i = 0
+    while i < len(coeffs) - 1 and coeffs[i] == 0:
+        i += 1
+    return coeffs[i:] or [0]
+
+
+def exact_quotient(f: List[int], h: List[int]) -> Optional[List[int]]:
+    """f / h над Z (деление столбиком) или None, если не делится нацело."""
+    remainder = f[:]
+    m = len(h)
+    if len(remainder) < m:
+        return None if any(remainder) else [0]
+    quotient = []
+    for i in range(len(remainder) - m + 1):
+        q, r = divmod(remainder[i], h[0])
+        if r:
+            return None
+        quotient.append(q)
+        if q:
+            for j in range(1, m):
+                remainder[i + j] -= q * h[j]
+    if any(remainder[len(remainder) - m + 1:]):
+        return None
+    return quotient
+
+
+def divides(h: List[int], f: List[int]) -> bool:
+    """Делится ли f на h над Z."""
+    return exact_quotient(f, h) is not None
+
+
+def rational_reconstruction(a: int, m: int) -> Optional[Tuple[int, int]]:
+    """
+    Дробь r/s ≡ a (mod m) с |r|, s ≤ √(m/2) (расширенный алгоритм Евклида,
+    остановленный на середине) или None, если такой нет.
+    """
+    bound = arith.iroot(m // 2, 2)[0]
+    r0, r1 = m, a % m
+    s0, s1 = 0, 1
+    while r1 > bound:
+        q = r0 // r1
+        r0, r1 = r1, r0 - q * r1
+        s0, s1 = s1, s0 - q * s1
+    if s1 == 0 or abs(s1) > bound or gcd(r1, abs(s1)) != 1:
+        return None
+    if s1 < 0:
+        r1, s1 = -r1, -s1
+    return r1, s1
+
+
+def _images(f: List[int], g: List[int], primes: Tuple[int, ...], lo: int, hi: int) -> List[List[int]]:
+    """Нормированные НОД(f mod p, g mod p) для primes[lo:hi]."""
+    images = []
+    for p in primes[lo:hi]:
+        images.append(PolynomialZp(f, p).gcd(PolynomialZp(g, p)).monic().coeffs)
+    return images
+
+
+def _reconstruct(residues: List[int], modulus: int) -> Optional[List[int]]:
+    """Коэффициенты нормированного НОД над Q -> примитивный многочлен над Z."""
+    fractions = []
+    for a in residues:
+        rational = rational_reconstruction(a, modulus)
+        if rational is None:
+            return None
+        fractions.append(rational)
+    denominator = reduce(lambda x, y: x * y // gcd(x, y), (s for _, s in fractions), 1)
+    return primitive_part([r * (denominator // s) for r, s in fractions])
+
+
+def primes_needed(f: List[int], g: List[int]) -> int:
+    """
+    Сколько простых взять сразу: граница Миньотта для коэффициентов делителя
+    меньшего многочлена, с запасом под рациональную реконструкцию (модуль > 2 B^2).
+    """
+    a = f if len(f) <= len(g) else g
+    d = len(a) - 1
+    norm = arith.iroot(sum(c * c for c in a), 2)[0] + 1
+    bound = (1 << d) * norm * abs(gcd(f[0], g[0]))
+    return (2 * bound.bit_length() + 2) // 30 + 1
+
+
+def primitive_gcd(f: List[int], g: List[int], log: Callable[[str], None] = None) -> List[int]:
+    """
+    НОД примитивных многочленов f, g степени ≥ 1 модульным методом.
+
+    :param log: Функция для строк подробного решения (необязательно).
+    """
+    log = log or (lambda msg: None)
+    lead = f[0] * g[0]
+    primes = _primes(PRIME_START)
+    batch = primes_needed(f, g)
+    log(f"Граница Миньотта: для начала берём {batch} простых < 2^31")
+
+    best_degree = None
+    used: List[int] = []
+    images: List[List[int]] = []
+    candidate = None
+    while True:
+        # Простые, делящие старшие коэффициенты, меняют степень образов — пропускаем
+        chunk = []
+        while len(chunk) < batch:
+            p = next(primes)
+            if lead % p:
+                chunk.append(p)
+        work = (len(f) - 1) * (len(g) - 1) * len(chunk)
+        instrument.phase("images")
+        # Образы могут считаться в пуле процессов — учитываем их здесь
+        instrument.count("modular_images", len(chunk))
+        results = []
+        for shard in map_shards(_images, (f, g, tuple(chunk)), 0, len(chunk), 1,
+                                parallel=work >= PARALLEL_MIN_WORK):
+            results.extend(shard)
+
+        for p, image in zip(chunk, results):
+            degree = len(image) - 1
+            if best_degree is None or degree < best_degree:
+                if best_degree is not None:
+                    log(f"p = {p}: степень образа упала до {degree} — "
+                        f"предыдущие {len(used)} простых неудачные, начинаем заново")
+                best_degree, used, images = degree, [], []
+            elif degree > best_degree:
+                log(f"p = {p}: степень образа {degree} > {best_degree} — неудачное простое, пропускаем")
+                continue
+            used.append(p)
+            images.append(image)
+        log(f"Образов степени {best_degree}: {len(used)} (последнее простое {used[-1]})")
+
+        if best_degree == 0:
+            candidate = [1]
+            log("Образ НОД — константа: f и g взаимно просты")
+            break
+
+        # КТО по каждому коэффициенту нормированного образа
+        instrument.phase("crt")
+        modulus = 1
+        residues = [0] * (best_degree + 1)
+        for p, image in zip(used, images):
+            inv = arith.invert(modulus % p, p)
+            residues = [r + modulus * ((v - r) * inv % p) for r, v in zip(residues, image)]
+            modulus *= p
+        log(f"КТО по {len(used)} простым: модуль ~2^{modulus.bit_length()}")
+        instrument.phase("reconstruction")
+        candidate = _reconstruct(residues, modulus)
+        if candidate is None:
+            log("Рациональная реконструкция не удалась — нужен больший модуль")
+        elif divides(candidate, f) and divides(candidate, g):
+            log(f"Кандидат h(x) = {format_zx(candidate)}")
+            log("Проверка делением над Z: h | f и h | g ✓")
+            break
+        else:
+            log(f"Кандидат h(x) = {format_zx(candidate)} не делит f и g — добавляем простые")
+        batch = EXTRA_PRIMES
+
+    return candidate
+
+
+def gcdz(coeffs1: List[int], coeffs2: List[int]) -> str:
+    """
+    Вычисляет НОД двух многочленов над Z[x] модульным методом и возвращает подробный вывод.
+
+    :param coeffs1: Коэффициенты первого полинома от старшей к младшей степени.
+    :param coeffs2: Коэффициенты второго полинома от старшей к младшей степени.
+    :return: Строка с подробным решением; последняя строка — ответ.
+    """
+    f, g = _strip(list(coeffs1)), _strip(list(coeffs2))
+    output = ["НОД многочленов над Z[x] (модульный алгоритм):",
+              f"f(x) = {format_zx(f)}", f"g(x) = {format_zx(g)}", ""]
+    log = output.append
+
+    if f == [0] or g == [0]:
+        result = g if f == [0] else f
+        result = [-a for a in result] if result[0] < 0 else result
+        log("Один из многочленов нулевой: НОД — другой многочлен.")
+        log(f"Ответ: НОД = {format_zx(result)}")
+        return "\n".join(output)
+
+    c = gcd(content(f), content(g))
+    f, g = primitive_part(f), primitive_part(g)
+    log(f"НОД содержаний c = {c}; дальше работаем с примитивными частями")
+    if len(f) == 1 or len(g) == 1:
+        log("Один из многочленов — константа: НОД = c")
+        log(f"Ответ: НОД = {c}")
+        return "\n".join(output)
+
+    candidate = primitive_gcd(f, g, log)
+    result = [c * a for a in candidate]
+    log("")
+    log(f"НОД = c * h(x) = {format_zx(result)}")
+    log(f"Ответ: НОД = {format_zx(result)}")
+    return "\n".join(output)
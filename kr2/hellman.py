@@ -1,12 +1,88 @@
-from sympy import factorint
-
-def hellman(g, a, n):
+from parallel import get_process_pool, in_worker
+from numtheory import factor_group_order
+from budget import CHECK_EVERY, OutOfBudget
+import arith
+import instrument
+
+# С какого простого делителя n-1 подзадачу имеет смысл отдавать в отдельный процесс
+PARALLEL_MIN_PRIME = 5000
+
+
+def _solve_prime(g, a, n, idx, p, j, budget=None, partial=None):
+    """
+    Подзадача Полига–Хеллмана для одного простого p | n-1 (p^j || n-1).
+
+    :param budget: Бюджет; при исчерпании во время построения таблицы бросается
+                   OutOfBudget с частично построенной таблицей.
+    :param partial: Частичная таблица из такого OutOfBudget.
+    :return: (строки расчёта таблицы a_idx, строки вывода таблицы, x mod p^j, строки решения для x).
+    """
+    if partial:
+        table_log = partial["table_log"]
+        table = dict(enumerate(partial["table"]))
+    else:
+        table_log = []
+        table = {0: 1}
+        table[1] = arith.powmod(g, n // p, n)
+        table_log.append(f"считаем значения таблицы a{idx+1}")
+        table_log.append(f"a{idx+1}_1 = g^(n/p) mod n = {g}^{n}/{p} mod {n} = {g}^{n//p} mod {n} = {table[1]}")
+    # Степени считаем накопительным умножением вместо pow на каждом шаге
+    start = len(table)
+    value, step, modulus = arith.mpz(table[start - 1]), arith.mpz(table[1]), arith.mpz(n)
+    for i in range(start, p):
+        if i % CHECK_EVERY == 0 and i != start and budget is not None and budget.spend(CHECK_EVERY):
+            raise OutOfBudget(dict(table=[int(v) for v in table.values()], table_log=table_log))
+        value = value * step % modulus
+        table[i] = value
+        table_log.append(f"a{idx+1}_{i} = a{idx+1}_1^{i} mod {n} = {value}")
+    table_log.append("")
+
+    column_width = max(len(str(value)) for value in table.values()) + 2
+    header = f"a{idx+1}:".ljust(4) + "|" + "|".join(f"{str(key).ljust(column_width)}" for key in table.keys())
+    values = "    |" + "|".join(f"{str(value).ljust(column_width)}" for value in table.values())
+    table_view = [f"{header}|", f"{values}|", ""]
+
+    # Обратная таблица: значение -> первый индекс с этим значением
+    index = {}
+    for key, value in table.items():
+        index.setdefault(value, key)
+
+    x_log = []
+    b = a
+    x_partial = []
+    x_log.append(f"{idx}) для p = {p}; степень j = {j}\nx mod ")
+
+    for k in range(j):
+        b_k = arith.powmod(b, n // (p ** (k + 1)), n)
+        x_k = index[b_k]
+        x_partial.append(x_k)
+
+        y = sum(x_partial[l] * (p ** l) for l in range(k + 1))
+        b = (a * arith.powmod(g, -y, n)) % n
+
+        x_log.append(f"  Шаг {k + 1}:\n    b = (a * g^(-y))^({n} / {p}^{k + 1}) mod {n}\n      = ({a} * {g}^(-{y}))^({n // (p ** (k + 1))}) mod {n}\n      = {b_k}\n   x{k} = {x_k}\n    y = {y}")
+    x_log.append("")
+
+    x = sum(x_partial[k] * (p ** k) for k in range(j))
+    return table_log, table_view, x, x_log
+
+
+def hellman(g, a, n, budget=None, checkpoint=None):
+    """
+    Дискретный логарифм алгоритмом Полига–Хеллмана.
+
+    :param budget: Бюджет (Budget); при исчерпании бросается OutOfBudget с
+                   контрольной точкой: готовые подзадачи и частичные таблицы.
+    :param checkpoint: Контрольная точка из OutOfBudget для продолжения.
+    :return: Пара (x, подробное решение).
+    """
     output = []
 
     def log(msg):
         output.append(msg)
 
-    factors = factorint(n - 1)
+    instrument.phase("factorint")
+    factors = factor_group_order(n)
     formatted_factors = " * ".join([f"{factor}^{power}" for factor, power in factors.items()])
     log(f"раскладываем {n-1}: {formatted_factors}\n")
 
@@ -14,48 +90,56 @@ def hellman(g, a, n):
     for i, p in enumerate(p_list):
         log(f"p{i+1} = {p}")
 
-    a_values = [{0: 1} for _ in p_list]
     log(f"\nзначения для первых элементов таблиц всегда = 1\n")
 
-    for idx, p in enumerate(p_list):
-        a_values[idx][1] = pow(g, n // p, n)
-        log(f"считаем значения таблицы a{idx+1}")
-        log(f"a{idx+1}_1 = g^(n/p) mod n = {g}^{n}/{p} mod {n} = {g}^{n//p} mod {n} = {a_values[idx][1]}")
-
-        for i in range(2, p):
-            a_values[idx][i] = pow(a_values[idx][1], i, n)
-            log(f"a{idx+1}_{i} = a{idx+1}_1^{i} mod {n} = {a_values[idx][i]}")
-        log("")
+    # Подзадачи по разным простым независимы; крупные считаем в пуле процессов
+    tasks = [(g, a, n, idx, p, factors[p]) for idx, p in enumerate(p_list)]
+    # Готовые подзадачи и недостроенные таблицы из контрольной точки
+    done = {idx: tuple(part) for idx, part in checkpoint["parts"]} if checkpoint else {}
+    partial = {idx: state for idx, state in checkpoint["partial"]} if checkpoint else {}
+    pending = [task for task in tasks if task[3] not in done]
+    instrument.phase("subgroups")
+    # Подзадачи в пуле считаются здесь: дочерние процессы сессии не видят
+    instrument.count("subgroup_tables", len(pending))
+    instrument.count("table_entries", sum(task[4] for task in pending))
+    big = sum(1 for p in p_list if p >= PARALLEL_MIN_PRIME)
+    if big >= 2 and not in_worker():
+        futures = [(task[3], get_process_pool().submit(_solve_prime, *task, budget, partial.get(task[3])))
+                   for task in pending]
+        for idx, future in futures:
+            try:
+                done[idx] = future.result()
+            except OutOfBudget as e:
+                partial[idx] = e.checkpoint
+    else:
+        for task in pending:
+            try:
+                done[task[3]] = _solve_prime(*task, budget, partial.get(task[3]))
+            except OutOfBudget as e:
+                partial[task[3]] = e.checkpoint
+                break
+            if budget is not None and budget.spend(0) and len(done) < len(tasks):
+                break
+    if len(done) < len(tasks):
+        raise OutOfBudget(dict(
+            solver="hellman",
+            parts=[[idx, list(part)] for idx, part in done.items()],
+            partial=[[idx, state] for idx, state in partial.items() if idx not in done],
+            progress=f"решено {len(done)} из {len(tasks)} подзадач по простым делителям n-1",
+        ))
+    parts = [done[idx] for idx in range(len(tasks))]
+    instrument.phase("crt")
+
+    for table_log, _, _, _ in parts:
+        output.extend(table_log)
 
     log("посчитали таблицы:")
-    for i, a_dict in enumerate(a_values):
-        column_width = max(len(str(value)) for value in a_dict.values()) + 2
-        index_width = max(len(str(key)) for key in a_dict.keys()) + 2
-        header = f"a{i+1}:".ljust(4) + "|" + "|".join(f"{str(key).ljust(column_width)}" for key in a_dict.keys())
-        values = "    |" + "|".join(f"{str(value).ljust(column_width)}" for value in a_dict.values())
-        log(f"{header}|")
-        log(f"{values}|")
-        log("")
+    for _, table_view, _, _ in parts:
+        output.extend(table_view)
 
     x_values = []
-    for idx, p in enumerate(p_list):
-        j = factors[p]
-        b = a
-        x_partial = []
-        log(f"{idx}) для p = {p}; степень j = {j}\nx mod ")
-
-        for k in range(j):
-            b_k = pow(b, n // (p ** (k + 1)), n)
-            x_k = next(key for key, value in a_values[idx].items() if value == b_k)
-            x_partial.append(x_k)
-
-            y = sum(x_partial[l] * (p ** l) for l in range(k + 1))
-            b = (a * pow(g, -y, n)) % n
-
-            log(f"  Шаг {k + 1}:\n    b = (a * g^(-y))^({n} / {p}^{k + 1}) mod {n}\n      = ({a} * {g}^(-{y}))^({n // (p ** (k + 1))}) mod {n}\n      = {b_k}\n   x{k} = {x_k}\n    y = {y}")
-        log("")
-
-        x = sum(x_partial[k] * (p ** k) for k in range(j))
+    for _, _, x, x_log in parts:
+        output.extend(x_log)
         x_values.append(x)
 
     m = []
@@ -84,7 +168,7 @@ def hellman(g, a, n):
         for i in range(len(a_list)):
             log(f"\nДля уравнения x ≡ {a_list[i]} (mod {m_list[i]}):")
             log(f"  M{i + 1} = M / m{i + 1} = {M} / {m_list[i]} = {m_products[i]}")
-            mi_inverse = pow(m_products[i], -1, m_list[i])
+            mi_inverse = arith.invert(m_products[i], m_list[i])
             log(f"  Обратное к M{i + 1} (mod m{i + 1}): {mi_inverse}")
             term = a_list[i] * m_products[i] * mi_inverse
             log(f"  Термин: {a_list[i]} * {m_products[i]} * {mi_inverse} = {term}")
@@ -0,0 +1,137 @@
+# http_server.py
+
+import asyncio
+import json
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+# Минимальный HTTP/1.1 сервер поверх asyncio.start_server.
+# Используется для служебных эндпоинтов бота, чтобы не тянуть aiohttp/tornado.
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    401: "Unauthorized",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+MAX_BODY = 16 * 1024 * 1024
+
+
+class Request:
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.headers = headers
+        self.body = body
+        # Разделяем путь и строку запроса
+        self.path, _, self.query = path.partition("?")
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8") or "null")
+
+
+class Response:
+    def __init__(self, status: int = 200, body: bytes = b"",
+                 content_type: str = "text/plain; charset=utf-8",
+                 headers: Optional[Dict[str, str]] = None):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or {}
+
+    @classmethod
+    def text(cls, text: str, status: int = 200) -> "Response":
+        return cls(status, text.encode("utf-8"))
+
+    @classmethod
+    def json(cls, data, status: int = 200) -> "Response":
+        return cls(status, json.dumps(data, ensure_ascii=False).encode("utf-8"),
+                   "application/json; charset=utf-8")
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Читает один запрос; None, если клиент закрыл соединение."""
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) < 2:
+        raise ValueError("некорректная строка запроса")
+    method, path = parts[0].upper(), parts[1]
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY:
+        raise ValueError("слишком большое тело запроса")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method, path, headers, body)
+
+
+def _encode_response(response: Response, keep_alive: bool) -> bytes:
+    head = [
+        f"HTTP/1.1 {response.status} {STATUS_TEXT.get(response.status, 'Unknown')}",
+        f"Content-Type: {response.content_type}",
+        f"Content-Length: {len(response.body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    head.extend(f"{name}: {value}" for name, value in response.headers.items())
+    return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.body
+
+
+async def start_server(handler: Handler, host: str, port: int) -> asyncio.AbstractServer:
+    """
+    Запускает HTTP сервер, который передаёт каждый запрос в handler.
+
+    :param handler: Корутина Request -> Response.
+    :param host: Адрес для прослушивания.
+    :param port: Порт (0 — выбрать свободный).
+    :return: Объект asyncio сервера.
+    """
+    async def serve_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError):
+                    writer.write(_encode_response(Response.text("bad request", 400), False))
+                    break
+                if request is None:
+                    break
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                try:
+                    response = await handler(request)
+                except Exception as e:
+                    response = Response.text(f"internal error: {e}", 500)
+                writer.write(_encode_response(response, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(serve_client, host, port)
+
+
+def parse_address(value: str, default_host: str = "127.0.0.1") -> Tuple[str, int]:
+    """Разбирает 'host:port' или просто 'port'."""
+    host, _, port = value.rpartition(":")
+    return (host or default_host), int(port)
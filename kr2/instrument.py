@@ -0,0 +1,122 @@
+# instrument.py
+
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+# Инструментирование решателей: счётчики операций и время по фазам.
+# Решатель вызывает count("poly_rem") и phase("relations") в ключевых местах;
+# engine.solve открывает сессию вокруг вызова решателя. Без сессии count и
+# phase — один getattr на threading.local и проверка на None.
+#
+# Фазы последовательные: phase(name) закрывает предыдущую фазу и открывает
+# новую, последняя закрывается в конце сессии. Отрезки, которые решатели
+# отдают в пул процессов (parallel.map_shards), в дочерних процессах не
+# считаются — их учитывает сам решатель по возвращённым результатам.
+
+# Счётчики и фазы для всех задач
+INSTRUMENT = os.getenv("INSTRUMENT", "") not in ("", "0")
+# Доля задач, которые дополнительно снимаются cProfile (0 — выключено)
+PROFILE_SAMPLE = float(os.getenv("PROFILE_SAMPLE", "0"))
+# Куда складывать .prof (смотреть: python -m pstats файл или snakeviz)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Печатать отчёт каждой задачи в stderr (cli.py --profile включает сам)
+ECHO = os.getenv("INSTRUMENT_ECHO", "") not in ("", "0")
+
+_state = threading.local()
+
+
+class Session:
+    def __init__(self, command: str, profile: bool = False):
+        self.command = command
+        self.counters: Dict[str, int] = {}
+        self.phases: Dict[str, float] = {}
+        self.seconds = 0.0
+        self.profile_path: Optional[str] = None
+        self._profiler = cProfile.Profile() if profile else None
+        self._phase: Optional[str] = None
+        self._phase_started = 0.0
+        self._previous = None
+
+    def __enter__(self) -> "Session":
+        self._previous = getattr(_state, "session", None)
+        _state.session = self
+        self._started = time.perf_counter()
+        if self._profiler is not None:
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # В этом потоке уже работает другой профилировщик (python -m cProfile)
+                self._profiler = None
+        return self
+
+    def __exit__(self, *exc):
+        if self._profiler is not None:
+            self._profiler.disable()
+        now = time.perf_counter()
+        self._close_phase(now)
+        self.seconds = now - self._started
+        _state.session = self._previous
+        if self._profiler is not None:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            name = f"{self.command}-{time.strftime('%Y%m%d-%H%M%S')}-{threading.get_ident()}.prof"
+            self.profile_path = os.path.join(PROFILE_DIR, name)
+            self._profiler.dump_stats(self.profile_path)
+        return False
+
+    def _close_phase(self, now: float):
+        if self._phase is not None:
+            self.phases[self._phase] = self.phases.get(self._phase, 0.0) + now - self._phase_started
+            self._phase = None
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def phase(self, name: str):
+        now = time.perf_counter()
+        self._close_phase(now)
+        self._phase, self._phase_started = name, now
+
+    def report(self) -> str:
+        """Одна строка для журнала: время, фазы и счётчики."""
+        parts = [f"{self.command}: {self.seconds:.3f} с"]
+        if self.phases:
+            parts.append("фазы " + ", ".join(f"{k} {v:.3f}" for k, v in
+                                             sorted(self.phases.items(), key=lambda kv: -kv[1])))
+        if self.counters:
+            parts.append("операции " + ", ".join(f"{k}={v}" for k, v in sorted(self.counters.items())))
+        if self.profile_path:
+            parts.append(f"профиль {self.profile_path}")
+        return "; ".join(parts)
+
+
+def session(command: str) -> Optional[Session]:
+    """Сессия для задачи или None, если инструментирование выключено и задача не попала в выборку."""
+    profile = PROFILE_SAMPLE > 0 and random.random() < PROFILE_SAMPLE
+    if not (INSTRUMENT or profile):
+        return None
+    return Session(command, profile)
+
+
+def count(name: str, n: int = 1):
+    """Учитывает n операций name в текущей сессии (без сессии — ничего)."""
+    s = getattr(_state, "session", None)
+    if s is not None:
+        s.count(name, n)
+
+
+def phase(name: str):
+    """Начинает фазу name в текущей сессии; предыдущая фаза закрывается."""
+    s = getattr(_state, "session", None)
+    if s is not None:
+        s.phase(name)
+
+
+def finish(session: Session):
+    """Отчёт о законченной сессии в stderr, если включён ECHO."""
+    if ECHO:
+        print(session.report(), file=sys.stderr, flush=True)
@@ -0,0 +1,337 @@
+# loadtest.py
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from fake_telegram import FakeBotAPI, Sent, dump_sent
+from http_server import parse_address, start_server
+from numtheory import primitive_root
+
+# Нагрузочный прогон бота целиком, без Telegram:
+#   python loadtest.py --rate 20 --duration 60 --mix hellman=4,adleman2=2,factor=2,gcd=2
+# Поднимает заглушку Bot API (fake_telegram.py), запускает main.py с
+# TG_BASE_URL на неё и шлёт команды пуассоновским потоком с заданной частотой,
+# каждую — из нового чата. Задержка — от появления обновления в getUpdates до
+# ответа бота (уведомление о медленной очереди не считается ответом).
+# В конце: пропускная способность, p50/p95/p99, доля таймаутов и ошибок,
+# процессорное время бота (вместе с пулом процессов) за время нагрузки.
+#
+# Задачи генерируются детерминированно (--seed). --pool N — брать задачи из
+# N заранее сгенерированных на команду: так видно влияние кэша результатов.
+# Уже запущенный бот: --external, адрес для TG_BASE_URL печатается при старте.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TOKEN = "123456:loadtest"
+DEFAULT_MIX = "hellman=4,adleman2=2,factor=2,gcd=2"
+# Сколько ждать готовности бота (первого getUpdates)
+STARTUP_TIMEOUT = 60
+# Чаты генератора начинаются с этого id
+FIRST_CHAT = 1_000_000
+
+# Простые для задач логарифмирования: от мгновенных до заметных
+DLOG_PRIMES = [101, 109, 1019, 10007, 100003, 1000003]
+
+
+@lru_cache(maxsize=None)
+def _dlog_groups(smooth: bool):
+    groups = []
+    for n in DLOG_PRIMES:
+        g = primitive_root(n)
+        # adleman2 требует g, раскладывающийся по базе {2, 3, 5}
+        if not smooth or g in (2, 3, 4, 5, 6, 8, 9, 10):
+            groups.append((g, n))
+    return groups
+
+
+def _poly(rng: random.Random, degree: int, p: int) -> List[int]:
+    return [1] + [rng.randrange(p) for _ in range(degree)]
+
+
+def gen_hellman(rng: random.Random) -> str:
+    g, n = rng.choice(_dlog_groups(False))
+    return f"/hellman {g} {rng.randrange(1, n)} {n}"
+
+
+def gen_adleman2(rng: random.Random) -> str:
+    g, n = rng.choice(_dlog_groups(True))
+    return f"/adleman2 {g} {rng.randrange(1, n)} {n}"
+
+
+def gen_factor(rng: random.Random) -> str:
+    p = rng.choice([2, 3, 5, 7, 11, 13])
+    f = _poly(rng, rng.randint(3, 12), p)
+    return "/factor " + " ".join(map(str, f)) + f" {p}"
+
+
+def gen_gcd(rng: random.Random) -> str:
+    p = rng.choice([2, 3, 5, 7, 11, 13])
+    f, g = _poly(rng, rng.randint(2, 12), p), _poly(rng, rng.randint(2, 12), p)
+    return "/gcd " + " ".join(map(str, f)) + " | " + " ".join(map(str, g)) + f" {p}"
+
+
+GENERATORS: Dict[str, Callable[[random.Random], str]] = {
+    "hellman": gen_hellman,
+    "adleman2": gen_adleman2,
+    "factor": gen_factor,
+    "gcd": gen_gcd,
+}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """'hellman=4,gcd=1' -> веса команд."""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in GENERATORS:
+            raise ValueError(f"нет генератора для '{name}' (есть: {', '.join(GENERATORS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Request:
+    def __init__(self, chat_id: int, command: str, text: str):
+        self.chat_id = chat_id
+        self.command = command
+        self.text = text
+        self.pushed = 0.0
+        self.answered: Optional[float] = None
+        # ok / timeout / error; None — ответа ещё нет
+        self.outcome: Optional[str] = None
+        self.slow = False
+
+    @property
+    def latency(self) -> float:
+        return self.answered - self.pushed
+
+
+def classify(text: str) -> Optional[str]:
+    """Исход по тексту ответа бота; None — промежуточное уведомление."""
+    if text.startswith("Задача тяжёлая"):
+        return None
+    if text.startswith("Не успел") or text.startswith("Ошибка: Превышено время ожидания"):
+        return "timeout"
+    if text.startswith("Ошибка"):
+        return "error"
+    return "ok"
+
+
+def _quantile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _proc_cpu(pid: int) -> Optional[float]:
+    """Процессорное время процесса и его дождавшихся детей из /proc (только Linux)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rpartition(")")[2].split()
+    except OSError:
+        return None
+    # utime, stime, cutime, cstime — поля 14-17 (здесь с 0 после имени процесса)
+    return sum(int(x) for x in fields[11:15]) / os.sysconf("SC_CLK_TCK")
+
+
+class LoadTest:
+    def __init__(self, mix: Dict[str, float], rate: float, duration: float, seed: int, pool: int):
+        self.mix = mix
+        self.rate = rate
+        self.duration = duration
+        self.rng = random.Random(seed)
+        self.pools = {name: [GENERATORS[name](self.rng) for _ in range(pool)] for name in mix} if pool else None
+        self.requests: Dict[int, Request] = {}
+        self.api = FakeBotAPI(TOKEN, self.on_sent)
+        self._pending = 0
+        self._all_answered = asyncio.Event()
+
+    def make_request(self, i: int) -> Request:
+        names = list(self.mix)
+        command = self.rng.choices(names, weights=[self.mix[n] for n in names])[0]
+        text = self.rng.choice(self.pools[command]) if self.pools else GENERATORS[command](self.rng)
+        return Request(FIRST_CHAT + i, command, text)
+
+    def on_sent(self, sent: Sent):
+        request = self.requests.get(sent.chat_id)
+        if request is None or request.outcome is not None:
+            return
+        outcome = classify(sent.text)
+        if outcome is None:
+            request.slow = True
+            return
+        request.outcome, request.answered = outcome, sent.at
+        self._pending -= 1
+        if self._pending == 0:
+            self._all_answered.set()
+
+    async def wait_ready(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while not self.api.calls.get("getUpdates"):
+            if time.monotonic() > deadline:
+                raise TimeoutError("бот не начал опрашивать getUpdates")
+            await asyncio.sleep(0.05)
+
+    async def generate(self):
+        """Открытая модель: моменты прихода не зависят от того, успевает ли бот."""
+        start = time.monotonic()
+        at = 0.0
+        i = 0
+        while True:
+            at += self.rng.expovariate(self.rate)
+            if at >= self.duration:
+                break
+            delay = start + at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            request = self.make_request(i)
+            i += 1
+            self.requests[request.chat_id] = request
+            self._pending += 1
+            self._all_answered.clear()
+            request.pushed = time.monotonic()
+            self.api.push(request.chat_id, request.text)
+
+    async def drain(self, timeout: float):
+        if self._pending:
+            try:
+                await asyncio.wait_for(self._all_answered.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def report(self, wall: float, bot_cpu: Optional[float], own_cpu: float) -> dict:
+        requests = list(self.requests.values())
+
+        def summary(items: List[Request]) -> dict:
+            answered = sorted(r.latency for r in items if r.outcome is not None)
+            counts = {k: sum(1 for r in items if r.outcome == k) for k in ("ok", "timeout", "error")}
+            return dict(
+                sent=len(items), answered=len(answered), lost=len(items) - len(answered),
+                slow_lane=sum(1 for r in items if r.slow), **counts,
+                timeout_rate=counts["timeout"] / len(items) if items else 0.0,
+                p50=_quantile(answered, 0.50), p95=_quantile(answered, 0.95),
+                p99=_quantile(answered, 0.99), max=answered[-1] if answered else float("nan"),
+            )
+
+        result = summary(requests)
+        result.update(
+            rate=self.rate, duration=self.duration, wall=wall,
+            throughput=result["answered"] / wall if wall else 0.0,
+            bot_cpu=bot_cpu, bot_cores=bot_cpu / wall if bot_cpu is not None and wall else None,
+            loadgen_cpu=own_cpu,
+            commands={name: summary([r for r in requests if r.command == name]) for name in self.mix},
+        )
+        return result
+
+
+def format_report(result: dict, mix: Dict[str, float]) -> str:
+    def latency(s: dict) -> str:
+        return f"p50 {s['p50']:.3f} p95 {s['p95']:.3f} p99 {s['p99']:.3f} max {s['max']:.3f}"
+
+    lines = [
+        f"Нагрузка: {result['rate']:g} задач/с, {result['duration']:g} с, смесь "
+        + ", ".join(f"{k}={v:g}" for k, v in mix.items()),
+        f"Отправлено {result['sent']}, ответов {result['answered']} "
+        f"(успешно {result['ok']}, таймаутов {result['timeout']} — {100 * result['timeout_rate']:.1f}%, "
+        f"ошибок {result['error']}), без ответа {result['lost']}, в медленной очереди {result['slow_lane']}",
+        f"Пропускная способность: {result['throughput']:.2f} ответов/с за {result['wall']:.1f} с",
+        f"Задержка, с: {latency(result)}",
+    ]
+    for name, s in result["commands"].items():
+        if s["sent"]:
+            lines.append(f"  {name}: {s['answered']}/{s['sent']}, таймаутов {s['timeout']}, {latency(s)}")
+    if result["bot_cpu"] is not None:
+        lines.append(f"CPU бота: {result['bot_cpu']:.1f} с (в среднем {result['bot_cores']:.2f} ядра), "
+                     f"генератора {result['loadgen_cpu']:.1f} с")
+    else:
+        lines.append(f"CPU бота неизвестно (--external), генератора {result['loadgen_cpu']:.1f} с")
+    return "\n".join(lines)
+
+
+def spawn_bot(base_url: str, extra_env: List[str]) -> subprocess.Popen:
+    env = dict(os.environ, TELEGRAM_BOT_TOKEN=TOKEN, TG_BASE_URL=base_url)
+    env.pop("WEBHOOK_LISTEN", None)
+    for item in extra_env:
+        name, _, value = item.partition("=")
+        env[name] = value
+    return subprocess.Popen([sys.executable, os.path.join(HERE, "main.py")], cwd=HERE, env=env)
+
+
+def stop_bot(bot: subprocess.Popen, timeout: float) -> Optional[float]:
+    """SIGINT (как Ctrl+C), затем kill; процессорное время бота с детьми или None."""
+    bot.send_signal(signal.SIGINT)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        pid, status, usage = os.wait4(bot.pid, os.WNOHANG)
+        if pid:
+            bot.returncode = os.waitstatus_to_exitcode(status)
+            return usage.ru_utime + usage.ru_stime
+        time.sleep(0.1)
+    bot.kill()
+    _, _, usage = os.wait4(bot.pid, 0)
+    return usage.ru_utime + usage.ru_stime
+
+
+async def run(args) -> dict:
+    mix = parse_mix(args.mix)
+    test = LoadTest(mix, args.rate, args.duration, args.seed, args.pool)
+    host, port = parse_address(args.listen)
+    server = await start_server(test.api, host, port)
+    base_url = f"http://{host}:{server.sockets[0].getsockname()[1]}/bot"
+    bot = None
+    if args.external:
+        print(f"Заглушка Bot API: TELEGRAM_BOT_TOKEN={TOKEN} TG_BASE_URL={base_url}", file=sys.stderr, flush=True)
+    else:
+        bot = spawn_bot(base_url, args.env)
+    try:
+        await test.wait_ready(args.startup if bot is not None else float("inf"))
+        cpu_before = _proc_cpu(bot.pid) if bot is not None else None
+        own_before = time.process_time()
+        started = time.monotonic()
+        await test.generate()
+        await test.drain(args.drain)
+        wall = time.monotonic() - started
+        own_cpu = time.process_time() - own_before
+    finally:
+        bot_cpu = await asyncio.get_running_loop().run_in_executor(None, stop_bot, bot, 30) \
+            if bot is not None else None
+        server.close()
+    if bot_cpu is not None and cpu_before is not None:
+        # Без учёта запуска бота (импорты, sympy)
+        bot_cpu -= cpu_before
+    if args.dump:
+        dump_sent(test.api.sent, args.dump)
+    return test.report(wall, bot_cpu, own_cpu)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон бота на локальной заглушке Bot API.")
+    parser.add_argument("--rate", type=float, default=5, help="задач в секунду (пуассоновский поток)")
+    parser.add_argument("--duration", type=float, default=30, help="сколько секунд подавать нагрузку")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"веса команд (по умолчанию {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=1, help="зерно генератора задач и моментов прихода")
+    parser.add_argument("--pool", type=int, default=0,
+                        help="брать задачи из N заготовленных на команду (0 — все разные)")
+    parser.add_argument("--drain", type=float, default=120, help="сколько ждать ответов после конца нагрузки, с")
+    parser.add_argument("--startup", type=float, default=STARTUP_TIMEOUT, help="сколько ждать запуска бота, с")
+    parser.add_argument("--listen", default="127.0.0.1:0", help="адрес заглушки host:port (0 — свободный порт)")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="переменная окружения для бота (можно несколько раз)")
+    parser.add_argument("--external", action="store_true", help="не запускать бота, ждать уже запущенного")
+    parser.add_argument("--dump", help="записать все ответы бота в файл JSON lines")
+    parser.add_argument("--json", action="store_true", help="отчёт в JSON")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, ensure_ascii=False, indent=2) if args.json else format_report(result, parse_mix(args.mix)))
+
+
+if __name__ == "__main__":
+    main()
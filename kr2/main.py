@@ -1,7 +1,9 @@
 # bot.py
 
 import asyncio
+import io
 from telegram import Update
+from telegram.error import TelegramError
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -11,168 +13,208 @@ from telegram.ext import (
 )
 from dotenv import load_dotenv
 import os
-from hellman import hellman
-from adleman import adleman
-from adleman2 import adleman2
-from SF import solve_polynomial
-from factor import factor
-from gcd import gcd_polynomials  # Импортируем функцию gcd_polynomials
+import engine
+import batch
+import cost
+from metrics import METRICS
+from http_server import Response, parse_address, start_server
+from webhook import WebhookReceiver
+from outbox import OUTBOX, MAX_MESSAGE_LENGTH, compress_text
 from typing import List
+import signal
 
 # Загрузка переменных окружения из .env файла
 load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
-def is_prime(n: int) -> bool:
-    """
-    Проверяет, является ли число простым.
-    
-    :param n: Число для проверки.
-    :return: True, если число простое, иначе False.
-    """
-    if n <= 1:
-        return False
-    if n <= 3:
-        return True
-    if n % 2 == 0 or n % 3 == 0:
-        return False
-    i = 5
-    while i * i <= n:
-        if n % i == 0 or n % (i + 2) == 0:
-            return False
-        i += 6
-    return True
+# Пользователи, которым доступна команда /stats (id через запятую)
+ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if x}
+# Экспорт метрик в формате Prometheus: файл и/или HTTP эндпоинт "host:port"
+METRICS_FILE = os.getenv("METRICS_FILE")
+METRICS_ADDR = os.getenv("METRICS_ADDR")
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "15"))
+
+# Режим вебхука: если задан WEBHOOK_LISTEN ("host:port"), обновления принимаются
+# встроенным HTTP сервером вместо long polling. WEBHOOK_URL — публичный адрес для
+# setWebhook (у реплик за балансировщиком можно не задавать и зарегистрировать один раз)
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# Сколько ждать досчёта уже принятых обновлений при остановке
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "60"))
+
+# Пул HTTP соединений к Bot API: размер и сколько ждать свободное соединение
+TG_POOL_SIZE = int(os.getenv("TG_POOL_SIZE", "64"))
+TG_POOL_TIMEOUT = float(os.getenv("TG_POOL_TIMEOUT", "10"))
+TG_READ_TIMEOUT = float(os.getenv("TG_READ_TIMEOUT", "15"))
+TG_WRITE_TIMEOUT = float(os.getenv("TG_WRITE_TIMEOUT", "30"))
+# Адрес Bot API (к нему дописывается токен): свой сервер Bot API или
+# локальная заглушка fake_telegram.py для нагрузочных прогонов (loadtest.py)
+TG_BASE_URL = os.getenv("TG_BASE_URL", "https://api.telegram.org/bot")
+TG_BASE_FILE_URL = os.getenv("TG_BASE_FILE_URL", "https://api.telegram.org/file/bot")
+
+# Сколько обновлений обрабатывать одновременно: задача в медленной очереди
+# (до SLOW_TIMEOUT секунд) не должна задерживать ответы остальным чатам
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "256"))
+
+# Максимальный размер файла с пакетом задач
+BATCH_MAX_FILE_SIZE = int(os.getenv("BATCH_MAX_FILE_SIZE", 1024 * 1024))
+
+# Все ответы идут через очередь отправки (outbox.py): лимиты Telegram и повтор после 429
+async def reply_text(update: Update, text: str, **kwargs):
+    return await OUTBOX.send(update.effective_chat.id, lambda: update.message.reply_text(text, **kwargs))
+
+async def reply_document(update: Update, document, **kwargs):
+    def request():
+        # При повторе файл читается заново с начала
+        document.seek(0)
+        return update.message.reply_document(document=document, **kwargs)
+    return await OUTBOX.send(update.effective_chat.id, request)
 
 # Обработчик команды /start
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(
+    await reply_text(
+        update,
         "Взаимодействие с решалкой:\n\n"
         "/hellman g a n - Выполнить алгоритм Хеллмана\n"
         "/adleman g a n - Выполнить алгоритм Адлемана\n"
-        "/adleman2 g a n - Выполнить модифицированный алгоритм Адлемана (он дополнительно расписывает систему, но иногда криво, так что если криво, то первый вариант)\n"
+        "/adleman2 g a n [B] - Выполнить модифицированный алгоритм Адлемана (он дополнительно расписывает систему, но иногда криво, так что если криво, то первый вариант; B — граница факторной базы)\n"
+        "/dlog g a n - Дискретный логарифм: алгоритм выбирается автоматически\n"
+        "/order g n - Порядок g по модулю простого n\n"
+        "/primroot n - Наименьший первообразный корень по модулю n\n"
         "/factor c0 c1 ... cN p - Факторизовать полином\n"
+        "/roots c0 c1 ... cN p - Найти корни полинома в Z_p\n"
         "/gcd c0 c1 ... cN | d0 d1 ... dM p - Вычислить НОД двух полиномов\n"
-        "/SF c0 c1 ... cN p - Разложить полином на свободные квадраты (для отладки)"
+        "/factorz c0 c1 ... cN - Разложить полином с целыми коэффициентами над Z\n"
+        "/gcdz c0 c1 ... cN | d0 d1 ... dM - НОД двух полиномов с целыми коэффициентами\n"
+        "/SF c0 c1 ... cN p - Разложить полином на свободные квадраты (для отладки)\n"
+        "/continue - Продолжить задачу, прерванную по таймауту\n\n"
+        "Многочлен можно записать и членами: /roots x^10000 + x + 1 mod 2, "
+        "/gcd x^4 + 1 | x^2 + 1 mod 2.\n\n"
+        "Можно прислать .txt/.csv файл с задачами, по одной на строку "
+        "(например, hellman 5 3 23 или gcd 1 0 1 | 1 1 0 1 2). "
+        "Подпись trace — добавить решения в ответный файл."
     )
 
 # Обработчик сообщений, не являющихся командами
 async def echo(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(f"Ты написал какую-то хуйню, перепроверь:\n{update.message.text}")
-
-# Вспомогательная функция для выполнения команд с таймаутом
-async def execute_with_timeout(func, *args, timeout=10.0):
-    return await asyncio.wait_for(
-        asyncio.get_event_loop().run_in_executor(None, func, *args),
-        timeout=timeout
-    )
-
-# Обработчик команды /hellman
-async def hellman_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await reply_text(update, f"Ты написал какую-то хуйню, перепроверь:\n{update.message.text}")
+
+# Обработчик команды /stats (только для администраторов)
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user is None or update.effective_user.id not in ADMIN_IDS:
+        await reply_text(update, "Ошибка: Команда доступна только администраторам.")
+        return
+    await reply_text(update, f"```\n{METRICS.render_summary()}\n```", parse_mode="MarkdownV2")
+
+# Периодическая запись метрик в файл (атомарно, через временный файл)
+async def write_metrics_file(path: str, interval: float):
+    while True:
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(METRICS.render_prometheus())
+        os.replace(tmp, path)
+        await asyncio.sleep(interval)
+
+async def metrics_endpoint(request):
+    if request.method != "GET" or request.path != "/metrics":
+        return Response.text("not found", 404)
+    return Response(200, METRICS.render_prometheus().encode("utf-8"),
+                    "text/plain; version=0.0.4; charset=utf-8")
+
+async def start_metrics_exporters(application: Application):
+    if METRICS_FILE:
+        application.bot_data["metrics_file_task"] = asyncio.create_task(
+            write_metrics_file(METRICS_FILE, METRICS_INTERVAL)
+        )
+    if METRICS_ADDR:
+        host, port = parse_address(METRICS_ADDR)
+        application.bot_data["metrics_server"] = await start_server(metrics_endpoint, host, port)
+
+# Общая часть обработчиков решателей: разбор аргументов, запуск в пуле, ответ
+async def run_solver_command(update: Update, context: ContextTypes.DEFAULT_TYPE, command: str,
+                             tokens: List[str] = None):
+    tokens = context.args if tokens is None else tokens
     try:
-        if len(context.args) != 3:
-            await update.message.reply_text(
-                "Ошибка: Требуется три аргумента.\n"
-                "Формат: /hellman g a n\n"
-                "Пример: /hellman 2 5 23"
+        args = engine.parse_args(command, tokens)
+
+        # Оценка стоимости: безнадёжные задачи отклоняются сразу, тяжёлые идут в медленную очередь
+        # (factorint/isprime в оценке — в пуле потоков, не в цикле событий). Такая же задача,
+        # которая уже считается или решена, не оценивается: engine.run подождёт её или вернёт ответ
+        estimate = engine.known_estimate(command, args)
+        if estimate is None and not engine.is_cached(command, args):
+            estimate = await asyncio.get_running_loop().run_in_executor(None, engine.admit, command, args)
+        timeout = engine.DEFAULT_TIMEOUT
+        if estimate is not None and estimate.lane == cost.Estimate.SLOW:
+            timeout = engine.SLOW_TIMEOUT
+            await reply_text(
+                update,
+                f"Задача тяжёлая ({estimate.reason}), оценка ~{estimate.seconds:.0f} с. "
+                f"Считаю в медленной очереди (таймаут {timeout:g} секунд)."
             )
-            return
-
-        g, a, n = map(int, context.args)
 
-        # Запуск функции hellman в отдельном потоке с таймаутом 10 секунд
-        detailed_solution = await execute_with_timeout(hellman, g, a, n, timeout=10.0)
-
-        # Ограничиваем длину сообщения Telegram (4096 символов)
-        if len(detailed_solution) > 4000:
-            detailed_solution = detailed_solution[:4000] + "\n... (сообщение слишком длинное)"
+        # Запуск решателя в отдельном потоке с таймаутом
+        answer, detailed_solution = await engine.run(command, args, estimate=estimate)
+
+        # Длинное решение не обрезаем, а отправляем одним сжатым файлом
+        # (сжатие большого текста — в пуле потоков, не в цикле событий)
+        if len(detailed_solution) > MAX_MESSAGE_LENGTH:
+            document = await asyncio.get_running_loop().run_in_executor(
+                None, compress_text, detailed_solution, f"{command}.txt.gz")
+            note = ("Решение слишком длинное: в файле его начало и конец." if document.truncated
+                    else "Решение длинное, полностью — в файле.")
+            try:
+                await reply_document(update, document, caption=f"Ответ: {answer}"[:1000] + "\n" + note)
+            except TelegramError:
+                # Файл не принят — ответ всё равно нужен
+                await reply_text(update, f"Ответ: {answer}"[:MAX_MESSAGE_LENGTH]
+                                 + "\nРешение слишком большое для отправки файлом.")
+            return
 
         # Отправляем ответ пользователю с использованием форматирования Markdown
-        await update.message.reply_text(
-            f"```\n{detailed_solution}\n```", parse_mode="MarkdownV2"
+        await reply_text(update, f"```\n{detailed_solution}\n```", parse_mode="MarkdownV2")
+
+    except engine.Suspended as e:
+        # Прогресс сохранён: /continue или тот же запрос продолжат с этого места
+        context.user_data["suspended"] = (command, list(tokens))
+        await reply_text(
+            update,
+            f"Не успел за {timeout:g} секунд, прогресс сохранён ({e}). "
+            "Отправьте /continue или тот же запрос, чтобы продолжить.",
         )
-
     except asyncio.TimeoutError:
-        await update.message.reply_text("Ошибка: Превышено время ожидания (таймаут 10 секунд).")
-    except ValueError:
-        await update.message.reply_text(
-            "Ошибка: Все аргументы должны быть целыми числами.\n"
-            "Формат: /hellman g a n\n"
-            "Пример: /hellman 2 5 23"
-        )
+        await reply_text(update, f"Ошибка: Превышено время ожидания (таймаут {timeout:g} секунд).")
+    except engine.UsageError as e:
+        await reply_text(update, f"Ошибка: {e}\n{engine.usage_text(command)}")
+    except engine.InputError as e:
+        await reply_text(update, f"Ошибка: {e}")
     except Exception as e:
-        await update.message.reply_text(f"Ошибка: {e}")
+        await reply_text(update, f"Ошибка: {e}")
+
+# Обработчик команды /hellman
+async def hellman_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await run_solver_command(update, context, "hellman")
 
 # Обработчик команды /adleman
 async def adleman_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        if len(context.args) != 3:
-            await update.message.reply_text(
-                "Ошибка: Требуется три аргумента.\n"
-                "Формат: /adleman g a n\n"
-                "Пример: /adleman 2 5 23"
-            )
-            return
-
-        g, a, n = map(int, context.args)
-
-        # Запуск функции adleman в отдельном потоке с таймаутом 10 секунд
-        detailed_solution = await execute_with_timeout(adleman, g, a, n, timeout=10.0)
-
-        # Ограничиваем длину сообщения Telegram (4096 символов)
-        if len(detailed_solution) > 4000:
-            detailed_solution = detailed_solution[:4000] + "\n... (сообщение слишком длинное)"
-
-        # Отправляем ответ пользователю с использованием форматирования Markdown
-        await update.message.reply_text(
-            f"```\n{detailed_solution}\n```", parse_mode="MarkdownV2"
-        )
-
-    except asyncio.TimeoutError:
-        await update.message.reply_text("Ошибка: Превышено время ожидания (таймаут 10 секунд).")
-    except ValueError:
-        await update.message.reply_text(
-            "Ошибка: Все аргументы должны быть целыми числами.\n"
-            "Формат: /adleman g a n\n"
-            "Пример: /adleman 2 5 23"
-        )
-    except Exception as e:
-        await update.message.reply_text(f"Ошибка: {e}")
+    await run_solver_command(update, context, "adleman")
 
 # Обработчик команды /adleman2
 async def adleman2_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        if len(context.args) != 3:
-            await update.message.reply_text(
-                "Ошибка: Требуется три аргумента.\n"
-                "Формат: /adleman2 g a n\n"
-                "Пример: /adleman2 2 5 23"
-            )
-            return
+    await run_solver_command(update, context, "adleman2")
 
-        g, a, n = map(int, context.args)
+# Обработчик команды /dlog: планировщик сам выбирает алгоритм
+async def dlog_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await run_solver_command(update, context, "dlog")
 
-        # Запуск функции adleman2 в отдельном потоке с таймаутом 10 секунд
-        detailed_solution = await execute_with_timeout(adleman2, g, a, n, timeout=10.0)
+# Обработчик команды /order
+async def order_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await run_solver_command(update, context, "order")
 
-        # Ограничиваем длину сообщения Telegram (4096 символов)
-        if len(detailed_solution) > 4000:
-            detailed_solution = detailed_solution[:4000] + "\n... (сообщение слишком длинное)"
-
-        # Отправляем ответ пользователю с использованием форматирования Markdown
-        await update.message.reply_text(
-            f"```\n{detailed_solution}\n```", parse_mode="MarkdownV2"
-        )
-
-    except asyncio.TimeoutError:
-        await update.message.reply_text("Ошибка: Превышено время ожидания (таймаут 10 секунд).")
-    except ValueError:
-        await update.message.reply_text(
-            "Ошибка: Все аргументы должны быть целыми числами.\n"
-            "Формат: /adleman2 g a n\n"
-            "Пример: /adleman2 2 5 23"
-        )
-    except Exception as e:
-        await update.message.reply_text(f"Ошибка: {e}")
+# Обработчик команды /primroot
+async def primroot_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await run_solver_command(update, context, "primroot")
 
 # Обработчик команды /factor
 async def factor_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -181,6 +223,7 @@ async def factor_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     Формат команды:
     /factor c0 c1 c2 ... cN p
+    /factor x^N + ... + c0 mod p
     
     Где:
     - c0, c1, ..., cN: Коэффициенты полинома от старшей к младшей степени.
@@ -189,50 +232,25 @@ async def factor_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Пример:
     /factor 1 0 1 0 1 1 2
     """
-    try:
-        # Проверяем, что передано как минимум два аргумента (коэффициенты и p)
-        if len(context.args) < 2:
-            await update.message.reply_text(
-                "Ошибка: Требуется как минимум два аргумента.\n"
-                "Формат: /factor c0 c1 c2 ... cN p\n"
-                "Пример: /factor 1 0 1 0 1 1 2"
-            )
-            return
+    await run_solver_command(update, context, "factor")
 
-        # Последний аргумент — p, остальные — коэффициенты
-        *coeffs_str, p_str = context.args
-
-        # Преобразуем коэффициенты и p в целые числа
-        coeffs = list(map(int, coeffs_str))
-        p = int(p_str)
-
-        # Проверяем, что p является простым числом
-        if not is_prime(p):
-            await update.message.reply_text("Ошибка: Модуль p должен быть простым числом.")
-            return
-
-        # Запускаем вычисление в отдельном потоке с таймаутом 10 секунд
-        detailed_solution = await execute_with_timeout(factor, coeffs, p, timeout=10.0)
+# Обработчик команды /roots
+async def roots_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обработчик команды /roots для поиска корней полинома в Z_p.
 
-        # Ограничиваем длину сообщения Telegram (4096 символов)
-        if len(detailed_solution) > 4000:
-            detailed_solution = detailed_solution[:4000] + "\n... (сообщение слишком длинное)"
+    Формат команды:
+    /roots c0 c1 c2 ... cN p
+    /roots x^N + ... + c0 mod p
 
-        # Отправляем ответ пользователю с использованием форматирования Markdown
-        await update.message.reply_text(
-            f"```\n{detailed_solution}\n```", parse_mode="MarkdownV2"
-        )
+    Где:
+    - c0, c1, ..., cN: Коэффициенты полинома от старшей к младшей степени.
+    - p: Модуль p для поля Z_p.
 
-    except asyncio.TimeoutError:
-        await update.message.reply_text("Ошибка: Превышено время ожидания (таймаут 10 секунд).")
-    except ValueError:
-        await update.message.reply_text(
-            "Ошибка: Все аргументы должны быть целыми числами.\n"
-            "Формат: /factor c0 c1 c2 ... cN p\n"
-            "Пример: /factor 1 0 1 0 1 1 2"
-        )
-    except Exception as e:
-        await update.message.reply_text(f"Ошибка: {e}")
+    Пример:
+    /roots 1 0 0 0 4 5
+    """
+    await run_solver_command(update, context, "roots")
 
 # Обработчик команды /SF
 async def SF_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -241,6 +259,7 @@ async def SF_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     Формат команды:
     /SF c0 c1 c2 ... cN p
+    /SF x^N + ... + c0 mod p
 
     Где:
     - c0, c1, ..., cN: Коэффициенты полинома от старшей к младшей степени.
@@ -249,50 +268,7 @@ async def SF_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Пример:
     /SF 1 0 2 0 1 1 3
     """
-    try:
-        # Проверяем, что передано как минимум два аргумента (коэффициенты и p)
-        if len(context.args) < 2:
-            await update.message.reply_text(
-                "Ошибка: Требуется как минимум два аргумента.\n"
-                "Формат: /SF c0 c1 c2 ... cN p\n"
-                "Пример: /SF 1 0 2 0 1 1 3"
-            )
-            return
-
-        # Последний аргумент — p, остальные — коэффициенты
-        *coeffs_str, p_str = context.args
-
-        # Преобразуем коэффициенты и p в целые числа
-        coeffs = list(map(int, coeffs_str))
-        p = int(p_str)
-
-        # Проверяем, что p является простым числом
-        if not is_prime(p):
-            await update.message.reply_text("Ошибка: Модуль p должен быть простым числом.")
-            return
-
-        # Запускаем вычисление в отдельном потоке с таймаутом 10 секунд
-        detailed_solution = await execute_with_timeout(solve_polynomial, coeffs, p, timeout=10.0)
-
-        # Ограничиваем длину сообщения Telegram (4096 символов)
-        if len(detailed_solution) > 4000:
-            detailed_solution = detailed_solution[:4000] + "\n... (сообщение слишком длинное)"
-
-        # Отправляем ответ пользователю с использованием форматирования Markdown
-        await update.message.reply_text(
-            f"```\n{detailed_solution}\n```", parse_mode="MarkdownV2"
-        )
-
-    except asyncio.TimeoutError:
-        await update.message.reply_text("Ошибка: Превышено время ожидания (таймаут 10 секунд).")
-    except ValueError:
-        await update.message.reply_text(
-            "Ошибка: Все аргументы должны быть целыми числами.\n"
-            "Формат: /SF c0 c1 c2 ... cN p\n"
-            "Пример: /SF 1 0 2 0 1 1 3"
-        )
-    except Exception as e:
-        await update.message.reply_text(f"Ошибка: {e}")
+    await run_solver_command(update, context, "SF")
 
 # Обработчик команды /gcd
 async def gcd_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -301,6 +277,7 @@ async def gcd_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     Формат команды:
     /gcd c0 c1 c2 ... cN | d0 d1 ... dM p
+    /gcd f(x) | g(x) mod p
     
     Где:
     - c0, c1, ..., cN: Коэффициенты первого полинома от старшей к младшей степени.
@@ -310,86 +287,171 @@ async def gcd_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Пример:
     /gcd 1 0 1 | 1 1 0 1 2
     """
-    try:
-        # Объединяем все аргументы в строку
-        input_str = ' '.join(context.args)
-        
-        # Ищем разделитель '|'
-        if '|' not in input_str:
-            await update.message.reply_text(
-                "Ошибка: Требуется разделитель '|'.\n"
-                "Формат: /gcd c0 c1 c2 ... cN | d0 d1 ... dM p\n"
-                "Пример: /gcd 1 0 1 | 1 1 0 1 2"
-            )
-            return
+    await run_solver_command(update, context, "gcd")
 
-        # Разделяем по '|'
-        poly1_str, rest = input_str.split('|', 1)
-        poly1_coeffs = list(map(int, poly1_str.strip().split()))
-        
-        # Разделяем rest на второй полином и p
-        rest_parts = rest.strip().split()
-        if len(rest_parts) < 2:
-            await update.message.reply_text(
-                "Ошибка: Требуется как минимум два аргумента после '|'.\n"
-                "Формат: /gcd c0 c1 c2 ... cN | d0 d1 ... dM p\n"
-                "Пример: /gcd 1 0 1 | 1 1 0 1 2"
-            )
-            return
-        
-        *poly2_coeffs_str, p_str = rest_parts
-        poly2_coeffs = list(map(int, poly2_coeffs_str))
-        p = int(p_str)
-
-        # Проверяем, что p является простым числом
-        if not is_prime(p):
-            await update.message.reply_text("Ошибка: Модуль p должен быть простым числом.")
-            return
+# Обработчик команды /factorz
+async def factorz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обработчик команды /factorz для разложения полинома над Z[x].
 
-        # Запускаем вычисление НОД в отдельном потоке с таймаутом 10 секунд
-        detailed_solution = await execute_with_timeout(
-            gcd_polynomials, poly1_coeffs, poly2_coeffs, p, timeout=10.0
-        )
+    Формат команды:
+    /factorz c0 c1 c2 ... cN
+    /factorz f(x)
 
-        # Ограничиваем длину сообщения Telegram (4096 символов)
-        if len(detailed_solution) > 4000:
-            detailed_solution = detailed_solution[:4000] + "\n... (сообщение слишком длинное)"
+    Где:
+    - c0, c1, ..., cN: Целые коэффициенты полинома от старшей к младшей степени.
 
-        # Отправляем ответ пользователю с использованием форматирования Markdown
-        await update.message.reply_text(
-            f"```\n{detailed_solution}\n```", parse_mode="MarkdownV2"
-        )
+    Пример:
+    /factorz 1 0 0 0 0 -1
+    """
+    await run_solver_command(update, context, "factorz")
 
-    except asyncio.TimeoutError:
-        await update.message.reply_text("Ошибка: Превышено время ожидания (таймаут 10 секунд).")
-    except ValueError:
-        await update.message.reply_text(
-            "Ошибка: Все коэффициенты и p должны быть целыми числами.\n"
-            "Формат: /gcd c0 c1 c2 ... cN | d0 d1 ... dM p\n"
-            "Пример: /gcd 1 0 1 | 1 1 0 1 2"
+# Обработчик команды /gcdz
+async def gcdz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обработчик команды /gcdz для вычисления НОД двух полиномов над Z[x].
+
+    Формат команды:
+    /gcdz c0 c1 c2 ... cN | d0 d1 ... dM
+    /gcdz f(x) | g(x)
+
+    Где:
+    - c0, c1, ..., cN: Целые коэффициенты первого полинома от старшей к младшей степени.
+    - d0, d1, ..., dM: Целые коэффициенты второго полинома от старшей к младшей степени.
+
+    Пример:
+    /gcdz 1 0 -1 | 1 -2 1
+    """
+    await run_solver_command(update, context, "gcdz")
+
+# Обработчик команды /continue: продолжить последнюю прерванную задачу
+async def continue_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    suspended = context.user_data.pop("suspended", None)
+    if suspended is None:
+        await reply_text(update, "Нет прерванной задачи.")
+        return
+    command, tokens = suspended
+    await run_solver_command(update, context, command, tokens)
+
+# Обработчик документов: пакетное решение задач из текстового/CSV файла.
+# Если в подписи к файлу есть слово "trace" или "решение", в ответ попадут и решения.
+async def batch_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    document = update.message.document
+    if document.file_size and document.file_size > BATCH_MAX_FILE_SIZE:
+        await reply_text(update, "Ошибка: Файл слишком большой.")
+        return
+    # Пакет считается до BATCH_TIMEOUT секунд: в фоне, чтобы не занимать обработку
+    # обновлений; ответ придёт файлом. application.stop дожидается таких задач
+    context.application.create_task(solve_batch_document(update), update=update)
+
+async def solve_batch_document(update: Update):
+    document = update.message.document
+    try:
+        tg_file = await document.get_file()
+        content = bytes(await tg_file.download_as_bytearray()).decode("utf-8-sig")
+        lines = batch.parse_batch(content)
+        if not lines:
+            await reply_text(update, "Ошибка: В файле нет задач.")
+            return
+
+        caption = (update.message.caption or "").lower()
+        with_traces = "trace" in caption or "решени" in caption
+
+        await batch.solve_batch(lines)
+        result = batch.format_results(lines, with_traces=with_traces)
+        await reply_document(
+            update,
+            io.BytesIO(result.encode("utf-8")),
+            filename="results.txt",
+            caption=f"Решено задач: {sum(1 for line in lines if line.error is None)} из {len(lines)}",
         )
+    except UnicodeDecodeError:
+        await reply_text(update, "Ошибка: Файл должен быть в кодировке UTF-8.")
+    except engine.InputError as e:
+        await reply_text(update, f"Ошибка: {e}")
     except Exception as e:
-        await update.message.reply_text(f"Ошибка: {e}")
+        await reply_text(update, f"Ошибка: {e}")
+
+# Работа через вебхук: initialize/start приложения вручную, обновления кладёт
+# в update_queue наш HTTP сервер. По SIGTERM/SIGINT новые обновления получают 503,
+# а уже принятые досчитываются (application.stop обрабатывает очередь до конца).
+async def run_webhook(application: Application):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    async def dispatch(data: dict):
+        await application.update_queue.put(Update.de_json(data, application.bot))
+
+    receiver = WebhookReceiver(WEBHOOK_PATH, WEBHOOK_SECRET, dispatch)
+    host, port = parse_address(WEBHOOK_LISTEN)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    server = await start_server(receiver, host, port)
+    try:
+        if WEBHOOK_URL:
+            await application.bot.set_webhook(
+                WEBHOOK_URL, secret_token=receiver.secret, allowed_updates=Update.ALL_TYPES
+            )
+        await stop.wait()
+    finally:
+        receiver.drain()
+        server.close()
+        await server.wait_closed()
+        try:
+            await asyncio.wait_for(application.stop(), DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        await application.shutdown()
 
 # Основная функция для запуска бота
 def main():
     # Создаем приложение бота
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .base_url(TG_BASE_URL)
+        .base_file_url(TG_BASE_FILE_URL)
+        .connection_pool_size(TG_POOL_SIZE)
+        .pool_timeout(TG_POOL_TIMEOUT)
+        .read_timeout(TG_READ_TIMEOUT)
+        .write_timeout(TG_WRITE_TIMEOUT)
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .post_init(start_metrics_exporters)
+        .build()
+    )
 
     # Добавляем обработчики команд
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("hellman", hellman_command))
     application.add_handler(CommandHandler("adleman", adleman_command))
     application.add_handler(CommandHandler("adleman2", adleman2_command))
+    application.add_handler(CommandHandler("dlog", dlog_command))
+    application.add_handler(CommandHandler("order", order_command))
+    application.add_handler(CommandHandler("primroot", primroot_command))
     application.add_handler(CommandHandler("factor", factor_command))
+    application.add_handler(CommandHandler("roots", roots_command))
     application.add_handler(CommandHandler("gcd", gcd_command))  # Добавляем обработчик /gcd
+    application.add_handler(CommandHandler("gcdz", gcdz_command))
+    application.add_handler(CommandHandler("factorz", factorz_command))
     application.add_handler(CommandHandler("SF", SF_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CommandHandler("continue", continue_command))
 
     # Добавляем обработчик для текстовых сообщений, не являющихся командами
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, echo))
+    # Пакетные задачи присылаются файлом
+    application.add_handler(MessageHandler(filters.Document.ALL, batch_document))
 
     # Запускаем бота
-    application.run_polling()
+    if WEBHOOK_LISTEN:
+        asyncio.run(run_webhook(application))
+    else:
+        application.run_polling()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,241 @@
+# metrics.py
+
+import bisect
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+# Границы корзин гистограмм (Prometheus-стиль, верхние границы включительно)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+LOG10_2 = math.log10(2)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # Последняя ячейка — корзина +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по верхней границе корзины."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class Metrics:
+    """
+    Счётчики бота. Запись идёт только из потока event loop'а (кроме числа
+    задач в пуле, которое уменьшается из рабочих потоков под блокировкой),
+    поэтому на пути обработчика это пара инкрементов и один bisect.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.latency: Dict[str, Histogram] = {}
+        self.sizes: Dict[str, Histogram] = {}
+        self.requests: Dict[str, int] = {}
+        self.timeouts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        # Запросы, присоединившиеся к уже выполняющейся такой же задаче
+        self.coalesced: Dict[str, int] = {}
+        # Запросы, отклонённые контролем допуска до запуска
+        self.rejected: Dict[str, int] = {}
+        # Очередь исходящих сообщений: ожидание лимита и повторы после 429
+        self.send_wait = Histogram(LATENCY_BUCKETS)
+        self.send_retries = 0
+        # Инструментирование решателей (instrument.py): суммы по командам
+        self.solver_ops: Dict[str, Dict[str, int]] = {}
+        self.solver_phases: Dict[str, Dict[str, float]] = {}
+        self.workers = 1
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    # --- пул исполнителей ---
+
+    def job_submitted(self):
+        with self._lock:
+            self._pending += 1
+
+    def job_finished(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    @property
+    def in_flight(self) -> int:
+        return min(self._pending, self.workers)
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._pending - self.workers)
+
+    # --- обработчики ---
+
+    def observe(self, command: str, seconds: float, size: int, outcome: str):
+        """
+        Фиксирует завершение одной команды.
+
+        :param command: Имя команды (hellman, factor, ...).
+        :param seconds: Время ожидания результата.
+        :param size: Размер входа в десятичных цифрах.
+        :param outcome: "ok", "timeout" или "error".
+        """
+        hist = self.latency.get(command)
+        if hist is None:
+            hist = self.latency[command] = Histogram(LATENCY_BUCKETS)
+            self.sizes[command] = Histogram(SIZE_BUCKETS)
+        hist.observe(seconds)
+        self.sizes[command].observe(size)
+        self.requests[command] = self.requests.get(command, 0) + 1
+        if outcome == "timeout":
+            self.timeouts[command] = self.timeouts.get(command, 0) + 1
+        elif outcome == "error":
+            self.errors[command] = self.errors.get(command, 0) + 1
+
+    def observe_send_wait(self, seconds: float):
+        self.send_wait.observe(seconds)
+
+    def observe_solver(self, session):
+        """Складывает счётчики и фазы сессии instrument (вызывается из рабочих потоков)."""
+        with self._lock:
+            ops = self.solver_ops.setdefault(session.command, {})
+            for name, n in session.counters.items():
+                ops[name] = ops.get(name, 0) + n
+            phases = self.solver_phases.setdefault(session.command, {})
+            for name, seconds in session.phases.items():
+                phases[name] = phases.get(name, 0.0) + seconds
+
+    # --- вывод ---
+
+    def render_summary(self) -> str:
+        """Человекочитаемая сводка для команды /stats."""
+        uptime = int(time.time() - self.started)
+        lines = [
+            f"аптайм: {uptime} с",
+            f"пул: воркеров {self.workers}, выполняется {self.in_flight}, в очереди {self.queue_depth}",
+            f"отправка: ожидание p95≤{self.send_wait.quantile(0.95)}с, повторов после 429 {self.send_retries}",
+            "",
+        ]
+        if not self.requests:
+            lines.append("запросов ещё не было")
+        for command in sorted(self.requests.keys() | self.rejected.keys()):
+            if command not in self.latency:
+                lines.append(f"/{command}: отклонено {self.rejected[command]}")
+                continue
+            hist = self.latency[command]
+            size = self.sizes[command]
+            lines.append(
+                f"/{command}: {self.requests[command]} запр., "
+                f"таймаутов {self.timeouts.get(command, 0)}, ошибок {self.errors.get(command, 0)}, "
+                f"совмещено {self.coalesced.get(command, 0)}, отклонено {self.rejected.get(command, 0)}"
+            )
+            lines.append(
+                f"  время p50≤{hist.quantile(0.5)}с p95≤{hist.quantile(0.95)}с "
+                f"ср {hist.sum / hist.count:.3f}с"
+            )
+            lines.append(f"  размер входа p50≤{size.quantile(0.5)} p95≤{size.quantile(0.95)} цифр")
+            phases = self.solver_phases.get(command)
+            if phases:
+                lines.append("  фазы: " + ", ".join(f"{k} {v:.2f}с" for k, v in
+                                                   sorted(phases.items(), key=lambda kv: -kv[1])))
+        return "\n".join(lines)
+
+    def render_prometheus(self) -> str:
+        """Текстовый формат экспозиции Prometheus."""
+        out: List[str] = []
+
+        def counter(name: str, help_text: str, values: Dict[str, int]):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} counter")
+            for command in sorted(self.requests.keys() | values.keys()):
+                out.append(f'{name}{{command="{command}"}} {values.get(command, 0)}')
+
+        def histogram(name: str, help_text: str, hists: Dict[str, Histogram]):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} histogram")
+            for command in sorted(hists):
+                hist = hists[command]
+                cumulative = 0
+                for bound, c in zip(_bucket_labels(hist.buckets), hist.counts):
+                    cumulative += c
+                    out.append(f'{name}_bucket{{command="{command}",le="{bound}"}} {cumulative}')
+                out.append(f'{name}_sum{{command="{command}"}} {hist.sum}')
+                out.append(f'{name}_count{{command="{command}"}} {hist.count}')
+
+        counter("ntmc_requests_total", "Выполненные команды.", self.requests)
+        counter("ntmc_timeouts_total", "Команды, прерванные по таймауту.", self.timeouts)
+        counter("ntmc_errors_total", "Команды, завершившиеся исключением.", self.errors)
+        counter("ntmc_coalesced_total", "Запросы, дождавшиеся уже идущей такой же задачи.", self.coalesced)
+        counter("ntmc_rejected_total", "Запросы, отклонённые по оценке стоимости.", self.rejected)
+        histogram("ntmc_latency_seconds", "Время выполнения команды.", self.latency)
+        histogram("ntmc_input_digits", "Размер входа в десятичных цифрах.", self.sizes)
+        out.append("# HELP ntmc_send_wait_seconds Ожидание лимита отправки сообщений.")
+        out.append("# TYPE ntmc_send_wait_seconds histogram")
+        cumulative = 0
+        for bound, c in zip(_bucket_labels(self.send_wait.buckets), self.send_wait.counts):
+            cumulative += c
+            out.append(f'ntmc_send_wait_seconds_bucket{{le="{bound}"}} {cumulative}')
+        out.append(f"ntmc_send_wait_seconds_sum {self.send_wait.sum}")
+        out.append(f"ntmc_send_wait_seconds_count {self.send_wait.count}")
+        out.append("# TYPE ntmc_send_retries_total counter")
+        out.append(f"ntmc_send_retries_total {self.send_retries}")
+        out.append("# HELP ntmc_solver_ops_total Операции внутри решателей (INSTRUMENT=1).")
+        out.append("# TYPE ntmc_solver_ops_total counter")
+        for command in sorted(self.solver_ops):
+            for name, n in sorted(self.solver_ops[command].items()):
+                out.append(f'ntmc_solver_ops_total{{command="{command}",op="{name}"}} {n}')
+        out.append("# HELP ntmc_solver_phase_seconds_total Время фаз решателей (INSTRUMENT=1).")
+        out.append("# TYPE ntmc_solver_phase_seconds_total counter")
+        for command in sorted(self.solver_phases):
+            for name, seconds in sorted(self.solver_phases[command].items()):
+                out.append(f'ntmc_solver_phase_seconds_total{{command="{command}",phase="{name}"}} {seconds}')
+        out.append("# TYPE ntmc_executor_workers gauge")
+        out.append(f"ntmc_executor_workers {self.workers}")
+        out.append("# TYPE ntmc_executor_in_flight gauge")
+        out.append(f"ntmc_executor_in_flight {self.in_flight}")
+        out.append("# TYPE ntmc_executor_queue_depth gauge")
+        out.append(f"ntmc_executor_queue_depth {self.queue_depth}")
+        return "\n".join(out) + "\n"
+
+
+def _bucket_labels(buckets: Iterable[float]) -> List[str]:
+    return [f"{b:g}" for b in buckets] + ["+Inf"]
+
+
+def _digits(n: int) -> int:
+    """Число десятичных цифр |n| по bit_length (±1): str() квадратичен и ограничен 4300 цифрами."""
+    return int(abs(n).bit_length() * LOG10_2) + 1
+
+
+def input_size(args) -> int:
+    """Размер входа: суммарное число десятичных цифр во всех аргументах."""
+    total = 0
+    for arg in args:
+        if isinstance(arg, int):
+            total += _digits(arg)
+        elif isinstance(arg, (list, tuple)):
+            total += input_size(arg)
+        elif hasattr(arg, "terms"):
+            # Разреженный многочлен: по члену на ненулевой коэффициент плюс цифры
+            # степеней и коэффициентов (степень 10^6 — не миллион коэффициентов)
+            total += len(arg.terms) + input_size(list(arg.terms.items()))
+    return total
+
+
+# Общий экземпляр на процесс
+METRICS = Metrics()
@@ -0,0 +1,76 @@
+# modfactor.py
+
+import random
+from typing import List, Tuple
+
+from polynomial import PolynomialZp
+
+# Разложение свободного от квадратов нормированного многочлена над Z_p
+# алгоритмом Кантора–Цассенхауса:
+#   1) distinct_degree — произведения неприводимых множителей одной степени d
+#      как НОД(f, x^(p^d) - x), степени Фробениуса считаются одна из другой;
+#   2) equal_degree — случайное расщепление такого произведения:
+#      НОД(g, a^((p^d - 1)/2) - 1), для p = 2 — через след a + a^2 + ... + a^(2^(d-1)).
+
+# Попыток расщепления на один многочлен (каждая удачна с вероятностью ~1/2)
+SPLIT_ATTEMPTS = 200
+
+
+def distinct_degree(f: PolynomialZp) -> List[Tuple[PolynomialZp, int]]:
+    """Пары (произведение всех неприводимых множителей степени d, d)."""
+    p = f.p
+    x = PolynomialZp.x(f.F)
+    result = []
+    rest = f.monic()
+    frobenius = x
+    d = 0
+    while rest.deg() >= 2 * (d + 1):
+        d += 1
+        frobenius = frobenius.powmod(p, rest)
+        g = rest.gcd(frobenius - x).monic()
+        if g.deg() > 0:
+            result.append((g, d))
+            rest = rest // g
+            frobenius = frobenius % rest
+    if rest.deg() > 0:
+        # Оставшийся множитель степени < 2(d + 1) неприводим
+        result.append((rest, rest.deg()))
+    return result
+
+
+def count_factors(f: PolynomialZp) -> int:
+    """Число неприводимых множителей (только по степеням, без расщепления)."""
+    return sum(g.deg() // d for g, d in distinct_degree(f))
+
+
+def equal_degree(g: PolynomialZp, d: int, rng: random.Random) -> List[PolynomialZp]:
+    """Неприводимые множители g — произведения различных множителей степени d."""
+    if g.deg() <= d:
+        return [g]
+    p, n = g.p, g.deg()
+    one = PolynomialZp([1], g.F)
+    for _ in range(SPLIT_ATTEMPTS):
+        a = PolynomialZp([rng.randrange(p) for _ in range(n)], g.F)
+        if a.deg() < 1:
+            continue
+        if p == 2:
+            b, power = a % g, a % g
+            for _ in range(d - 1):
+                power = (power * power) % g
+                b = b + power
+        else:
+            b = a.powmod((p ** d - 1) // 2, g) - one
+        h = g.gcd(b).monic()
+        if 0 < h.deg() < n:
+            return equal_degree(h, d, rng) + equal_degree(g // h, d, rng)
+    raise ArithmeticError("не удалось расщепить многочлен")
+
+
+def factor_squarefree(f: PolynomialZp) -> List[PolynomialZp]:
+    """Нормированные неприводимые множители свободного от квадратов f (по степени, затем по коэффициентам)."""
+    # Детерминированный генератор: одинаковый вход — одинаковое разложение
+    rng = random.Random(f.p * 1000003 + f.deg())
+    factors = []
+    for g, d in distinct_degree(f):
+        factors.extend(equal_degree(g, d, rng))
+    return sorted(factors, key=lambda h: (h.deg(), h.coeffs))
@@ -0,0 +1,99 @@
+# numtheory.py
+
+from functools import lru_cache
+from math import isqrt
+from typing import Dict, List, Optional, Tuple
+
+from sympy import factorint, isprime
+
+import arith
+
+# Общие теоретико-числовые помощники с кэшем: одно и то же n-1 раскладывают
+# и оценка стоимости, и сами решатели.
+
+FACTOR_CACHE_SIZE = 4096
+# Сколько кандидатов в первообразные корни проверять за один проход
+PRIMROOT_BATCH = 32
+
+
+@lru_cache(maxsize=FACTOR_CACHE_SIZE)
+def factor_group_order(n: int) -> Dict[int, int]:
+    """Разложение порядка мультипликативной группы n - 1 (результат не изменять)."""
+    return factorint(n - 1)
+
+
+@lru_cache(maxsize=FACTOR_CACHE_SIZE)
+def largest_prime_factor_estimate(m: int, limit: int = 10 ** 5) -> int:
+    """
+    Наибольший простой делитель m без полного разложения: пробное деление до
+    limit; неразложенный остаток берётся сам, если он простой, иначе как
+    нижняя оценка — его квадратный корень.
+    """
+    if m <= 1:
+        return 1
+    largest = 1
+    # С limit factorint может оставить в ответе составной множитель
+    for p in factorint(m, limit=limit, use_rho=False, use_pm1=False, use_ecm=False):
+        largest = max(largest, p if p <= limit or isprime(p) else isqrt(p))
+    return largest
+
+
+def element_order(g: int, n: int, factors: Optional[Dict[int, int]] = None,
+                  log=None) -> Tuple[int, Dict[int, int]]:
+    """
+    Порядок g в (Z/nZ)*, n — простое: из n - 1 по очереди выбрасываются
+    простые множители q, пока g^(order/q) = 1.
+
+    :param log: Функция для строк подробного решения (необязательно).
+    :return: Порядок и его разложение.
+    """
+    log = log or (lambda msg: None)
+    if factors is None:
+        factors = factor_group_order(n)
+    order = n - 1
+    order_factors = {}
+    for q, e in factors.items():
+        while e:
+            value = arith.powmod(g, order // q, n)
+            if value != 1:
+                log(f"  {g}^({order}/{q}) = {value} ≠ 1 — множитель {q} остаётся")
+                break
+            log(f"  {g}^({order}/{q}) = 1 — делим на {q}")
+            order //= q
+            e -= 1
+        if e:
+            order_factors[q] = e
+    return order, order_factors
+
+
+def is_generator(g: int, n: int) -> bool:
+    """g порождает (Z/nZ)*, n — простое: g^((n-1)/q) ≠ 1 для всех q | n-1."""
+    if g % n == 0:
+        return False
+    return all(arith.powmod(g, (n - 1) // q, n) != 1 for q in factor_group_order(n))
+
+
+@lru_cache(maxsize=FACTOR_CACHE_SIZE)
+def primitive_root(n: int) -> int:
+    """
+    Наименьший первообразный корень по простому модулю n.
+
+    Кандидаты проверяются пачками по PRIMROOT_BATCH: для каждого q | n-1
+    (по возрастанию — q = 2 отсеивает половину) из пачки выбрасываются
+    те, у кого c^((n-1)/q) = 1; первый выживший — ответ.
+    """
+    if n == 2:
+        return 1
+    primes = sorted(factor_group_order(n))
+    start = 2
+    while start < n:
+        survivors: List[int] = list(range(start, min(start + PRIMROOT_BATCH, n)))
+        for q in primes:
+            e = (n - 1) // q
+            survivors = [c for c in survivors if arith.powmod(c, e, n) != 1]
+            if not survivors:
+                break
+        if survivors:
+            return survivors[0]
+        start += PRIMROOT_BATCH
+    raise ValueError(f"{n} не простое")
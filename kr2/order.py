@@ -0,0 +1,55 @@
+# order.py
+
+from typing import Tuple
+
+from numtheory import PRIMROOT_BATCH, element_order, factor_group_order, primitive_root
+
+# Порядок элемента и первообразный корень по простому модулю n.
+# Оба считаются через разложение n - 1 из общего кэша numtheory.
+
+
+def _format_factors(factors) -> str:
+    return " * ".join(f"{q}^{e}" for q, e in factors.items()) or "1"
+
+
+def order(g: int, n: int) -> Tuple[int, str]:
+    """
+    Порядок g в (Z/nZ)*.
+
+    :return: Пара (ord(g), подробное решение).
+    """
+    output = []
+    log = output.append
+    g %= n
+    factors = factor_group_order(n)
+    log(f"n - 1 = {n - 1} = {_format_factors(factors)}")
+    log("Выбрасываем из n - 1 простые множители q, пока g^(order/q) = 1:")
+
+    result, result_factors = element_order(g, n, factors, log)
+    log(f"\nord({g}) = {result} = {_format_factors(result_factors)}")
+    if result == n - 1:
+        log(f"{g} — первообразный корень по модулю {n}")
+    else:
+        log(f"{g} не первообразный корень: индекс подгруппы {(n - 1) // result}")
+    log(f"Ответ: {result}")
+    return result, "\n".join(output)
+
+
+def primroot(n: int) -> Tuple[int, str]:
+    """
+    Наименьший первообразный корень по модулю n.
+
+    :return: Пара (корень, подробное решение).
+    """
+    output = []
+    log = output.append
+    factors = factor_group_order(n)
+    log(f"n - 1 = {n - 1} = {_format_factors(factors)}")
+    log(f"g — первообразный корень, если g^((n-1)/q) ≠ 1 для всех q: {', '.join(map(str, factors))}")
+    log(f"Кандидаты проверяются пачками по {PRIMROOT_BATCH}")
+
+    root = primitive_root(n)
+    for q in factors:
+        log(f"  {root}^({n - 1}/{q}) = {pow(root, (n - 1) // q, n)}")
+    log(f"\nОтвет: {root}")
+    return root, "\n".join(output)
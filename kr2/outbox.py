@@ -0,0 +1,145 @@
+# outbox.py
+
+import asyncio
+import gzip
+import io
+import os
+import time
+from typing import Awaitable, Callable, Dict, TypeVar
+
+from telegram.error import RetryAfter
+
+from metrics import METRICS
+
+# Очередь исходящих сообщений: все ответы бота проходят через token bucket
+# (общий лимит и лимит на чат), а на 429 (RetryAfter) отправка ставится на паузу
+# на указанное Telegram время и повторяется.
+
+# Telegram: ~30 сообщений в секунду на бота и ~1 в секунду в один чат
+# (короткие всплески допустимы)
+SEND_RATE = float(os.getenv("SEND_RATE", "30"))
+SEND_BURST = float(os.getenv("SEND_BURST", "30"))
+CHAT_RATE = float(os.getenv("CHAT_RATE", "1"))
+CHAT_BURST = float(os.getenv("CHAT_BURST", "3"))
+SEND_RETRIES = int(os.getenv("SEND_RETRIES", "3"))
+
+# Ответ длиннее этого уходит сжатым документом, а не обрезается
+MAX_MESSAGE_LENGTH = 4000
+# Предел Bot API на загрузку файла ботом (50 МБ); больший документ отклоняется
+MAX_DOCUMENT_SIZE = int(os.getenv("MAX_DOCUMENT_SIZE", str(50 * 1024 * 1024)))
+
+# Сколько корзин чатов держать, прежде чем выбросить полные (давно молчащие)
+MAX_CHAT_BUCKETS = 10000
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Token bucket: rate токенов в секунду, не больше burst в запасе.
+    Ожидающие обслуживаются по очереди (FIFO через asyncio.Lock).
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        # Пауза после RetryAfter: до этого момента токены не выдаются
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    @property
+    def full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.burst and not self._lock.locked()
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Outbox:
+    def __init__(self, rate: float = SEND_RATE, burst: float = SEND_BURST,
+                 chat_rate: float = CHAT_RATE, chat_burst: float = CHAT_BURST,
+                 retries: int = SEND_RETRIES):
+        self.bucket = TokenBucket(rate, burst)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.retries = retries
+        self.chats: Dict[int, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chats.get(chat_id)
+        if bucket is None:
+            if len(self.chats) >= MAX_CHAT_BUCKETS:
+                self.chats = {k: b for k, b in self.chats.items() if not b.full}
+            bucket = self.chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def send(self, chat_id: int, request: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполняет request() (вызов Bot API) с учётом лимитов.
+
+        :param chat_id: Чат получателя (для лимита на чат).
+        :param request: Функция без аргументов, возвращающая корутину отправки;
+                        при повторе вызывается заново.
+        """
+        chat = self._chat_bucket(chat_id)
+        start = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            # Сначала очередь своего чата, потом общий лимит
+            await chat.acquire()
+            await self.bucket.acquire()
+            if attempt == 0:
+                METRICS.observe_send_wait(time.perf_counter() - start)
+            try:
+                return await request()
+            except RetryAfter as e:
+                if attempt == self.retries:
+                    raise
+                METRICS.send_retries += 1
+                # 429 относится ко всему боту: останавливаем и общую очередь
+                self.bucket.block(e.retry_after)
+                chat.block(e.retry_after)
+
+
+def compress_text(text: str, filename: str, limit: int = MAX_DOCUMENT_SIZE) -> io.BytesIO:
+    """
+    Текст как .gz документ для reply_document. Если сжатый файл больше limit,
+    середина текста выбрасывается (начало и конец с ответом остаются), пока
+    не поместится; тогда у результата truncated = True.
+    """
+    compressed = gzip.compress(text.encode("utf-8"))
+    keep = len(text)
+    while len(compressed) > limit and keep > 0:
+        # Сжатие почти пропорционально длине; запас — на неоднородность текста
+        keep = int(keep * limit / len(compressed) * 0.9)
+        head, tail = keep // 2, keep - keep // 2
+        cut = (text[:head] + f"\n\n... пропущено {len(text) - keep} символов: решение слишком длинное ...\n\n"
+               + text[len(text) - tail:])
+        compressed = gzip.compress(cut.encode("utf-8"))
+    data = io.BytesIO(compressed)
+    data.name = filename
+    data.truncated = keep < len(text)
+    return data
+
+
+# Общий экземпляр на процесс
+OUTBOX = Outbox()
@@ -0,0 +1,66 @@
+# parallel.py
+
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, Optional
+
+# Общий пул процессов для CPU-задач (потоки упираются в GIL)
+PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", os.cpu_count() or 1))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def in_worker() -> bool:
+    """True, если код уже выполняется в дочернем процессе пула."""
+    return multiprocessing.parent_process() is not None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Лениво создаёт общий пул процессов."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS)
+        return _pool
+
+
+def shutdown_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def map_shards(fn: Callable, fixed_args: tuple, start: int, stop: int, shard: int,
+               parallel: bool = True) -> Iterator:
+    """
+    Результаты fn(*fixed_args, lo, hi) по отрезкам [lo, hi) диапазона [start, stop)
+    строго по порядку отрезков.
+
+    В параллельном режиме в пуле одновременно находится не больше
+    2 * PROCESS_WORKERS отрезков; когда потребитель прекращает итерацию
+    (break / close), ещё не начатые отрезки снимаются.
+    """
+    bounds = ((lo, min(lo + shard, stop)) for lo in range(start, stop, shard))
+    if not parallel or in_worker():
+        for lo, hi in bounds:
+            yield fn(*fixed_args, lo, hi)
+        return
+
+    pool = get_process_pool()
+    window = deque()
+    try:
+        for lo, hi in bounds:
+            window.append(pool.submit(fn, *fixed_args, lo, hi))
+            if len(window) >= 2 * PROCESS_WORKERS:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+    finally:
+        for future in window:
+            future.cancel()
@@ -0,0 +1,194 @@
+# polycache.py
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import instrument
+from polynomial import PolynomialZp
+
+# Производные данные многочлена над Z_p, общие для /SF, /factor, /roots и /gcd:
+# пользователи гоняют разные команды на одном и том же f, и каждая заново
+# считала f', НОД(f, f') и степени Фробениуса. Здесь они считаются один раз:
+#   - derivative, square_free — от самого f (вывод зависит от старшего коэффициента);
+#   - remainders — последовательность остатков Евклида для пары (f, g):
+#     НОД в /SF и шаги /gcd f | f' берутся из неё;
+#   - frobenius(f, k) = x^(p^k) mod f, каждая степень из предыдущей;
+#   - frobenius_gcd(f, k) = НОД(f, x^(p^k) - x) — корни (/roots) и тест Рабина (/factor);
+#   - q_rows(f, n) = x^(p·j) mod f, j < n — строки матрицы Q, каждая из
+#     предыдущей умножением на x^p mod f.
+# Остатки по модулю f не зависят от нормировки, поэтому последние три хранятся
+# у f.monic(): f и 3f делят их между собой.
+#
+# Ключ — (p, коэффициенты) уже нормализованного PolynomialZp. Кэш общий на
+# процесс (решатели идут в потоках), LRU по оценке занятой памяти:
+# POLY_CACHE_BYTES=0 отключает его. Ядро Q - E не кэшируется: factor его
+# пока не находит.
+
+POLY_CACHE_BYTES = int(os.getenv("POLY_CACHE_BYTES", str(64 << 20)))
+
+
+def _sizeof(value) -> int:
+    """Грубая оценка памяти значения в байтах (многочлены, списки, строки)."""
+    if isinstance(value, PolynomialZp):
+        return 64 + len(value.coeffs) * (36 + value.p.bit_length() // 8)
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(8 + _sizeof(v) for v in value)
+    if isinstance(value, str):
+        return 49 + len(value.encode("utf-8"))
+    return 32
+
+
+class Entry:
+    """Данные одного многочлена; считаются под блокировкой записи, по одному разу."""
+
+    def __init__(self, f: PolynomialZp):
+        self.f = f
+        self.values: Dict[tuple, object] = {}
+        self.size = _sizeof(f)
+        # RLock: одно значение может строиться из другого того же многочлена
+        self.lock = threading.RLock()
+
+
+class PolyCache:
+    """LRU записей по многочленам с ограничением по оценке памяти."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def entry(self, f: PolynomialZp) -> Entry:
+        key = (f.p, tuple(f.coeffs))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+            entry = Entry(f)
+            if self.max_bytes > 0:
+                self._entries[key] = entry
+                self.size += entry.size
+                self._evict()
+            return entry
+
+    def _evict(self):
+        # Последнюю (только что использованную) запись не выбрасываем
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            _, old = self._entries.popitem(last=False)
+            self.size -= old.size
+
+    def memo(self, f: PolynomialZp, name: tuple, compute: Callable[[], object]):
+        """Значение name для f: из кэша или compute() с запоминанием."""
+        entry = self.entry(f)
+        with entry.lock:
+            if name in entry.values:
+                self.hits += 1
+                instrument.count("poly_cache_hit")
+                return entry.values[name]
+            self.misses += 1
+            instrument.count("poly_cache_miss")
+            value = compute()
+            self.store(entry, name, value)
+            return value
+
+    def store(self, entry: Entry, name: tuple, value, grown: Optional[int] = None):
+        """
+        Запоминает (или заменяет расширенным) значение name и пересчитывает размер.
+
+        :param grown: Прирост размера, если известен (иначе оценивается заново).
+        """
+        if grown is None:
+            grown = _sizeof(value) - (_sizeof(entry.values[name]) if name in entry.values else 0)
+        entry.values[name] = value
+        with self._lock:
+            entry.size += grown
+            key = (entry.f.p, tuple(entry.f.coeffs))
+            if self._entries.get(key) is entry:
+                self.size += grown
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+CACHE = PolyCache(POLY_CACHE_BYTES)
+
+
+def derivative(f: PolynomialZp) -> PolynomialZp:
+    return CACHE.memo(f, ("derivative",), f.derivative)
+
+
+def remainders(a: PolynomialZp, b: PolynomialZp) -> List[PolynomialZp]:
+    """Остатки алгоритма Евклида [a, b, a mod b, ...] до нулевого включительно."""
+
+    def compute():
+        sequence = [a, b]
+        while not sequence[-1].is_zero():
+            sequence.append(sequence[-2] % sequence[-1])
+        return sequence
+
+    return CACHE.memo(a, ("remainders", tuple(b.coeffs)), compute)
+
+
+def gcd(a: PolynomialZp, b: PolynomialZp) -> PolynomialZp:
+    """a.gcd(b) (без нормировки) по сохранённой последовательности остатков."""
+    return remainders(a, b)[-2]
+
+
+def square_free(f: PolynomialZp, compute: Callable[[], Tuple[list, str]]) -> Tuple[list, str]:
+    """Результат square_free_decomposition(f): (множители, вывод)."""
+    factors, solve = CACHE.memo(f, ("square_free",), compute)
+    return list(factors), solve
+
+
+def _extend(f: PolynomialZp, name: tuple, count: int, first: List[PolynomialZp],
+            step: Callable[[PolynomialZp, PolynomialZp], PolynomialZp]) -> List[PolynomialZp]:
+    """Последовательность name у f.monic() длиной не меньше count, каждый член из предыдущего."""
+    m = f.monic()
+    entry = CACHE.entry(m)
+    with entry.lock:
+        sequence: Optional[List[PolynomialZp]] = entry.values.get(name)
+        if sequence is not None and len(sequence) >= count:
+            CACHE.hits += 1
+            instrument.count("poly_cache_hit")
+            return sequence
+        CACHE.misses += 1
+        instrument.count("poly_cache_miss")
+        grown = 0 if sequence else _sizeof(first)
+        sequence = list(sequence or first)
+        while len(sequence) < count:
+            sequence.append(step(sequence[-1], m))
+            grown += 8 + _sizeof(sequence[-1])
+        CACHE.store(entry, name, sequence, grown)
+        return sequence
+
+
+def frobenius(f: PolynomialZp, k: int) -> PolynomialZp:
+    """x^(p^k) mod f."""
+    p = f.p
+    first = [PolynomialZp.x(f.F) % f.monic()]
+    return _extend(f, ("frobenius",), k + 1, first, lambda prev, m: prev.powmod(p, m))[k]
+
+
+def frobenius_gcd(f: PolynomialZp, k: int) -> PolynomialZp:
+    """Нормированный НОД(f, x^(p^k) - x)."""
+    m = f.monic()
+    return CACHE.memo(m, ("frobenius_gcd", k),
+                      lambda: m.gcd(frobenius(m, k) - PolynomialZp.x(f.F)).monic())
+
+
+def q_rows(f: PolynomialZp, n: int) -> List[PolynomialZp]:
+    """x^(p·j) mod f для j < n (первые n строк матрицы Q)."""
+    first = [PolynomialZp([1], f.F) % f.monic()]
+    xp = frobenius(f, 1) if n > 1 else None
+    return _extend(f, ("q_rows",), n, first, lambda prev, m: (prev * xp) % m)[:n]
@@ -0,0 +1,280 @@
+# polynomial.py
+
+import re
+from typing import Dict, List, Union
+
+import instrument
+from field import Zmod, context
+
+# Многочлены над Z_p — общий класс для factor, SF, gcd и roots.
+# Коэффициенты хранятся от старшей степени к младшей.
+# SparsePolynomialZp — разреженная запись {степень: коэффициент} для входов
+# вида x^10000 + x + 1 и делимых вида x^(p*j): память по числу членов. Решатели
+# получают её уже плотной (PolynomialZp), так что экономия — на разборе, оценке
+# и остатках x^(p*j) mod f; /factor такой степени всё равно не по силам.
+
+
+def _rem(coeffs: List[int], divisor: List[int], F: Zmod) -> List[int]:
+    """Остаток от деления списков коэффициентов (без ведущих нулей в делителе)."""
+    instrument.count("poly_rem")
+    p = F.m
+    result = coeffs[:]
+    m = len(divisor)
+    if len(result) < m:
+        return result
+    inv = F.inv(divisor[0])
+    for i in range(len(result) - m + 1):
+        scale = result[i] * inv % p
+        if scale:
+            for j in range(1, m):
+                result[i + j] = (result[i + j] - scale * divisor[j]) % p
+    return result[len(result) - m + 1:]
+
+
+def _mul(a: List[int], b: List[int], p: int) -> List[int]:
+    instrument.count("poly_mul")
+    result = [0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                result[i + j] += x * y
+    return [c % p for c in result]
+
+
+class PolynomialZp:
+    def __init__(self, coeffs: List[int], p: Union[int, Zmod]):
+        if isinstance(coeffs, SparsePolynomialZp):
+            coeffs = coeffs.dense_coeffs()
+        # Контекст поля общий для всех многочленов по модулю p
+        self.F = p if isinstance(p, Zmod) else context(p)
+        p = self.p = self.F.m
+        # Храним коэффициенты от старшей степени к младшей
+        self.coeffs = [c % p for c in coeffs]
+        # Удаляем ведущие нули
+        while len(self.coeffs) > 1 and self.coeffs[0] == 0:
+            self.coeffs.pop(0)
+        if not self.coeffs:
+            self.coeffs = [0]
+
+    @classmethod
+    def x(cls, p: int) -> "PolynomialZp":
+        return cls([1, 0], p)
+
+    def __str__(self):
+        terms = []
+        degree = len(self.coeffs) - 1
+        for i, c in enumerate(self.coeffs):
+            if c == 0:
+                continue
+            power = degree - i
+            if power == 0:
+                terms.append(str(c))
+            elif power == 1:
+                terms.append(f"{'' if c == 1 else c}x")
+            else:
+                terms.append(f"{'' if c == 1 else c}x^{power}")
+        return " + ".join(terms) or "0"
+
+    def __eq__(self, other):
+        return isinstance(other, PolynomialZp) and self.p == other.p and self.coeffs == other.coeffs
+
+    def deg(self):
+        return len(self.coeffs) - 1
+
+    def is_zero(self) -> bool:
+        return self.coeffs == [0]
+
+    def derivative(self):
+        """Вычисление производной полинома."""
+        degree = len(self.coeffs) - 1
+        derived_coeffs = [((degree - i) * c) % self.p for i, c in enumerate(self.coeffs[:-1])]
+        return PolynomialZp(derived_coeffs, self.F)
+
+    def monic(self) -> "PolynomialZp":
+        """Нормированный многочлен (старший коэффициент 1)."""
+        if self.is_zero():
+            return self
+        inv = self.F.inv(self.coeffs[0])
+        return PolynomialZp([c * inv for c in self.coeffs], self.F)
+
+    def gcd(self, other):
+        """Вычисление НОД двух полиномов."""
+        a, b = self, other
+        while b.coeffs != [0]:
+            a, b = b, a % b
+        return a
+
+    def xgcd(self, other):
+        """Расширенный алгоритм Евклида: (d, s, t), s*self + t*other = d, d нормирован."""
+        one, zero = PolynomialZp([1], self.F), PolynomialZp([0], self.F)
+        r0, r1 = self, other
+        s0, s1, t0, t1 = one, zero, zero, one
+        while not r1.is_zero():
+            q = r0 // r1
+            r0, r1 = r1, r0 - q * r1
+            s0, s1 = s1, s0 - q * s1
+            t0, t1 = t1, t0 - q * t1
+        if r0.is_zero():
+            return r0, s0, t0
+        inv = PolynomialZp([self.F.inv(r0.coeffs[0])], self.F)
+        return r0 * inv, s0 * inv, t0 * inv
+
+    def __add__(self, other):
+        n = max(len(self.coeffs), len(other.coeffs))
+        a = [0] * (n - len(self.coeffs)) + self.coeffs
+        b = [0] * (n - len(other.coeffs)) + other.coeffs
+        return PolynomialZp([x + y for x, y in zip(a, b)], self.F)
+
+    def __sub__(self, other):
+        return self + PolynomialZp([-c for c in other.coeffs], self.F)
+
+    def __mul__(self, other):
+        return PolynomialZp(_mul(self.coeffs, other.coeffs, self.p), self.F)
+
+    def __mod__(self, other):
+        """Операция деления по модулю полинома."""
+        return PolynomialZp(_rem(self.coeffs, other.coeffs, self.F), self.F)
+
+    def to_sparse(self) -> "SparsePolynomialZp":
+        degree = self.deg()
+        return SparsePolynomialZp({degree - i: c for i, c in enumerate(self.coeffs) if c}, self.F)
+
+    def __floordiv__(self, other):
+        """Целочисленное деление полиномов."""
+        instrument.count("poly_div")
+        quotient = []
+        remainder = self.coeffs[:]
+        inv = self.F.inv(other.coeffs[0])
+        while len(remainder) >= len(other.coeffs):
+            scale = remainder[0] * inv % self.p
+            quotient.append(scale)
+            for i in range(len(other.coeffs)):
+                remainder[i] = (remainder[i] - scale * other.coeffs[i]) % self.p
+            remainder.pop(0)
+        return PolynomialZp(quotient, self.F)
+
+    def powmod(self, exponent: int, modulus: "PolynomialZp") -> "PolynomialZp":
+        """self^exponent mod modulus бинарным возведением: O(deg² · log exponent)."""
+        instrument.count("poly_powmod")
+        m, p, F = modulus.coeffs, self.p, self.F
+        result = [1]
+        base = _rem(self.coeffs, m, F)
+        while exponent:
+            if exponent & 1:
+                result = _rem(_mul(result, base, p), m, F)
+            exponent >>= 1
+            if exponent:
+                base = _rem(_mul(base, base, p), m, F)
+        return PolynomialZp(result, F)
+
+    def evaluate(self, x: int) -> int:
+        """Значение в точке x (схема Горнера)."""
+        value = 0
+        for c in self.coeffs:
+            value = (value * x + c) % self.p
+        return value
+
+
+# Член: [знак][коэффициент][*]x[^степень] или просто число
+_TERM = re.compile(r"([+-]?)(\d*)(\*?x(?:\^(\d+))?)?")
+
+
+def parse_terms(text: str) -> Dict[int, int]:
+    """
+    Разбирает запись вида "x^10000 + 2x^3 - x + 1" в {степень: коэффициент}
+    (коэффициенты — целые, без приведения по модулю).
+
+    :raises ValueError: если запись не разбирается.
+    """
+    s = text.replace(" ", "").replace("**", "^").lower()
+    if not s:
+        raise ValueError("пустой многочлен")
+    terms: Dict[int, int] = {}
+    pos = 0
+    while pos < len(s):
+        m = _TERM.match(s, pos)
+        sign, digits, var, power = m.groups()
+        # Каждый член, кроме первого, начинается со знака; "*x" без коэффициента не член
+        if (m.end() == pos or (pos > 0 and not sign) or not (digits or var)
+                or (var and var.startswith("*") and not digits)):
+            raise ValueError(f"не удалось разобрать «{s[pos:]}»")
+        c = int(digits) if digits else 1
+        e = (int(power) if power is not None else 1) if var else 0
+        terms[e] = terms.get(e, 0) + (-c if sign == "-" else c)
+        pos = m.end()
+    return terms
+
+
+class SparsePolynomialZp:
+    def __init__(self, terms: Dict[int, int], p: Union[int, Zmod]):
+        self.F = p if isinstance(p, Zmod) else context(p)
+        p = self.p = self.F.m
+        # Только ненулевые коэффициенты: {степень: коэффициент}
+        self.terms = {e: c % p for e, c in terms.items() if c % p}
+
+    @classmethod
+    def parse(cls, text: str, p: int) -> "SparsePolynomialZp":
+        """Разбирает запись вида "x^10000 + 2x^3 - x + 1" (см. parse_terms)."""
+        return cls(parse_terms(text), p)
+
+    def __str__(self):
+        terms = []
+        for power in sorted(self.terms, reverse=True):
+            c = self.terms[power]
+            if power == 0:
+                terms.append(str(c))
+            elif power == 1:
+                terms.append(f"{'' if c == 1 else c}x")
+            else:
+                terms.append(f"{'' if c == 1 else c}x^{power}")
+        return " + ".join(terms) or "0"
+
+    def __repr__(self):
+        return f"SparsePolynomialZp({dict(sorted(self.terms.items()))}, {self.p})"
+
+    def __eq__(self, other):
+        return isinstance(other, SparsePolynomialZp) and self.p == other.p and self.terms == other.terms
+
+    def __hash__(self):
+        return hash((self.p, tuple(sorted(self.terms.items()))))
+
+    def __len__(self):
+        # Как у плотного списка коэффициентов: deg + 1 (для оценок стоимости)
+        return self.deg() + 1
+
+    def deg(self) -> int:
+        return max(self.terms, default=0)
+
+    def dense_coeffs(self) -> List[int]:
+        degree = self.deg()
+        coeffs = [0] * (degree + 1)
+        for e, c in self.terms.items():
+            coeffs[degree - e] = c
+        return coeffs
+
+    def to_dense(self) -> PolynomialZp:
+        return PolynomialZp(self.dense_coeffs(), self.F)
+
+    def __mod__(self, other: PolynomialZp) -> PolynomialZp:
+        """
+        Остаток от деления на плотный многочлен без построения плотного делимого:
+        x^e mod f для членов по возрастанию степени, каждая следующая степень —
+        из предыдущей (сдвиг при малом шаге, возведение в степень при большом).
+        """
+        p, F, m = self.p, self.F, other.coeffs
+        n = len(m) - 1
+        result = [0] * max(n, 1)
+        current, last = [1], 0  # x^last mod f
+        for e in sorted(self.terms):
+            gap = e - last
+            if gap <= n:
+                current = _rem(current + [0] * gap, m, F)
+            else:
+                step = PolynomialZp([1, 0], F).powmod(gap, other).coeffs
+                current = _rem(_mul(current, step, p), m, F)
+            last = e
+            c = self.terms[e]
+            offset = len(result) - len(current)
+            for i, v in enumerate(current):
+                result[offset + i] += c * v
+        return PolynomialZp(result, F)
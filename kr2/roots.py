@@ -0,0 +1,134 @@
+# roots.py
+
+import random
+from typing import Dict, List
+
+import numpy as np
+
+import polycache
+from polynomial import PolynomialZp
+
+# Корни многочлена в Z_p без построения матрицы Берлекампа:
+#   g = НОД(f, x^p - x) — произведение (x - r) по всем корням (x^p mod f
+#   возведением в степень, O(deg² log p)); затем g расщепляется случайными
+#   НОД(g, (x + δ)^((p-1)/2) - 1). Для маленьких p f просто вычисляется во
+#   всех точках Z_p сразу (numpy).
+
+# До такого p (и p * deg) корни ищутся перебором всех точек
+MULTIPOINT_MAX_P = 1 << 16
+MULTIPOINT_MAX_WORK = 1 << 22
+# Попыток расщепления на один множитель (каждая удачна с вероятностью ≥ 1/2)
+SPLIT_ATTEMPTS = 64
+
+
+def multipoint_roots(f: PolynomialZp) -> List[int]:
+    """Корни f перебором: значения во всех точках 0..p-1 схемой Горнера по массиву."""
+    p = f.p
+    xs = np.arange(p, dtype=np.int64)
+    values = np.zeros(p, dtype=np.int64)
+    # p < 2^16: произведения помещаются в int64
+    for c in f.coeffs:
+        values = (values * xs + c) % p
+    return [int(r) for r in np.flatnonzero(values == 0)]
+
+
+def _split(g: PolynomialZp, rng: random.Random, log) -> List[int]:
+    """Корни g — нормированного произведения различных линейных множителей."""
+    p = g.p
+    if g.deg() == 0:
+        return []
+    if g.deg() == 1:
+        return [(-g.coeffs[1]) % p]
+    for _ in range(SPLIT_ATTEMPTS):
+        delta = rng.randrange(p)
+        # (x + δ)^((p-1)/2) = 1 ровно для половины корней: x + δ — квадратичный вычет
+        h = PolynomialZp([1, delta], p).powmod((p - 1) // 2, g) - PolynomialZp([1], p)
+        d = g.gcd(h).monic()
+        if 0 < d.deg() < g.deg():
+            log(f"  δ = {delta}: НОД(g, (x + {delta})^{(p - 1) // 2} - 1) = {d}")
+            return _split(d, rng, log) + _split(g // d, rng, log)
+    raise ArithmeticError("не удалось расщепить многочлен")
+
+
+def split_linear(g: PolynomialZp, log=None) -> List[int]:
+    """
+    Корни g = НОД(f, x^p - x) — произведения различных линейных множителей.
+
+    :param log: Функция для строк подробного решения (необязательно).
+    """
+    log = log or (lambda msg: None)
+    g = g.monic()
+    if g.p == 2:
+        # (x + δ)^0 - 1 = 0 ничего не расщепляет, а точек всего две
+        return multipoint_roots(g)
+    # Детерминированный генератор: одинаковый вход — одинаковое решение
+    return sorted(_split(g, random.Random(g.p * 1000003 + g.deg()), log))
+
+
+def multiplicity(f: PolynomialZp, r: int) -> int:
+    """Кратность корня r: сколько раз f делится на (x - r) (деление Горнера)."""
+    p = f.p
+    coeffs = f.coeffs
+    count = 0
+    while len(coeffs) > 1:
+        quotient = []
+        value = 0
+        for c in coeffs:
+            value = (value * r + c) % p
+            quotient.append(value)
+        if quotient.pop() != 0:
+            break
+        count += 1
+        coeffs = quotient
+    return count
+
+
+def find_roots(f: PolynomialZp, log=None) -> Dict[int, int]:
+    """
+    Корни f в Z_p с кратностями, по возрастанию.
+
+    :param log: Функция для строк подробного решения (необязательно).
+    """
+    log = log or (lambda msg: None)
+    p = f.p
+    if f.deg() < 1:
+        return {}
+    # p = 2 — всегда перебором: (x + δ)^0 - 1 = 0 ничего не расщепляет
+    if p == 2 or p <= MULTIPOINT_MAX_P and p * (f.deg() + 1) <= MULTIPOINT_MAX_WORK:
+        log(f"p = {p} мало: вычисляем f(a) сразу для всех a ∈ Z_{p}")
+        roots = multipoint_roots(f)
+    else:
+        f = f.monic()
+        # x^p mod f и НОД общие с тестом Рабина в /factor (кэш многочленов)
+        log(f"x^{p} mod f(x) = {polycache.frobenius(f, 1)}")
+        g = polycache.frobenius_gcd(f, 1)
+        log(f"g(x) = НОД(f(x), x^{p} - x) = {g}")
+        log(f"deg g = {g.deg()}: столько различных корней")
+        roots = split_linear(g, log)
+    return {r: multiplicity(f, r) for r in sorted(roots)}
+
+
+def roots(coeffs: List[int], p: int) -> str:
+    """
+    Находит корни полинома в Z_p и возвращает подробный вывод.
+
+    :param coeffs: Список коэффициентов полинома от старшей к младшей степени.
+    :param p: Модуль p для поля Z_p.
+    :return: Строка с подробным решением; последняя строка — ответ.
+    """
+    f = PolynomialZp(coeffs, p)
+    output = [f"Корни многочлена f(x) = {f} в Z_{p}"]
+    if f.is_zero():
+        output.append("f = 0: корнем является любой элемент Z_p")
+        output.append("Ответ: все x")
+        return "\n".join(output)
+
+    found = find_roots(f, output.append)
+    if not found:
+        output.append("Ответ: корней нет")
+        return "\n".join(output)
+    output.append("")
+    for r, k in found.items():
+        output.append(f"f({r}) = 0" + (f", кратность {k}" if k > 1 else ""))
+    output.append("Ответ: x = " + ", ".join(map(str, found)))
+    return "\n".join(output)
@@ -0,0 +1,84 @@
+# smooth.py
+
+from functools import lru_cache
+from typing import Iterator, List, Sequence, Tuple
+
+import arith
+
+# Пакетная проверка гладкости по Бернштейну: остатки произведения простых
+# факторной базы по всем кандидатам блока считаются деревом остатков,
+# а полностью раскладываются только прошедшие проверку числа.
+
+BLOCK_SIZE = 256
+
+
+@lru_cache(maxsize=32)
+def prime_product(primes: Tuple[int, ...]) -> int:
+    result = 1
+    for p in primes:
+        result *= p
+    return result
+
+
+def product_tree(values: Sequence[int]) -> List[List[int]]:
+    """Уровни дерева произведений: [values, попарные произведения, ..., [корень]]."""
+    tree = [list(values)]
+    while len(tree[-1]) > 1:
+        level = tree[-1]
+        tree.append([level[i] * level[i + 1] if i + 1 < len(level) else level[i]
+                     for i in range(0, len(level), 2)])
+    return tree
+
+
+def remainder_tree(P: int, values: Sequence[int]) -> List[int]:
+    """P mod v для каждого v из values (все v > 0)."""
+    if not values:
+        return []
+    tree = product_tree(values)
+    remainders = [P % tree[-1][0]]
+    for level in reversed(tree[:-1]):
+        remainders = [remainders[i // 2] % v for i, v in enumerate(level)]
+    return remainders
+
+
+def batch_smooth(values: Sequence[int], primes: Sequence[int]) -> List[bool]:
+    """
+    Для каждого значения — раскладывается ли оно по простым primes.
+
+    v гладкое ⇔ v | P^(2^e), где P — произведение primes и 2^e ≥ log2 v.
+    Неположительные значения гладкими не считаются.
+    """
+    P = arith.mpz(prime_product(tuple(primes)))
+    # Деревья произведений и остатков — самые длинные числа решателя; с gmpy2 они в GMP
+    positive = [arith.mpz(v) for v in values if v > 0]
+    remainders = iter(remainder_tree(P, positive))
+    result = []
+    for v in values:
+        if v <= 0:
+            result.append(False)
+            continue
+        y = next(remainders)
+        e = 1
+        while e < v.bit_length():
+            y = y * y % v
+            e *= 2
+        result.append(y == 0)
+    return result
+
+
+def descent_candidates(a: int, g: int, n: int, primes: Sequence[int], lo: int, hi: int,
+                       block: int = BLOCK_SIZE) -> Iterator[Tuple[int, int, bool]]:
+    """
+    Кандидаты шага 4 индексного исчисления: (k, a * g^k mod n, гладкое ли)
+    для k из [lo, hi). Значения идут накопительным умножением на g, гладкость
+    проверяется блоками по block штук.
+    """
+    product = arith.mpz(a * arith.powmod(g, lo, n) % n)
+    g, n = arith.mpz(g), arith.mpz(n)
+    for start in range(lo, hi, block):
+        stop = min(start + block, hi)
+        values = []
+        for _ in range(start, stop):
+            values.append(product)
+            product = product * g % n
+        yield from zip(range(start, stop), values, batch_smooth(values, primes))
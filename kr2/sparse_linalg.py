@@ -0,0 +1,292 @@
+# sparse_linalg.py
+
+import random
+from math import gcd
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sympy import factorint
+
+import arith
+from field import context
+import instrument
+
+# Разреженная линейная алгебра по модулю m = n - 1 для индексного исчисления.
+# Строка матрицы — словарь {столбец: коэффициент}, хранятся только ненулевые.
+#
+# Схема решения A x = b mod m:
+#   1) структурированное исключение Гаусса: столбцы веса 1 и 2 с обратимым
+#      коэффициентом убираются вместе со строкой-опорой (откладывается для
+#      обратной подстановки);
+#   2) оставшееся ядро решается методом Видемана по модулю каждого простого
+#      q | m с подъёмом до q^e, ответы склеиваются по КТО;
+#   3) отложенные строки дают оставшиеся неизвестные.
+
+Row = Dict[int, int]
+
+
+class RankTracker:
+    """
+    Инкрементальный ранг по модулю m в приведённой ступенчатой форме.
+    Опорой может быть только обратимый по модулю m коэффициент — как и в
+    плотном calculate_rank.
+    """
+
+    def __init__(self, m: int):
+        self.m = m
+        self.ring = context(m)
+        self.pivots: Dict[int, Row] = {}
+
+    @property
+    def rank(self) -> int:
+        return len(self.pivots)
+
+    def add(self, row: Row) -> bool:
+        """Добавляет строку; True, если ранг вырос."""
+        m = self.m
+        row = {c: v % m for c, v in row.items() if v % m}
+        # Строки-опоры не содержат чужих опорных столбцов, так что одного прохода хватает
+        for c in [c for c in row if c in self.pivots]:
+            factor = row.get(c, 0)
+            if factor:
+                _axpy(row, self.pivots[c], -factor, m)
+
+        pivot = next((c for c in sorted(row) if gcd(row[c], m) == 1), None)
+        if pivot is None:
+            return False
+        inv = self.ring.inv(row[pivot])
+        row = {c: v * inv % m for c, v in row.items()}
+        for other in self.pivots.values():
+            factor = other.get(pivot)
+            if factor:
+                _axpy(other, row, -factor, m)
+        self.pivots[pivot] = row
+        return True
+
+
+def _axpy(target: Row, source: Row, k: int, m: int):
+    """target += k * source (mod m), нули удаляются."""
+    instrument.count("row_ops")
+    for c, v in source.items():
+        value = (target.get(c, 0) + k * v) % m
+        if value:
+            target[c] = value
+        else:
+            target.pop(c, None)
+
+
+def matvec(rows: Sequence[Row], x: Sequence[int], m: int) -> List[int]:
+    return [sum(v * x[c] for c, v in row.items()) % m for row in rows]
+
+
+def structured_gauss(rows: List[Row], b: List[int], m: int):
+    """
+    Структурированное исключение: снимает столбцы веса 1 и 2.
+
+    :return: (строки ядра, правые части ядра, стек отложенных (столбец, строка, b)).
+    """
+    ring = context(m)
+    rows = [dict(row) for row in rows]
+    b = list(b)
+    active = set(range(len(rows)))
+    where: Dict[int, set] = {}
+    for r, row in enumerate(rows):
+        for c in row:
+            where.setdefault(c, set()).add(r)
+
+    stack: List[Tuple[int, Row, int]] = []
+    changed = True
+    while changed:
+        changed = False
+        for c in sorted(where, key=lambda c: len(where[c])):
+            holders = where[c]
+            if not holders or len(holders) > 2:
+                continue
+            pivot = next((r for r in holders if gcd(rows[r][c], m) == 1), None)
+            if pivot is None:
+                continue
+            pivot_row = rows[pivot]
+            inv = ring.inv(pivot_row[c])
+            for r in holders - {pivot}:
+                # Слияние: убираем столбец c из второй строки
+                k = -rows[r][c] * inv % m
+                before = set(rows[r])
+                _axpy(rows[r], pivot_row, k, m)
+                b[r] = (b[r] + k * b[pivot]) % m
+                for col in before - set(rows[r]):
+                    where[col].discard(r)
+                for col in set(rows[r]) - before:
+                    where.setdefault(col, set()).add(r)
+            for col in pivot_row:
+                where[col].discard(pivot)
+            active.discard(pivot)
+            stack.append((c, pivot_row, b[pivot]))
+            changed = True
+            break
+
+    order = sorted(active)
+    return [rows[r] for r in order], [b[r] for r in order], stack
+
+
+def berlekamp_massey(s: Sequence[int], q: int) -> List[int]:
+    """Минимальный многочлен линейной рекурренты над GF(q), коэффициенты от младшего."""
+    F = context(q)
+    C, B = [1], [1]
+    L, shift, b_last = 0, 1, 1
+    for i in range(len(s)):
+        d = s[i]
+        for j in range(1, L + 1):
+            d = (d + C[j] * s[i - j]) % q
+        if d == 0:
+            shift += 1
+            continue
+        coef = d * F.inv(b_last) % q
+        T = C[:]
+        C = C + [0] * (len(B) + shift - len(C))
+        for j, bj in enumerate(B):
+            C[j + shift] = (C[j + shift] - coef * bj) % q
+        if 2 * L <= i:
+            L, B, b_last, shift = i + 1 - L, T, d, 1
+        else:
+            shift += 1
+    C = C + [0] * (L + 1 - len(C))
+    # f(λ) = λ^L C(1/λ)
+    return [C[L - i] for i in range(L + 1)]
+
+
+def wiedemann(apply: Callable[[List[int]], List[int]], rhs: List[int], dim: int, q: int,
+              attempts: Optional[int] = None) -> Optional[List[int]]:
+    """
+    Решение M y = rhs над GF(q) для квадратной M, заданной умножением на вектор.
+
+    :return: y или None (вырожденная M / неудачные случайные проекции).
+    """
+    if not any(rhs):
+        return [0] * dim
+    rng = random.Random(dim * 1_000_003 + q)
+    # Над маленьким полем случайная проекция чаще теряет часть минимального многочлена
+    if attempts is None:
+        attempts = 3 if q > 100 else 10
+    for _ in range(attempts):
+        u = [rng.randrange(q) for _ in range(dim)]
+        seq, v = [], rhs
+        for _ in range(2 * dim):
+            seq.append(sum(ui * vi for ui, vi in zip(u, v)) % q)
+            v = apply(v)
+        f = berlekamp_massey(seq, q)
+        if len(f) < 2 or f[0] == 0:
+            continue
+        # y = -(1/f0) * sum_{i>=1} f_i M^{i-1} rhs
+        acc = [0] * dim
+        v = rhs
+        for i in range(1, len(f)):
+            if f[i]:
+                acc = [(a + f[i] * vi) % q for a, vi in zip(acc, v)]
+            if i + 1 < len(f):
+                v = apply(v)
+        scale = -context(q).inv(f[0]) % q
+        y = [a * scale % q for a in acc]
+        if apply(y) == [x % q for x in rhs]:
+            return y
+    return None
+
+
+def _solve_prime_power(rows: List[Row], b: List[int], ncols: int, q: int, e: int) -> Optional[List[int]]:
+    """A x = b mod q^e: Видеман по модулю q и q-адический подъём."""
+    square = len(rows) == ncols
+    transposed: List[Row] = [{} for _ in range(ncols)]
+    for r, row in enumerate(rows):
+        for c, v in row.items():
+            transposed[c][r] = v
+
+    def apply(vec):
+        instrument.count("matvec")
+        image = matvec(rows, vec, q)
+        return image if square else matvec(transposed, image, q)
+
+    x = [0] * ncols
+    residual = list(b)
+    qk = 1
+    for step in range(e):
+        rhs = [r % q for r in residual]
+        if not square:
+            rhs = matvec(transposed, rhs, q)
+        y = wiedemann(apply, rhs, ncols, q)
+        if y is None:
+            return None
+        x = [xi + qk * yi for xi, yi in zip(x, y)]
+        image = [sum(v * y[c] for c, v in row.items()) for row in rows]
+        if any((r - a) % q for r, a in zip(residual, image)):
+            return None
+        residual = [(r - a) // q for r, a in zip(residual, image)]
+        qk *= q
+    return x
+
+
+def _crt(residues: List[Tuple[List[int], int]], ncols: int) -> List[int]:
+    x, M = [0] * ncols, 1
+    for values, modulus in residues:
+        inv = arith.invert(M, modulus)
+        x = [xi + M * ((vi - xi) * inv % modulus) for xi, vi in zip(x, values)]
+        M *= modulus
+    return [xi % M for xi in x]
+
+
+def solve_sparse(rows: List[Row], b: List[int], ncols: int, m: int,
+                 fallback: Callable[[List[Row], List[int], int], Optional[List[int]]]
+                 ) -> Tuple[Optional[List[int]], List[str]]:
+    """
+    Решает разреженную систему A x = b mod m.
+
+    :param rows: Строки A в виде {столбец: коэффициент}.
+    :param b: Правые части.
+    :param ncols: Число неизвестных.
+    :param m: Модуль (составной, обычно n - 1).
+    :param fallback: Плотный решатель для ядра (строки, b, число столбцов) -> x или None.
+    :return: (решение или None, строки отчёта).
+    """
+    report = []
+    nnz = sum(len(row) for row in rows)
+    report.append(f"разреженная система: {len(rows)} x {ncols}, ненулевых {nnz}")
+
+    core_rows, core_b, stack = structured_gauss(rows, b, m)
+    core_cols = sorted({c for row in core_rows for c in row})
+    report.append(f"после структурированного исключения: ядро {len(core_rows)} x {len(core_cols)}, "
+                  f"отложено строк {len(stack)}")
+
+    # Перенумеровываем столбцы ядра подряд
+    index = {c: i for i, c in enumerate(core_cols)}
+    packed = [{index[c]: v for c, v in row.items()} for row in core_rows]
+
+    core_x: Optional[List[int]] = [] if not core_cols else None
+    if core_cols and len(packed) >= len(core_cols):
+        residues = []
+        for q, e in factorint(m).items():
+            part = _solve_prime_power(packed, core_b, len(core_cols), q, e)
+            if part is None:
+                residues = None
+                report.append(f"метод Видемана не справился по модулю {q}^{e}")
+                break
+            residues.append(([v % q ** e for v in part], q ** e))
+        if residues is not None:
+            core_x = _crt(residues, len(core_cols))
+            report.append("ядро решено методом Видемана по модулям " +
+                          ", ".join(f"{q}^{e}" for q, e in factorint(m).items()))
+    if core_x is None and core_cols:
+        core_x = fallback(packed, core_b, len(core_cols))
+        report.append("ядро решено плотным методом Гаусса")
+        if core_x is None:
+            return None, report
+
+    x = [0] * ncols
+    for c, v in zip(core_cols, core_x):
+        x[c] = v % m
+    # Обратная подстановка отложенных строк; опоры обратимы, их обратные — одной пачкой
+    inverses = context(m).batch_inverse([row[c] for c, row, _ in stack])
+    for (c, row, rhs), inv in reversed(list(zip(stack, inverses))):
+        rest = sum(v * x[j] for j, v in row.items() if j != c)
+        x[c] = (rhs - rest) * inv % m
+
+    if matvec(rows, x, m) != [v % m for v in b]:
+        report.append("проверка решения не прошла")
+        return None, report
+    return x, report
@@ -0,0 +1,131 @@
+# webhook.py
+
+import argparse
+import hmac
+import json
+import re
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Awaitable, Callable, List, Optional
+
+from http_server import Request, Response
+
+# Приём обновлений Telegram через вебхук на встроенном HTTP сервере
+# (http_server.py) вместо long polling. Приёмник не зависит от PTB: он
+# проверяет секрет и отдаёт JSON обновления в dispatch, поэтому его можно
+# гонять локально, присылая записанные Update:
+#   python webhook.py http://127.0.0.1:8443/telegram updates/*.json --secret XXX
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+# Ограничения Telegram на secret_token в setWebhook
+SECRET_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,256}")
+
+Dispatch = Callable[[dict], Awaitable[None]]
+
+
+def check_secret(secret: Optional[str]) -> Optional[str]:
+    """Проверяет формат секрета; пустая строка — без секрета."""
+    if not secret:
+        return None
+    if not SECRET_PATTERN.fullmatch(secret):
+        raise ValueError("WEBHOOK_SECRET: допустимы 1-256 символов A-Z, a-z, 0-9, _ и -")
+    return secret
+
+
+class WebhookReceiver:
+    """
+    HTTP обработчик вебхука: POST на path с JSON обновления.
+
+    Обновление только ставится в очередь (dispatch), ответ 200 уходит сразу —
+    Telegram не ждёт, пока решатель досчитает. После drain() новые запросы
+    получают 503, и Telegram повторит их позже (другой реплике).
+    """
+
+    def __init__(self, path: str, secret: Optional[str], dispatch: Dispatch):
+        self.path = path
+        self.secret = check_secret(secret)
+        self.dispatch = dispatch
+        self.draining = False
+        self.received = 0
+
+    def drain(self):
+        self.draining = True
+
+    async def __call__(self, request: Request) -> Response:
+        if request.path != self.path:
+            return Response.text("not found", 404)
+        if request.method != "POST":
+            return Response.text("method not allowed", 405)
+        if self.secret is not None:
+            token = request.headers.get(SECRET_HEADER, "")
+            # Сравнение за постоянное время
+            if not hmac.compare_digest(token.encode("utf-8"), self.secret.encode("utf-8")):
+                return Response.text("forbidden", 403)
+        if self.draining:
+            return Response.text("shutting down", 503)
+        try:
+            data = request.json()
+        except ValueError:
+            return Response.text("bad json", 400)
+        if not isinstance(data, dict) or "update_id" not in data:
+            return Response.text("not an update", 400)
+        await self.dispatch(data)
+        self.received += 1
+        return Response.text("ok")
+
+
+# --- локальное воспроизведение записанных обновлений ---
+
+def read_updates(paths: List[str]) -> List[dict]:
+    """
+    Обновления из файлов: JSON объект, массив объектов или JSON lines;
+    также понимает ответ getUpdates ({"ok": true, "result": [...]}).
+    """
+    updates = []
+    for path in paths or ["-"]:
+        text = sys.stdin.read() if path == "-" else open(path, encoding="utf-8-sig").read()
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = [json.loads(line) for line in text.splitlines() if line.strip()]
+        if isinstance(data, dict) and "result" in data:
+            data = data["result"]
+        updates.extend(data if isinstance(data, list) else [data])
+    return updates
+
+
+def post_update(url: str, update: dict, secret: Optional[str] = None, timeout: float = 10.0) -> int:
+    """Отправляет одно обновление на вебхук; возвращает HTTP статус."""
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = secret
+    request = urllib.request.Request(url, json.dumps(update).encode("utf-8"), headers, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Отправить записанные Update JSON на вебхук бота.")
+    parser.add_argument("url", help="адрес вебхука, например http://127.0.0.1:8443/telegram")
+    parser.add_argument("files", nargs="*", help="файлы с обновлениями (по умолчанию stdin)")
+    parser.add_argument("--secret", default=None, help="значение X-Telegram-Bot-Api-Secret-Token")
+    parser.add_argument("--delay", type=float, default=0.0, help="пауза между обновлениями, с")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for update in read_updates(args.files):
+        status = post_update(args.url, update, args.secret)
+        print(f"update {update.get('update_id')}: HTTP {status}", flush=True)
+        failed += status != 200
+        if args.delay:
+            time.sleep(args.delay)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()